@@ -0,0 +1,369 @@
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+import db
+from services import docx_generator
+from services.file_mode import set_default_mode
+
+# Files like YEIMY.JSON group the /generate fields in sections; flat files
+# (already in the /generate shape) are passed through.
+REPORT_SECTIONS = (
+    "datos_generales",
+    "obligaciones",
+    "seguridad_social",
+    "informacion_financiera",
+    "campos_derivados",
+)
+DATE_FIELDS = (
+    "fecha_contrato",
+    "fecha_inicio_contrato",
+    "fecha_vencimiento_contrato",
+    "periodo_i_de",
+    "periodo_i_a",
+    "fecha_pago_aportes",
+    "fecha_presentacion_informe",
+)
+MONEY_FIELDS = (
+    "valor_inicial",
+    "valor_contrato",
+    "valor_anticipo",
+    "valor_pago_anticipado",
+    "valor_adiciones",
+    "valor_ejecutado",
+    "valor_a_cobrar",
+    "saldo_pendiente",
+    "valor_presente_informe",
+    "actas_subtotal",
+    "aportes_valor_salud",
+    "aportes_valor_pension",
+    "aportes_valor_riesgos",
+    "aportes_valor_caja_compensacion_familiar",
+    "total_aportes",
+)
+MONTHS = (
+    "enero", "febrero", "marzo", "abril", "mayo", "junio",
+    "julio", "agosto", "septiembre", "octubre", "noviembre", "diciembre",
+)
+STATE_SAVE_EVERY = 10
+
+
+def _text(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "SI" if value else "NO"
+    return str(value).strip()
+
+
+def _date_text(value) -> str:
+    # ISO dates become dd/mm/aa like the form sends them.
+    text = _text(value)
+    try:
+        return datetime.strptime(text, "%Y-%m-%d").strftime("%d/%m/%y")
+    except ValueError:
+        return text
+
+
+def _money_text(value) -> str:
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return f"$ {int(round(value)):,}".replace(",", ".")
+    return _text(value)
+
+
+def _month_text(value) -> str:
+    if isinstance(value, int) and 1 <= value <= len(MONTHS):
+        return MONTHS[value - 1]
+    return _text(value).lower()
+
+
+def _map_item(item) -> dict:
+    if not isinstance(item, dict):
+        return {"actividad_contrato": _text(item), "actividad_ejecutada": "", "aporta_evidencias": "NO"}
+    evidencias = item.get("evidencias") if isinstance(item.get("evidencias"), dict) else {}
+    return {
+        **item,
+        "actividad_contrato": _text(item.get("actividad_contrato")),
+        "actividad_ejecutada": _text(item.get("actividad_ejecutada")),
+        "aporta_evidencias": _text(item.get("aporta_evidencias")) or "NO",
+        "evidencias": {"images": [], "groups": [], **evidencias},
+    }
+
+
+def map_report(report: dict) -> dict:
+    if not any(isinstance(report.get(section), dict) for section in REPORT_SECTIONS):
+        return dict(report)
+    payload = {}
+    for section in REPORT_SECTIONS:
+        if isinstance(report.get(section), dict):
+            payload.update(report[section])
+    payload.update(
+        (key, value) for key, value in report.items() if key not in REPORT_SECTIONS
+    )
+    items = payload.get("obligaciones_directas_items")
+    directas = payload.get("obligaciones_directas")
+    if not isinstance(items, list):
+        items = directas if isinstance(directas, list) else []
+    payload["obligaciones_directas_items"] = [_map_item(item) for item in items]
+    if isinstance(directas, list):
+        payload["obligaciones_directas"] = "\n".join(filter(None, map(_text, directas)))
+    elif not directas:
+        payload["obligaciones_directas"] = "\n".join(
+            item["actividad_contrato"] for item in payload["obligaciones_directas_items"]
+        )
+    if not payload.get("obligaciones_directas_ejecutadas"):
+        payload["obligaciones_directas_ejecutadas"] = "\n".join(
+            item["actividad_ejecutada"] for item in payload["obligaciones_directas_items"]
+        )
+    actas = payload.get("actas_parciales")
+    # The templates read the last acta; the form always sends at least one row.
+    payload["actas_parciales"] = [
+        {key: _text(value) for key, value in acta.items()}
+        for acta in (actas if isinstance(actas, list) else [])
+        if isinstance(acta, dict)
+    ] or [{"acta": "", "periodo": "", "valor": ""}]
+    for key, value in payload.items():
+        if isinstance(value, (list, dict)):
+            continue
+        if key in DATE_FIELDS:
+            payload[key] = _date_text(value)
+        elif key in MONEY_FIELDS:
+            payload[key] = _money_text(value)
+        elif key == "plazo_mes":
+            payload[key] = _month_text(value)
+        else:
+            payload[key] = _text(value)
+    return payload
+
+
+def _report_files(path: str) -> list[str]:
+    if os.path.isdir(path):
+        return sorted(
+            os.path.join(path, name)
+            for name in os.listdir(path)
+            if name.lower().endswith((".json", ".jsonl")) and not name.startswith(".")
+        )
+    return [path]
+
+
+def iter_reports(path: str):
+    # (source id, raw text) per report: one per .json file, one per line of
+    # a .jsonl file.
+    for file_path in _report_files(path):
+        name = os.path.basename(file_path)
+        with open(file_path, encoding="utf-8-sig") as handle:
+            if file_path.lower().endswith(".jsonl"):
+                for line_no, line in enumerate(handle, start=1):
+                    if line.strip():
+                        yield f"{name}:{line_no}", line
+            else:
+                yield name, handle.read()
+
+
+def _default_state_path(path: str) -> str:
+    if os.path.isdir(path):
+        return os.path.join(path, ".batch_state.json")
+    return path + ".state.json"
+
+
+def _load_state(state_path: str) -> dict:
+    try:
+        with open(state_path, encoding="utf-8") as handle:
+            state = json.load(handle)
+    except (OSError, ValueError):
+        return {"records": {}}
+    if not isinstance(state.get("records"), dict):
+        state["records"] = {}
+    return state
+
+
+def _save_state(state_path: str, state: dict) -> None:
+    directory = os.path.dirname(os.path.abspath(state_path))
+    fd, temp_path = tempfile.mkstemp(prefix=".batch_state.", suffix=".tmp", dir=directory)
+    with os.fdopen(fd, "w", encoding="utf-8") as handle:
+        json.dump(state, handle, ensure_ascii=False, indent=1)
+    set_default_mode(temp_path)
+    os.replace(temp_path, state_path)
+
+
+def _init_worker(db_path: str, output_dir: str) -> None:
+    db.DB_PATH = db_path
+    docx_generator.OUTPUT_DIR = output_dir
+
+
+def _render_record(record_id: int) -> tuple[int, float]:
+    started = time.perf_counter()
+    item = db.get_submission(record_id)
+    if not item:
+        raise LookupError(f"registro {record_id} no encontrado")
+    # One report per worker process; its four documents go one after another.
+    render_keys: dict = {}
+    docx_generator.generate_documents(
+        item.get("data") or {}, record_id, workers=0, render_keys=render_keys
+    )
+    db.save_render_keys(record_id, render_keys)
+    return record_id, (time.perf_counter() - started) * 1000
+
+
+class _Progress:
+    def __init__(self, total: int) -> None:
+        self.total = total
+        self.done = 0
+        self.failed = 0
+        self.started = time.perf_counter()
+
+    def per_minute(self) -> float:
+        elapsed = time.perf_counter() - self.started
+        return self.done / elapsed * 60 if elapsed else 0.0
+
+    def report(self, source: str, record_id: int, elapsed_ms: float, error: str = "") -> None:
+        if error:
+            self.failed += 1
+        else:
+            self.done += 1
+        position = self.done + self.failed
+        width = len(str(self.total))
+        status = f"ERROR {error}" if error else f"{elapsed_ms:7.0f} ms"
+        print(
+            f"[{position:>{width}}/{self.total}] #{record_id:05d} {source:<30} {status}"
+            f"  ({self.per_minute():.1f} informes/min)",
+            flush=True,
+        )
+
+
+def run(args: argparse.Namespace) -> int:
+    # app is imported here, not at module level, so the spawned render
+    # workers (which re-import this script) do not load Flask.
+    import app as web
+
+    if args.db:
+        db.DB_PATH = os.path.abspath(args.db)
+    output_dir = os.path.abspath(args.output or docx_generator.OUTPUT_DIR)
+    docx_generator.OUTPUT_DIR = output_dir
+    web.OUTPUT_DIR = output_dir
+    docx_generator.load_template_manifest()
+    db.init_db()
+    os.makedirs(output_dir, exist_ok=True)
+
+    state_path = args.state or _default_state_path(args.input)
+    state = _load_state(state_path)
+    records = state["records"]
+
+    sources = list(iter_reports(args.input))
+    to_render: list[tuple[str, int]] = []
+    pending: list[tuple[str, str, dict]] = []
+    invalid = 0
+    skipped = 0
+
+    def flush_pending() -> None:
+        if not pending:
+            return
+        record_ids = db.save_submissions([payload for _, _, payload in pending])
+        for (source, digest, payload), record_id in zip(pending, record_ids):
+            web._save_record_pdf_attachments(payload, record_id)
+            records[source] = {"sha256": digest, "record_id": record_id, "rendered": False}
+            to_render.append((source, record_id))
+        _save_state(state_path, state)
+        print(f"guardados {len(pending)} informes (lote)", flush=True)
+        pending.clear()
+
+    for source, raw in sources:
+        digest = hashlib.sha256(raw.encode("utf-8")).hexdigest()
+        known = records.get(source)
+        if known and known.get("sha256") == digest:
+            # Resume: saved by an earlier run; only render what is missing.
+            if known.get("rendered"):
+                skipped += 1
+            else:
+                to_render.append((source, known["record_id"]))
+            continue
+        try:
+            report = json.loads(raw)
+        except ValueError as exc:
+            invalid += 1
+            print(f"{source}: JSON invalido ({exc})", flush=True)
+            continue
+        if not isinstance(report, dict):
+            invalid += 1
+            print(f"{source}: se esperaba un objeto JSON", flush=True)
+            continue
+        pending.append((source, digest, web._prepare_generation_payload(map_report(report))))
+        if len(pending) >= args.batch_size:
+            flush_pending()
+    flush_pending()
+
+    print(
+        f"{len(sources)} informes: {len(to_render)} por generar, "
+        f"{skipped} ya generados, {invalid} invalidos",
+        flush=True,
+    )
+    progress = _Progress(len(to_render))
+
+    def mark_rendered(source: str, record_id: int, elapsed_ms: float) -> None:
+        records[source]["rendered"] = True
+        progress.report(source, record_id, elapsed_ms)
+        if progress.done % STATE_SAVE_EVERY == 0:
+            _save_state(state_path, state)
+
+    if args.workers > 1 and len(to_render) > 1:
+        with ProcessPoolExecutor(
+            max_workers=args.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(db.DB_PATH, output_dir),
+        ) as pool:
+            futures = {
+                pool.submit(_render_record, record_id): (source, record_id)
+                for source, record_id in to_render
+            }
+            for future in as_completed(futures):
+                source, record_id = futures[future]
+                try:
+                    _, elapsed_ms = future.result()
+                except Exception as exc:
+                    progress.report(source, record_id, 0, f"{type(exc).__name__}: {exc}")
+                    continue
+                mark_rendered(source, record_id, elapsed_ms)
+    else:
+        for source, record_id in to_render:
+            try:
+                _, elapsed_ms = _render_record(record_id)
+            except Exception as exc:
+                progress.report(source, record_id, 0, f"{type(exc).__name__}: {exc}")
+                continue
+            mark_rendered(source, record_id, elapsed_ms)
+    _save_state(state_path, state)
+
+    elapsed = time.perf_counter() - progress.started
+    print(
+        f"listo: {progress.done} generados, {progress.failed} con error en {elapsed:.1f} s "
+        f"({progress.per_minute():.1f} informes/min); estado en {state_path}"
+    )
+    return 1 if progress.failed or invalid else 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Genera informes en lote desde archivos JSON (carpeta o JSONL)."
+    )
+    parser.add_argument("input", help="carpeta con .json/.jsonl, un .jsonl o un .json")
+    parser.add_argument("--db", help="base SQLite (por defecto la de la app)")
+    parser.add_argument("--output", help="carpeta de salida (por defecto app/output)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="procesos de render")
+    parser.add_argument("--batch-size", type=int, default=50, help="informes por transaccion")
+    parser.add_argument("--state", help="archivo de estado para reanudar")
+    args = parser.parse_args()
+    args.batch_size = max(args.batch_size, 1)
+    return run(args)
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
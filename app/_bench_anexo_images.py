@@ -0,0 +1,92 @@
+import base64
+import io
+import os
+import sys
+import tempfile
+import time
+
+from services import docx_generator, evidence_images
+
+ACTIVITIES = 20
+PHOTOS_PER_ACTIVITY = 3
+PHOTO_SIZE = (4032, 3024)
+
+
+def _phone_photo(seed: int) -> bytes:
+    # 12 MP JPEG at phone quality: a gradient with sensor-like noise, every
+    # third one tagged as rotated through EXIF like a portrait shot.
+    from PIL import Image
+
+    gradient = Image.linear_gradient("L").resize(PHOTO_SIZE)
+    noise = Image.effect_noise(PHOTO_SIZE, 8 + seed % 4)
+    image = Image.merge(
+        "RGB",
+        (
+            Image.blend(gradient, noise, 0.35),
+            Image.blend(gradient.rotate(90 + seed, expand=False), noise, 0.3),
+            noise,
+        ),
+    )
+    exif = Image.Exif()
+    if seed % 3 == 0:
+        exif[0x0112] = 6
+    output = io.BytesIO()
+    image.save(output, format="JPEG", quality=92, exif=exif)
+    return output.getvalue()
+
+
+def _context(photos: list[str]) -> dict:
+    items = []
+    for index in range(ACTIVITIES):
+        chunk = photos[index * PHOTOS_PER_ACTIVITY : (index + 1) * PHOTOS_PER_ACTIVITY]
+        items.append(
+            {
+                "actividad_contrato": f"Actividad {index + 1}",
+                "actividad_ejecutada": f"Se ejecuto la actividad {index + 1}.",
+                "evidencias": {
+                    "images": [{"name": f"foto_{index}_{n}.jpg", "dataUrl": url} for n, url in enumerate(chunk)],
+                    "groups": [{"description": f"Registro {index + 1}", "date": "2025-12-01"}],
+                },
+            }
+        )
+    return {"obligaciones_directas_items": items}
+
+
+def _build(context: dict, out_path: str) -> tuple[float, int]:
+    started = time.perf_counter()
+    docx_generator._build_anexo_document(context, out_path)
+    return (time.perf_counter() - started) * 1000, os.path.getsize(out_path)
+
+
+def main() -> int:
+    if evidence_images.Image is None:
+        print("Pillow no esta instalado: el ANEXO usa las fotos originales.")
+        return 1
+    total = ACTIVITIES * PHOTOS_PER_ACTIVITY
+    print(f"Generando {total} fotos de {PHOTO_SIZE[0]}x{PHOTO_SIZE[1]}...")
+    photos = [
+        "data:image/jpeg;base64," + base64.b64encode(_phone_photo(seed)).decode("ascii")
+        for seed in range(total - 1)
+    ]
+    # The same photo attached to two activities.
+    photos.append(photos[0])
+    uploaded = sum(len(base64.b64decode(url.split(",", 1)[1])) for url in photos)
+    print(f"fotos subidas: {uploaded / 1e6:.1f} MB")
+    context = _context(photos)
+
+    dpi = evidence_images.IMAGE_DPI
+    with tempfile.TemporaryDirectory(prefix="bench_anexo_") as temp_dir:
+        evidence_images.IMAGE_DPI = 0
+        original_ms, original_size = _build(context, os.path.join(temp_dir, "original.docx"))
+        evidence_images.IMAGE_DPI = dpi
+        prepared_ms, prepared_size = _build(context, os.path.join(temp_dir, "prepared.docx"))
+    print(f"{'modo':<34}{'tiempo':>12}{'tamano':>14}")
+    print(f"{'fotos originales':<34}{original_ms:>9.0f} ms{original_size / 1e6:>11.2f} MB")
+    label = f"{dpi} dpi, JPEG q{evidence_images.JPEG_QUALITY}, {evidence_images.IMAGE_WORKERS} hilos"
+    print(f"{label:<34}{prepared_ms:>9.0f} ms{prepared_size / 1e6:>11.2f} MB")
+    print(f"reduccion: {original_size / prepared_size:.1f}x ({os.cpu_count()} CPU)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,183 @@
+import base64
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+import db
+from services import docx_generator, evidence_images
+
+PHOTO_SIZE = (1600, 1200)
+PHOTOS_PER_ACTIVITY = 3
+SMALL_SET = 30
+LARGE_SET = 300
+# Allowed growth of the streaming builder's peak RSS from SMALL_SET to
+# LARGE_SET photos; the in-memory builder grows with the photo bytes.
+MAX_GROWTH_MB = 32
+
+
+def _peak_rss_mb() -> float:
+    if sys.platform == "win32":
+        import ctypes
+        from ctypes import wintypes
+
+        class _Counters(ctypes.Structure):
+            _fields_ = [
+                ("cb", wintypes.DWORD),
+                ("PageFaultCount", wintypes.DWORD),
+                ("PeakWorkingSetSize", ctypes.c_size_t),
+                ("WorkingSetSize", ctypes.c_size_t),
+                ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                ("PagefileUsage", ctypes.c_size_t),
+                ("PeakPagefileUsage", ctypes.c_size_t),
+            ]
+
+        counters = _Counters()
+        counters.cb = ctypes.sizeof(counters)
+        ctypes.windll.psapi.GetProcessMemoryInfo(
+            ctypes.windll.kernel32.GetCurrentProcess(), ctypes.byref(counters), counters.cb
+        )
+        return counters.PeakWorkingSetSize / 2**20
+    if os.path.exists("/proc/self/status"):
+        # VmHWM starts over at exec; ru_maxrss keeps the parent's peak.
+        with open("/proc/self/status", encoding="ascii") as handle:
+            for line in handle:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 2**10
+    import resource
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Bytes on macOS, KiB elsewhere.
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+def _photo(seed: int) -> bytes:
+    from PIL import Image
+
+    gradient = Image.linear_gradient("L").resize(PHOTO_SIZE)
+    noise = Image.effect_noise(PHOTO_SIZE, 10 + seed % 7)
+    image = Image.merge("RGB", (Image.blend(gradient, noise, 0.4), noise, gradient.rotate(seed % 360)))
+    output = io.BytesIO()
+    image.save(output, format="JPEG", quality=90)
+    return output.getvalue()
+
+
+def _items(photo_count: int) -> list[dict]:
+    items = []
+    for start in range(0, photo_count, PHOTOS_PER_ACTIVITY):
+        images = [
+            {"name": f"foto_{seed}.jpg", "dataUrl": "data:image/jpeg;base64," + base64.b64encode(_photo(seed)).decode("ascii")}
+            for seed in range(start, min(start + PHOTOS_PER_ACTIVITY, photo_count))
+        ]
+        items.append(
+            {
+                "actividad_contrato": f"Actividad {len(items) + 1}",
+                "actividad_ejecutada": "Se ejecuto la actividad.",
+                "evidencias": {"images": images, "groups": [{"description": "Registro", "date": "2025-12-01"}]},
+            }
+        )
+    return items
+
+
+def _in_memory_anexo(context: dict, out_path: str) -> None:
+    # Reference: every photo decoded up front and kept by python-docx until
+    # save(), as the builder did before the streaming writer.
+    from docx import Document
+    from docx.shared import Cm
+
+    doc = Document()
+    items = context["obligaciones_directas_items"]
+    sources = [image["dataUrl"] for item in items for image in item["evidencias"]["images"]]
+    prepared = {
+        source: evidence_images.prepare_image(
+            docx_generator._decode_data_url(source),
+            docx_generator.EVIDENCE_IMAGE_CM,
+            docx_generator.EVIDENCE_IMAGE_CM,
+        )
+        for source in sources
+    }
+    for item in items:
+        doc.add_paragraph(item["actividad_contrato"])
+        table = doc.add_table(rows=1, cols=PHOTOS_PER_ACTIVITY)
+        for cell, image in zip(table.rows[0].cells, item["evidencias"]["images"]):
+            cell.paragraphs[0].add_run().add_picture(
+                io.BytesIO(prepared[image["dataUrl"]]), width=Cm(4), height=Cm(4)
+            )
+    docx_generator._save_atomic(doc, out_path)
+
+
+def _child(mode: str, record_id: int, out_path: str) -> None:
+    context = db.get_submission(record_id)["data"]
+    before = _peak_rss_mb()
+    if mode == "stream":
+        docx_generator._build_anexo_document(context, out_path)
+    else:
+        _in_memory_anexo(context, out_path)
+    print(json.dumps({"before": before, "peak": _peak_rss_mb(), "size": os.path.getsize(out_path)}))
+
+
+def _measure(mode: str, record_id: int, temp_dir: str, dpi: int) -> dict:
+    out_path = os.path.join(temp_dir, f"{mode}_{record_id}_{dpi}.docx")
+    # Without mmap: the mapped database pages (up to APP_DB_MMAP_SIZE) would
+    # count as RSS and hide what the builder itself holds.
+    env = dict(os.environ, APP_ANEXO_IMAGE_DPI=str(dpi), APP_DB_MMAP_SIZE="0")
+    result = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", mode, db.DB_PATH, str(record_id), out_path],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main() -> int:
+    if evidence_images.Image is None:
+        print("Pillow no esta instalado (se usa para generar las fotos de prueba).")
+        return 1
+    with tempfile.TemporaryDirectory(prefix="bench_anexo_memory_") as temp_dir:
+        db.DB_PATH = os.path.join(temp_dir, "app.db")
+        db.init_db()
+        records = {}
+        for count in (SMALL_SET, LARGE_SET):
+            print(f"Generando {count} fotos de {PHOTO_SIZE[0]}x{PHOTO_SIZE[1]}...", flush=True)
+            # Stored like /generate does: photos go to the blobs table and the
+            # payload keeps references, so the ANEXO loads them one by one.
+            records[count] = db.save_submission({"obligaciones_directas_items": _items(count)})
+        db.close_connections()
+
+        failed = False
+        for dpi, label in ((0, "fotos originales"), (evidence_images.IMAGE_DPI, f"{evidence_images.IMAGE_DPI} dpi")):
+            print(f"\n{label}")
+            print(f"{'modo':<14}{'fotos':>7}{'RSS pico':>12}{'durante ANEXO':>16}{'tamano':>12}")
+            peaks = {}
+            for mode in ("python-docx", "stream"):
+                for count, record_id in records.items():
+                    stats = _measure(mode, record_id, temp_dir, dpi)
+                    growth = stats["peak"] - stats["before"]
+                    peaks[(mode, count)] = stats["peak"]
+                    print(
+                        f"{mode:<14}{count:>7}{stats['peak']:>9.0f} MB{growth:>13.0f} MB"
+                        f"{stats['size'] / 2**20:>9.1f} MB"
+                    )
+            growth = peaks[("stream", LARGE_SET)] - peaks[("stream", SMALL_SET)]
+            ok = growth <= MAX_GROWTH_MB
+            failed = failed or not ok
+            print(
+                f"stream: {SMALL_SET} -> {LARGE_SET} fotos, el pico crece {growth:.0f} MB "
+                f"(limite {MAX_GROWTH_MB} MB): {'OK' if ok else 'FALLA'}"
+            )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 6 and sys.argv[1] == "--child":
+        db.DB_PATH = sys.argv[3]
+        _child(sys.argv[2], int(sys.argv[4]), sys.argv[5])
+        sys.exit(0)
+    sys.exit(main())
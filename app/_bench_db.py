@@ -0,0 +1,157 @@
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import db
+
+TOTAL_SUBMISSIONS = int(os.environ.get("BENCH_SUBMISSIONS", 50_000))
+DURATION_SECONDS = 3.0
+LISTING_LIMIT = 10_000
+PAGE_LIMIT = 500
+POPULATE_BATCH_SIZE = 1_000
+# Same fields through the indexed columns and through json_extract.
+SUMMARY_FIELDS = ["contrato_no", "contratista", "_app_meta.created_by_username"]
+
+
+def _legacy_connection() -> sqlite3.Connection:
+    # Connect-per-call behaviour used before the connection pool existed.
+    conn = sqlite3.connect(db.DB_PATH)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def _sample_payload(index: int) -> dict:
+    return {
+        "informe_no": f"{index % 12 + 1:02d}",
+        "contrato_no": f"2.28.04-{index % 500:03d} de 2026",
+        "contratista": f"Contratista {index % 500}",
+        "objeto_contractual": "Prestar servicios de apoyo a la gestion " * 4,
+        "periodo_i_de": "01/03/26",
+        "periodo_i_a": "31/03/26",
+        "obligaciones_directas_items": [
+            {
+                "actividad_contrato": f"Actividad {item}",
+                "actividad_ejecutada": "Se realizo la actividad programada " * 3,
+                "aporta_evidencias": "SI",
+            }
+            for item in range(8)
+        ],
+        "_app_meta": {"created_by_id": str(index % 500), "created_by_username": f"user{index % 500}"},
+    }
+
+
+def _populate() -> None:
+    db.init_db()
+    # Through save_submissions, like the app: the indexed metadata columns,
+    # counters and search index are filled the same way.
+    for start in range(0, TOTAL_SUBMISSIONS, POPULATE_BATCH_SIZE):
+        db.save_submissions(
+            [_sample_payload(index) for index in range(start, min(start + POPULATE_BATCH_SIZE, TOTAL_SUBMISSIONS))]
+        )
+    conn = db.get_connection()
+    with conn:
+        conn.execute("INSERT INTO roles (name) VALUES ('contratista')")
+        conn.execute(
+            "INSERT INTO users (username, password_hash, role_id, created_at) VALUES (?, ?, 1, ?)",
+            ("bench", "x", "2026-01-01T00:00:00"),
+        )
+
+
+def _operations() -> list:
+    rng = random.Random(7)
+    return [
+        ("get_user_by_username", lambda: db.get_user_by_username("bench")),
+        ("list_roles", db.list_roles),
+        ("get_submission", lambda: db.get_submission(rng.randint(1, TOTAL_SUBMISSIONS))),
+        ("list_submissions(20)", lambda: db.list_submissions(20)),
+    ]
+
+
+def _measure(func) -> float:
+    count = 0
+    started = time.perf_counter()
+    deadline = started + DURATION_SECONDS
+    while time.perf_counter() < deadline:
+        func()
+        count += 1
+    return count / (time.perf_counter() - started)
+
+
+def _measure_listing(name: str, func) -> None:
+    func()
+    started = time.perf_counter()
+    func()
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{name:<44}{elapsed_ms:>10.1f} ms{peak / 1024 / 1024:>10.1f} MiB")
+
+
+def main() -> int:
+    with tempfile.TemporaryDirectory(prefix="bench_db_") as temp_dir:
+        db.DB_PATH = os.path.join(temp_dir, "data", "app.db")
+        print(f"Poblando {TOTAL_SUBMISSIONS} submissions en {db.DB_PATH} ...")
+        _populate()
+
+        pooled_get_connection = db.get_connection
+        print(f"{'operacion':<24}{'antes ops/s':>14}{'despues ops/s':>16}{'mejora':>10}")
+        for name, func in _operations():
+            db.get_connection = _legacy_connection
+            before = _measure(func)
+            db.get_connection = pooled_get_connection
+            after = _measure(func)
+            print(f"{name:<24}{before:>14.0f}{after:>16.0f}{after / before:>9.1f}x")
+
+        print(f"\nListado de {LISTING_LIMIT} registros (tiempo, pico de memoria):")
+        _measure_listing(
+            "list_submissions (json.loads completo)",
+            lambda: db.list_submissions(LISTING_LIMIT),
+        )
+        column_fields = db.SUMMARY_COLUMN_FIELDS
+        _measure_listing(
+            "list_submission_summaries (columnas)",
+            lambda: db.list_submission_summaries(SUMMARY_FIELDS, LISTING_LIMIT),
+        )
+        # What /history and /api/supervisor/reports serve: one keyset page.
+        _measure_listing(
+            f"list_submission_summaries (pagina de {PAGE_LIMIT})",
+            lambda: db.list_submission_summaries(SUMMARY_FIELDS, PAGE_LIMIT),
+        )
+        from_columns = db.list_submission_summaries(SUMMARY_FIELDS, LISTING_LIMIT)
+        db.SUMMARY_COLUMN_FIELDS = {}
+        try:
+            _measure_listing(
+                "list_submission_summaries (json_extract)",
+                lambda: db.list_submission_summaries(SUMMARY_FIELDS, LISTING_LIMIT),
+            )
+            from_json = db.list_submission_summaries(SUMMARY_FIELDS, LISTING_LIMIT)
+        finally:
+            db.SUMMARY_COLUMN_FIELDS = column_fields
+        if from_columns != from_json:
+            print("ERROR: columnas y json_extract devuelven datos distintos")
+            db.close_connections()
+            return 1
+
+        print("\nBusqueda FTS5 (promedio de 20 consultas):")
+        started = time.perf_counter()
+        db.rebuild_search_index()
+        print(f"{'rebuild_search_index':<44}{(time.perf_counter() - started) * 1000:>10.1f} ms")
+        for query in ("Contratista 123", "2.28.04-042", "gestion programada"):
+            db.search_submissions(query, limit=20)
+            started = time.perf_counter()
+            for _ in range(20):
+                db.search_submissions(query, limit=20)
+            elapsed_ms = (time.perf_counter() - started) * 1000 / 20
+            print(f"{'search ' + repr(query):<44}{elapsed_ms:>10.1f} ms")
+        db.close_connections()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,129 @@
+import base64
+import os
+import random
+import statistics
+import struct
+import sys
+import tempfile
+import time
+import zlib
+
+from services import docx_generator, template_cache
+from _test_generate import sample
+
+ROUNDS = 10
+ACTIVITY_COUNTS = (10, 50, 200)
+PHOTOS_PER_ACTIVITY = 2
+PARALLEL_WORKERS = docx_generator.DOCX_WORKERS if docx_generator.DOCX_WORKERS > 1 else 4
+
+
+def _noise_png(seed: int, width: int = 96, height: int = 72) -> str:
+    # Distinct, poorly compressible photos so the ANEXO does real work.
+    rng = random.Random(seed)
+    raw = b"".join(b"\x00" + rng.randbytes(width * 3) for _ in range(height))
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    png = (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+        + chunk(b"IDAT", zlib.compress(raw))
+        + chunk(b"IEND", b"")
+    )
+    return "data:image/png;base64," + base64.b64encode(png).decode("ascii")
+
+
+def _sample_with_activities(count: int) -> dict:
+    context = dict(sample)
+    context["obligaciones_directas_items"] = [
+        {
+            "actividad_contrato": f"Actividad {index}",
+            "actividad_ejecutada": f"Se ejecuto la actividad {index} segun lo programado.",
+            "aporta_evidencias": "SI",
+            "evidencias": {
+                "images": [
+                    {"name": f"foto_{index}_{photo}.png", "dataUrl": _noise_png(index * 10 + photo)}
+                    for photo in range(PHOTOS_PER_ACTIVITY)
+                ],
+                "groups": [{"description": f"Registro {index}", "date": "2025-12-01"}],
+            },
+        }
+        for index in range(1, count + 1)
+    ]
+    context["obligaciones_directas_ejecutadas_tercera_items"] = [
+        item["actividad_ejecutada"] for item in context["obligaciones_directas_items"]
+    ]
+    return context
+
+
+def _wall_time(context: dict, workers: int, rounds: int = 3) -> float:
+    timings = []
+    for index in range(rounds):
+        started = time.perf_counter()
+        docx_generator.generate_documents(context, 91000 + index, workers=workers)
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def _measure(label: str, stage_samples: dict | None = None) -> float:
+    timings = []
+    for index in range(ROUNDS):
+        stages: dict = {}
+        started = time.perf_counter()
+        docx_generator.generate_documents(sample, 90000 + index, stages)
+        timings.append((time.perf_counter() - started) * 1000)
+        if stage_samples is not None:
+            for key, values in stages.items():
+                for stage, elapsed_ms in values.items():
+                    stage_samples.setdefault(f"{key}.{stage}", []).append(elapsed_ms)
+    median = statistics.median(timings)
+    print(f"{label:<28}{median:>10.1f} ms{min(timings):>10.1f} ms{max(timings):>10.1f} ms")
+    return median
+
+
+def main() -> int:
+    with tempfile.TemporaryDirectory(prefix="bench_generate_") as temp_dir:
+        docx_generator.OUTPUT_DIR = temp_dir
+        # Measured separately below; every other section must really render.
+        docx_generator.RENDER_CACHE_ENABLED = False
+        print(f"generate_documents sobre _test_generate.py ({ROUNDS} rondas)")
+        print(f"{'modo':<28}{'mediana':>13}{'min':>13}{'max':>13}")
+        template_cache.TEMPLATE_CACHE_ENABLED = False
+        before = _measure("sin caché de plantillas")
+        template_cache.TEMPLATE_CACHE_ENABLED = True
+        template_cache.clear_template_cache()
+        stage_samples: dict = {}
+        after = _measure("con caché de plantillas", stage_samples)
+        print(f"mejora: {before / after:.2f}x")
+        print(template_cache.template_cache_stats())
+        print("\nEtapas (mediana con caché):")
+        for name, values in stage_samples.items():
+            print(f"{name:<28}{statistics.median(values):>10.1f} ms")
+
+        docx_generator.RENDER_CACHE_ENABLED = True
+        docx_generator.generate_documents(sample, 90000)
+        cached = _measure("con caché de renders")
+        print(f"mejora frente a render con caché de plantillas: {after / cached:.2f}x")
+        docx_generator.clear_render_cache()
+        docx_generator.RENDER_CACHE_ENABLED = False
+
+        print(
+            f"\nSecuencial vs. pool de {PARALLEL_WORKERS} procesos "
+            f"({PHOTOS_PER_ACTIVITY} fotos por actividad, {os.cpu_count()} CPU):"
+        )
+        print(f"{'actividades':<14}{'secuencial':>14}{'paralelo':>14}{'mejora':>10}")
+        # Warm-up: spawns the workers and fills their template caches.
+        for _ in range(PARALLEL_WORKERS):
+            docx_generator.generate_documents(sample, 91999, workers=PARALLEL_WORKERS)
+        for count in ACTIVITY_COUNTS:
+            context = _sample_with_activities(count)
+            sequential = _wall_time(context, 0)
+            parallel = _wall_time(context, PARALLEL_WORKERS)
+            print(f"{count:<14}{sequential:>11.0f} ms{parallel:>11.0f} ms{sequential / parallel:>9.2f}x")
+        docx_generator.shutdown_document_pool()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,65 @@
+import json
+import os
+import sys
+import time
+import zlib
+
+import db
+from _bench_db import _sample_payload
+
+SAMPLE_SIZE = 2_000
+
+
+def _load_records(path: str) -> list[dict]:
+    if not os.path.isfile(path):
+        return []
+    db.DB_PATH = path
+    with db.get_connection() as conn:
+        rows = conn.execute("SELECT data_json FROM submissions ORDER BY id").fetchall()
+    return [db._load_payload(row[0]) for row in rows]
+
+
+def _codecs() -> list:
+    def legacy(payload: dict) -> str:
+        return json.dumps(payload, ensure_ascii=True, sort_keys=True, separators=(",", ":"))
+
+    return [
+        ("json ascii (anterior)", legacy, json.loads),
+        ("json utf-8", lambda payload: db._encode_payload(db._dump_payload(payload), "json"), db._load_payload),
+        ("zlib", lambda payload: db._encode_payload(db._dump_payload(payload), "zlib"), db._load_payload),
+    ]
+
+
+def _size(value) -> int:
+    return len(value.encode("utf-8")) if isinstance(value, str) else len(value)
+
+
+def main() -> int:
+    path = sys.argv[1] if len(sys.argv) > 1 else db.DB_PATH
+    records = _load_records(path)
+    if records:
+        print(f"{len(records)} registros de {path}")
+    else:
+        records = [_sample_payload(index) for index in range(SAMPLE_SIZE)]
+        print(f"Sin registros en {path}; usando {SAMPLE_SIZE} informes sinteticos")
+
+    print(f"{'codec':<24}{'bytes':>14}{'ratio':>8}{'encode ms':>12}{'decode ms':>12}")
+    baseline = None
+    for name, encode, decode in _codecs():
+        started = time.perf_counter()
+        encoded = [encode(payload) for payload in records]
+        encode_ms = (time.perf_counter() - started) * 1000
+        started = time.perf_counter()
+        for value in encoded:
+            decode(value)
+        decode_ms = (time.perf_counter() - started) * 1000
+        total = sum(_size(value) for value in encoded)
+        baseline = baseline or total
+        print(f"{name:<24}{total:>14}{total / baseline:>8.2f}{encode_ms:>12.1f}{decode_ms:>12.1f}")
+    print(f"(nivel zlib {db.PAYLOAD_ZLIB_LEVEL}, zlib {zlib.ZLIB_VERSION})")
+    db.close_connections()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,91 @@
+import os
+import random
+import sys
+import tempfile
+import time
+
+import db
+from services import docx_generator
+
+CONTRACTORS = 500
+ACTIVITIES = 20
+PERIOD = "2025-12"
+# Time allowed for query + build of the consolidated document.
+MAX_SECONDS = 5.0
+
+
+def _payload(index: int) -> dict:
+    items = [
+        {
+            "actividad_contrato": f"Actividad {number} del contrato {index}: " + "apoyo administrativo " * 8,
+            "actividad_ejecutada": "Se ejecuto la actividad conforme al plan de trabajo. " * 12,
+            "aporta_evidencias": "SI",
+        }
+        for number in range(1, ACTIVITIES + 1)
+    ]
+    return {
+        "contratista": f"Contratista {index:04d}",
+        "contrato_no": f"CPS-{index:04d}-2025",
+        "periodo_i_de": f"{PERIOD}-01",
+        "periodo_i_a": f"{PERIOD}-31",
+        "objeto_contractual": "Prestacion de servicios profesionales. " * 20,
+        "obligaciones_directas_items": items,
+    }
+
+
+def _review(rng: random.Random) -> tuple[str, str, list[dict]]:
+    activities = []
+    for number in range(1, ACTIVITIES + 1):
+        status = rng.choices(["cumplida", "no cumplida", "pendiente"], [8, 1, 1])[0]
+        activities.append(
+            {
+                "id": f"act-{number}",
+                "desc": f"Actividad {number} del contrato",
+                "status": status,
+                "obs": "Falta soporte de la evidencia." if status == "no cumplida" else "",
+            }
+        )
+    status = rng.choice(["aprobado", "rechazado", "pendiente"])
+    return status, "Revisado en comite." if status != "pendiente" else "", activities
+
+
+def _from_payloads(record_ids: list[int]) -> list[dict]:
+    # Reference: what the consolidated document costs if every submission is
+    # loaded in full, as opening each INF.SUPERVISION does.
+    return [db.get_submission(record_id) for record_id in record_ids]
+
+
+def main() -> int:
+    rng = random.Random(7)
+    with tempfile.TemporaryDirectory(prefix="bench_period_") as temp_dir:
+        db.DB_PATH = os.path.join(temp_dir, "app.db")
+        db.init_db()
+        print(f"Guardando {CONTRACTORS} informes con {ACTIVITIES} actividades revisadas...", flush=True)
+        record_ids = db.save_submissions([_payload(index) for index in range(1, CONTRACTORS + 1)])
+        for record_id in record_ids:
+            status, observation, activities = _review(rng)
+            db.save_review(record_id, status, observation, activities)
+
+        started = time.perf_counter()
+        _from_payloads(record_ids)
+        payload_ms = (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        reports = db.list_period_reviews(PERIOD)
+        query_ms = (time.perf_counter() - started) * 1000
+        out_path = os.path.join(temp_dir, "consolidado.docx")
+        started = time.perf_counter()
+        docx_generator.build_period_document(PERIOD, reports, out_path)
+        build_ms = (time.perf_counter() - started) * 1000
+
+        print(f"payload completo (referencia): {payload_ms:8.1f} ms")
+        print(f"consulta resumen + revision:  {query_ms:8.1f} ms ({len(reports)} informes)")
+        print(f"armado del DOCX:              {build_ms:8.1f} ms ({os.path.getsize(out_path) / 1024:.0f} KB)")
+        total = (query_ms + build_ms) / 1000
+        ok = len(reports) == CONTRACTORS and total <= MAX_SECONDS
+        print(f"total {total:.2f} s (limite {MAX_SECONDS:.0f} s): {'OK' if ok else 'FALLA'}")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
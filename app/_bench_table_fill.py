@@ -0,0 +1,80 @@
+import os
+import statistics
+import sys
+import time
+
+from services import docx_generator
+from services.template_cache import get_template
+
+from _test_generate import sample
+
+ACTIVITIES = 500
+ROUNDS = 5
+
+
+def _items() -> list[dict]:
+    return [
+        {
+            "actividad_contrato": f"Actividad {index} del contrato",
+            "actividad_ejecutada": f"Se ejecuto la actividad {index}.\nSegunda linea del informe.",
+            "aporta_evidencias": "SI" if index % 2 else "NO",
+        }
+        for index in range(1, ACTIVITIES + 1)
+    ]
+
+
+def _python_docx_fill(table, header_row_index: int, rows: list[list[str]]) -> None:
+    # The previous implementation: python-docx add_row() + cell.text per cell.
+    while len(table.rows) > header_row_index + 1:
+        table._tbl.remove(table.rows[-1]._tr)
+    for values in rows:
+        row = table.add_row()
+        for cell, value in zip(row.cells, values):
+            cell.text = value
+
+
+def _rendered(key: str, context: dict):
+    template = get_template(os.path.join(docx_generator.TEMPLATES_DIR, docx_generator.TEMPLATE_FILES[key]))
+    template.render(context)
+    return template.docx
+
+
+def _measure(key: str, context: dict, rows: list[list[str]], engine: str) -> tuple[float, list[str]]:
+    timings = []
+    texts: list[str] = []
+    for _ in range(ROUNDS):
+        doc = _rendered(key, context)
+        started = time.perf_counter()
+        table, header_row_index = docx_generator._find_activity_table(doc, key)
+        if engine == "xml":
+            docx_generator.fill_table(table._tbl, header_row_index, rows)
+        else:
+            _python_docx_fill(table, header_row_index, rows)
+        timings.append((time.perf_counter() - started) * 1000)
+        texts = [cell.text for row in table.rows[header_row_index + 1:] for cell in row.cells]
+    return statistics.median(timings), texts
+
+
+def main() -> int:
+    docx_generator.load_template_manifest()
+    items = _items()
+    context = dict(sample)
+    context["obligaciones_directas_items"] = items
+    cases = {
+        "inf_gestion": docx_generator._gestion_rows(items),
+        "inf_supervision": docx_generator._supervision_rows(items, []),
+    }
+    print(f"{ACTIVITIES} actividades, mediana de {ROUNDS} rondas")
+    print(f"{'documento':<18}{'python-docx':>14}{'lxml':>12}{'mejora':>10}")
+    for key, rows in cases.items():
+        before_ms, before_texts = _measure(key, context, rows, "python-docx")
+        after_ms, after_texts = _measure(key, context, rows, "xml")
+        if before_texts != after_texts:
+            print(f"{key}: el texto de las celdas no coincide")
+            return 1
+        print(f"{key:<18}{before_ms:>11.1f} ms{after_ms:>9.1f} ms{before_ms / after_ms:>9.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,53 @@
+import argparse
+import os
+import sys
+import time
+
+import db
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Recodifica data_json de los informes guardados con el codec indicado."
+    )
+    parser.add_argument("--db", default=db.DB_PATH, help="Ruta de la base de datos (por defecto app.db)")
+    parser.add_argument("--codec", default=db.PAYLOAD_CODEC, choices=["zlib", "json"])
+    parser.add_argument("--batch-size", type=int, default=db.MIGRATION_BATCH_SIZE)
+    parser.add_argument(
+        "--pause",
+        type=float,
+        default=0.05,
+        help="Segundos de espera entre lotes para no bloquear la app",
+    )
+    args = parser.parse_args()
+
+    if not os.path.isfile(args.db):
+        print(f"No existe la base de datos: {args.db}")
+        return 1
+    db.DB_PATH = args.db
+    db.init_db()
+
+    started = time.perf_counter()
+
+    def report(stats: dict) -> None:
+        print(
+            f"\r{stats['scanned']} revisados, {stats['reencoded']} recodificados",
+            end="",
+            flush=True,
+        )
+
+    stats = db.reencode_submissions(args.codec, args.batch_size, args.pause, report)
+    print()
+    elapsed = time.perf_counter() - started
+    print(
+        f"Listo en {elapsed:.1f} s: {stats['bytes_before']} -> {stats['bytes_after']} bytes "
+        f"en {stats['reencoded']} registros"
+    )
+    if stats["reencoded"]:
+        db.checkpoint_database()
+    db.close_connections()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
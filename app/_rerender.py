@@ -0,0 +1,65 @@
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+
+import db
+from services import docx_generator, rerender
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description=(
+            "Regenera los documentos de los informes guardados (p. ej. tras cambiar "
+            "una plantilla). Solo genera los documentos cuya plantilla o datos "
+            "cambiaron y reanuda una ejecucion interrumpida."
+        )
+    )
+    parser.add_argument("--db", help="base SQLite (por defecto la de la app)")
+    parser.add_argument("--output", help="carpeta de salida (por defecto app/output)")
+    parser.add_argument("--workers", type=int, default=rerender.RERENDER_WORKERS, help="procesos de render")
+    parser.add_argument("--batch-size", type=int, default=rerender.RERENDER_BATCH_SIZE, help="informes por punto de control")
+    parser.add_argument("--new", action="store_true", help="empezar de cero aunque haya una ejecucion sin terminar")
+    args = parser.parse_args()
+
+    if args.db:
+        db.DB_PATH = os.path.abspath(args.db)
+    if args.output:
+        docx_generator.OUTPUT_DIR = os.path.abspath(args.output)
+    docx_generator.load_template_manifest()
+    db.init_db()
+    os.makedirs(docx_generator.OUTPUT_DIR, exist_ok=True)
+
+    run = db.get_unfinished_rerender_run()
+    if run and args.new:
+        db.update_rerender_run(run["id"], status="failed", error="reemplazado")
+        run = None
+    if run:
+        print(f"reanudando #{run['id']} desde el informe {run['last_id']}", flush=True)
+        run_id = run["id"]
+    else:
+        run_id = db.create_rerender_run("cli")
+        print(f"ejecucion #{run_id}", flush=True)
+    started = time.perf_counter()
+
+    def progress(current: dict) -> None:
+        elapsed = time.perf_counter() - started
+        print(
+            f"hasta #{current['last_id']:05d}: {current['scanned']} revisados, "
+            f"{current['rendered']} regenerados, {current['skipped']} sin cambios, "
+            f"{current['failed']} con error ({elapsed:.1f} s)",
+            flush=True,
+        )
+
+    result = rerender.run_rerender(run_id, args.workers, args.batch_size, progress)
+    print(
+        f"listo: {result['rendered']} regenerados, {result['skipped']} sin cambios, "
+        f"{result['failed']} con error en {time.perf_counter() - started:.1f} s"
+    )
+    return 1 if result["failed"] else 0
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -7,6 +7,7 @@ from datetime import datetime
 import os
 import io
 import json
+import multiprocessing
 import hashlib
 import re
 import sys
@@ -29,6 +30,7 @@ from flask import (
     url_for,
     redirect,
     session,
+    Response,
 )
 from werkzeug.security import generate_password_hash, check_password_hash
 
@@ -36,9 +38,16 @@ from db import (
     init_db,
     save_submission,
     save_submission_with_created_at,
-    update_submission_data,
+    get_review,
+    save_review,
+    update_review_activity,
     list_submissions,
+    list_submission_summaries,
+    list_period_reviews,
+    count_submissions,
+    search_submissions,
     get_submission,
+    get_submission_metadata,
     delete_submission,
     list_roles,
     get_role_by_name,
@@ -59,8 +68,49 @@ from db import (
     get_database_path,
     get_backups_dir,
     import_database_file,
+    checkpoint_database,
+    extract_period_key,
+    ALLOWED_REVIEW_STATUS,
+    get_blob,
+    blob_referenced_by_owner,
+    drop_blob_refs,
+    load_blob_bytes,
+    parse_blob_ref,
+    resolve_blob_refs,
+    dehydrate_payload,
+    create_generation_job,
+    get_generation_job,
+    update_generation_job_progress,
+    finish_generation_job,
+    fail_generation_job,
+    save_render_keys,
+    get_rerender_run,
 )
-from services.docx_generator import generate_documents, TEMPLATE_FILES, OUTPUT_DIR
+from services.docx_generator import (
+    build_period_document,
+    generate_documents,
+    load_template_manifest,
+    TEMPLATE_FILES,
+    OUTPUT_DIR,
+)
+from services.template_cache import template_cache_stats
+from services.template_manifest import TemplateManifestError, manifest_summary
+from services.timing import (
+    HISTOGRAM_BUCKETS_MS,
+    TIMING_WINDOW,
+    Timings,
+    record_timings,
+    server_timing_header,
+    timing_histogram,
+)
+from services.zip_stream import stream_zip
+from services.generation_jobs import (
+    resume_generation_jobs,
+    set_job_handler,
+    shutdown_generation_workers,
+    submit_generation_job,
+)
+from services.rerender import start_rerender, resume_rerender
 
 def _resource_path(*parts: str) -> str:
     base_dir = getattr(sys, "_MEIPASS", os.path.dirname(os.path.abspath(__file__)))
@@ -86,8 +136,15 @@ DOC_TYPES = [
     {"value": "nit", "label": "NIT"},
 ]
 
-ALLOWED_REVIEW_STATUS = {"pendiente", "aprobado", "rechazado"}
 ALLOWED_ACTIVITY_STATUS = {"cumplida", "no cumplida", "pendiente"}
+HISTORY_SUMMARY_FIELDS = ["contrato_no", "contratista", "supervisor_review.status"]
+SUPERVISOR_REPORT_FIELDS = ["contratista", "period_key", "supervisor_review.status"]
+MAX_LIST_LIMIT = 500
+# Progress key for the PDF attachments written after the DOCX documents.
+GENERATION_ATTACHMENTS_STEP = "adjuntos_pdf"
+# Lazy mode: /generate only stores the submission and each document is
+# rendered the first time it is downloaded.
+LAZY_GENERATION = os.environ.get("APP_LAZY_GENERATION", "0").strip() == "1"
 
 verb_map = [
     (r"aprob[éeo]\b", "aprobó"),
@@ -202,6 +259,8 @@ def _decode_data_url_to_bytes(value: str) -> bytes | None:
     raw = str(value).strip()
     if not raw:
         return None
+    if parse_blob_ref(raw):
+        return load_blob_bytes(raw)
     encoded = raw
     if raw.startswith("data:"):
         try:
@@ -230,6 +289,12 @@ def _save_record_pdf_attachments(payload: dict, record_id: int) -> list[str]:
         file_path = os.path.join(OUTPUT_DIR, filename)
         counter = 1
         while os.path.exists(file_path):
+            # A resumed generation job finds its own earlier copy: reuse it.
+            if os.path.getsize(file_path) == len(content):
+                with open(file_path, "rb") as existing:
+                    if existing.read() == content:
+                        saved_files.append(filename)
+                        return
             filename = f"{record_id:05d}_{prefix}_{base_name}_{counter}.pdf"
             file_path = os.path.join(OUTPUT_DIR, filename)
             counter += 1
@@ -266,25 +331,11 @@ def _save_record_pdf_attachments(payload: dict, record_id: int) -> list[str]:
 
     return saved_files
 
-def _extract_period_key(data: dict) -> str:
-    raw_value = (
-        data.get("periodo_i_a")
-        or data.get("periodo_i_de")
-        or data.get("fecha_presentacion_informe")
-        or ""
-    )
-    raw_value = str(raw_value).strip()
-    if not raw_value:
-        return ""
-    if re.match(r"^\d{4}-\d{2}-\d{2}$", raw_value):
-        return raw_value[:7]
-    match = re.match(r"^\d{1,2}/(\d{1,2})/(\d{2}|\d{4})$", raw_value)
-    if not match:
-        return ""
-    month = int(match.group(1))
-    year = match.group(2)
-    year = f"20{year}" if len(year) == 2 else year
-    return f"{year}-{month:02d}"
+def _evidence_url(value: str) -> str:
+    digest = parse_blob_ref(value)
+    if digest:
+        return url_for("blob_file", digest=digest)
+    return value
 
 def _build_default_review_activities(data: dict) -> list[dict]:
     items = data.get("obligaciones_directas_items")
@@ -319,7 +370,7 @@ def _build_default_review_activities(data: dict) -> list[dict]:
                     photos.append(
                         {
                             "name": str(image.get("name", "Foto")).strip() or "Foto",
-                            "url": data_url,
+                            "url": _evidence_url(data_url),
                         }
                     )
                 if photos or group_info.get("description") or group_info.get("date"):
@@ -665,20 +716,57 @@ def _build_review_action(status: str) -> str:
         return "Informe rechazado"
     return "Revisión parcial guardada"
 
-def _build_supervisor_reports() -> list[dict]:
+def _parse_positive_int(value, default: int | None = None) -> int | None:
+    try:
+        parsed = int(value)
+    except (TypeError, ValueError):
+        return default
+    return parsed if parsed > 0 else default
+
+def _listing_page_args(default_limit: int) -> tuple[int, int | None]:
+    limit = _parse_positive_int(request.args.get("limit"), default_limit)
+    after_id = _parse_positive_int(request.args.get("after_id"))
+    return min(limit, MAX_LIST_LIMIT), after_id
+
+def _listing_filters(user: dict | None) -> dict:
+    status = request.args.get("status", "").strip().lower()
+    filters = {
+        "review_status": status if status in ALLOWED_REVIEW_STATUS else None,
+        "period_key": request.args.get("period", "").strip() or None,
+        "contractor": request.args.get("contractor", "").strip() or None,
+        "contractor_contains": request.args.get("contractor_q", "").strip() or None,
+    }
+    if _is_contractor_user(user):
+        filters["owner_id"] = str(user.get("id") or "")
+        filters["owner_username"] = str(user.get("username") or "")
+    else:
+        owner = request.args.get("owner", "").strip()
+        if owner:
+            filters["owner_username"] = owner
+    return filters
+
+def _next_cursor(items: list[dict], limit: int) -> int | None:
+    if len(items) < limit:
+        return None
+    return items[-1]["id"]
+
+def _build_supervisor_reports(
+    filters: dict,
+    limit: int = 200,
+    after_id: int | None = None,
+) -> list[dict]:
     reports = []
-    for item in list_submissions(limit=200):
-        data = item.get("data") or {}
-        review = data.get("supervisor_review") if isinstance(data.get("supervisor_review"), dict) else {}
-        status = str(review.get("status", "pendiente")).lower()
-        if status not in ALLOWED_REVIEW_STATUS:
-            status = "pendiente"
+    summaries = list_submission_summaries(
+        SUPERVISOR_REPORT_FIELDS, limit=limit, after_id=after_id, **filters
+    )
+    for item in summaries:
+        data = item["data"]
         reports.append(
             {
                 "id": item["id"],
-                "contractor": str(data.get("contratista", "")).strip(),
-                "period": _extract_period_key(data),
-                "status": status,
+                "contractor": data["contratista"],
+                "period": data["period_key"],
+                "status": data["supervisor_review"]["status"],
                 "docUrl": url_for("download_file", record_id=item["id"], doc_key="inf_supervision"),
             }
         )
@@ -699,7 +787,7 @@ def _build_supervisor_detail(record_id: int) -> tuple[dict | None, int]:
         "contratista": str(data.get("contratista", "")).strip(),
         "contrato_no": str(data.get("contrato_no", "")).strip(),
         "objeto_contractual": str(data.get("objeto_contractual", "")).strip(),
-        "periodo": _extract_period_key(data),
+        "periodo": extract_period_key(data),
     }
     return (
         {
@@ -736,10 +824,13 @@ def _set_submission_owner(data: dict, user: dict) -> None:
     data["_app_meta"] = meta
 
 def _is_submission_owned_by_user(item: dict, user: dict | None) -> bool:
-    if not user:
-        return False
     data = item.get("data") if isinstance(item, dict) else None
     owner_id, owner_username = _extract_submission_owner(data)
+    return _is_owner_match(owner_id, owner_username, user)
+
+def _is_owner_match(owner_id: str, owner_username: str, user: dict | None) -> bool:
+    if not user:
+        return False
     user_id = str(user.get("id") or "").strip()
     username = str(user.get("username") or "").strip().lower()
     if owner_id and user_id and owner_id == user_id:
@@ -749,7 +840,9 @@ def _is_submission_owned_by_user(item: dict, user: dict | None) -> bool:
     return False
 
 def _submission_fingerprint(data: dict) -> str:
-    payload = dict(data)
+    # Stored payloads carry blob references; normalize inline data URLs the
+    # same way so imported backups match the records they came from.
+    payload = dehydrate_payload(data)
     meta = payload.get("_app_meta")
     if isinstance(meta, dict):
         sanitized_meta = dict(meta)
@@ -759,11 +852,11 @@ def _submission_fingerprint(data: dict) -> str:
     return hashlib.sha256(raw.encode("utf-8")).hexdigest()
 
 def _list_contractor_submissions(user: dict) -> list[dict]:
-    return [
-        item
-        for item in list_submissions(limit=0)
-        if _is_submission_owned_by_user(item, user)
-    ]
+    return list_submissions(
+        limit=0,
+        owner_id=str(user.get("id") or ""),
+        owner_username=str(user.get("username") or ""),
+    )
 
 @app.route("/")
 @login_required
@@ -835,10 +928,19 @@ def logout():
 @login_required
 def history():
     user = _current_user()
-    items = list_submissions()
-    if _is_contractor_user(user):
-        items = [item for item in items if _is_submission_owned_by_user(item, user)]
-    return jsonify({"ok": True, "items": items})
+    filters = _listing_filters(user)
+    limit, after_id = _listing_page_args(20)
+    items = list_submission_summaries(
+        HISTORY_SUMMARY_FIELDS, limit=limit, after_id=after_id, **filters
+    )
+    return jsonify(
+        {
+            "ok": True,
+            "items": items,
+            "next_after_id": _next_cursor(items, limit),
+            "total": count_submissions(**filters),
+        }
+    )
 
 @app.route("/history/<int:record_id>")
 @login_required
@@ -849,6 +951,7 @@ def history_item(record_id: int):
     user = _current_user()
     if _is_contractor_user(user) and not _is_submission_owned_by_user(item, user):
         return jsonify({"ok": False, "error": "not_found"}), 404
+    item["data"] = resolve_blob_refs(item.get("data") or {})
     return jsonify({"ok": True, "item": item})
 
 @app.route("/history/<int:record_id>/delete", methods=["POST"])
@@ -856,8 +959,8 @@ def history_item(record_id: int):
 def history_delete(record_id: int):
     user = _current_user()
     if _is_contractor_user(user):
-        item = get_submission(record_id)
-        if not item or not _is_submission_owned_by_user(item, user):
+        item = get_submission_metadata(record_id)
+        if not item or not _is_owner_match(item["owner_id"], item["owner_username"], user):
             return jsonify({"ok": False, "error": "not_found"}), 404
     if delete_submission(record_id):
         return jsonify({"ok": True})
@@ -876,13 +979,8 @@ def debug_static():
             files = []
     return jsonify({"static_folder": static_dir, "exists": exists, "files": files})
 
-@app.route("/generate", methods=["POST"])
-@login_required
-def generate():
-    payload = request.get_json(force=True)
-    user = _current_user() or {}
-    if _is_contractor_user(user):
-        _set_submission_owner(payload, user)
+def _prepare_generation_payload(payload: dict) -> dict:
+    # Derived fields the templates need, filled in before the payload is saved.
     total_aportes = (
         _parse_money(payload.get("aportes_valor_salud", ""))
         + _parse_money(payload.get("aportes_valor_pension", ""))
@@ -896,34 +994,147 @@ def generate():
         ejecutadas_text
     )
     items = payload.get("obligaciones_directas_items")
+    payload.pop("obligaciones_directas_items_tercera", None)
     if isinstance(items, list):
-        converted_items = []
-        for item in items:
-            if not isinstance(item, dict):
-                converted_items.append(item)
-                continue
-            ejecutada_item = item.get("actividad_ejecutada", "")
-            item_copy = dict(item)
-            item_copy["actividad_ejecutada_tercera"] = _to_third_person_text(
-                ejecutada_item
-            )
-            converted_items.append(item_copy)
-        payload["obligaciones_directas_items_tercera"] = converted_items
-    record_id = save_submission(payload)
-    output_files = generate_documents(payload, record_id)
-    extra_pdf_files = _save_record_pdf_attachments(payload, record_id)
-    files = {}
-    for key, path in output_files.items():
-        files[key] = {
-            "name": os.path.basename(path),
-            "url": url_for("download_file", record_id=record_id, doc_key=key),
+        # Index-aligned with obligaciones_directas_items; only the converted
+        # text is kept so evidence is not stored twice.
+        payload["obligaciones_directas_ejecutadas_tercera_items"] = [
+            _to_third_person_text(item.get("actividad_ejecutada", ""))
+            if isinstance(item, dict)
+            else ""
+            for item in items
+        ]
+    return payload
+
+def _timed_json(body: dict, stages: dict, status: int = 200):
+    # JSON response with the stage timings as a "timings" field and a
+    # Server-Timing header (shown in the browser's network panel).
+    response = jsonify({**body, "timings": stages})
+    response.status_code = status
+    if stages:
+        response.headers["Server-Timing"] = server_timing_header(stages)
+    return response
+
+@app.route("/generate", methods=["POST"])
+@login_required
+def generate():
+    timings = Timings()
+    with timings.span("parse"):
+        payload = drop_blob_refs(request.get_json(force=True))
+    user = _current_user() or {}
+    if _is_contractor_user(user):
+        _set_submission_owner(payload, user)
+    with timings.span("third_person"):
+        _prepare_generation_payload(payload)
+    with timings.span("save_submission"):
+        record_id = save_submission(payload)
+    if LAZY_GENERATION:
+        files = {
+            key: f"{record_id:05d}_{filename}" for key, filename in TEMPLATE_FILES.items()
         }
+        with timings.span("attachments"):
+            extra_pdf_files = _save_record_pdf_attachments(payload, record_id)
+        for index, filename in enumerate(extra_pdf_files, start=1):
+            files[f"adjunto_pdf_{index}"] = filename
+        record_timings(timings.stages)
+        return _timed_json(
+            {
+                "ok": True,
+                "record_id": record_id,
+                "files": _generated_files_payload(record_id, files),
+            },
+            timings.stages,
+        )
+    with timings.span("queue"):
+        job_id = create_generation_job(
+            record_id,
+            [*TEMPLATE_FILES.keys(), GENERATION_ATTACHMENTS_STEP],
+            created_by=str(user.get("id") or ""),
+        )
+        submit_generation_job(job_id)
+    record_timings(timings.stages)
+    return _timed_json(
+        {
+            "ok": True,
+            "record_id": record_id,
+            "job_id": job_id,
+            "status_url": url_for("generation_job_status", job_id=job_id),
+        },
+        timings.stages,
+        202,
+    )
+
+def _run_generation_job(job: dict) -> None:
+    job_id = job["id"]
+    record_id = job["submission_id"]
+    timings = Timings()
+    with timings.span("load_submission"):
+        item = get_submission(record_id)
+    if not item:
+        fail_generation_job(job_id, "submission_not_found")
+        return
+    payload = item.get("data") or {}
+
+    def progress(step: str, state: str) -> None:
+        update_generation_job_progress(job_id, step, state)
+
+    render_keys: dict = {}
+    document_timings: dict = {}
+    with timings.span("documents"):
+        output_files = generate_documents(
+            payload, record_id, timings=document_timings, progress=progress, render_keys=render_keys
+        )
+    # Per document and stage, e.g. inf_gestion.render or anexo.images.
+    for key, stages in document_timings.items():
+        timings.update(stages, prefix=f"{key}.")
+    save_render_keys(record_id, render_keys)
+    progress(GENERATION_ATTACHMENTS_STEP, "running")
+    with timings.span("attachments"):
+        extra_pdf_files = _save_record_pdf_attachments(payload, record_id)
+    progress(GENERATION_ATTACHMENTS_STEP, "done")
+    files = {key: os.path.basename(path) for key, path in output_files.items()}
     for index, filename in enumerate(extra_pdf_files, start=1):
-        files[f"adjunto_pdf_{index}"] = {
-            "name": filename,
-            "url": url_for("download_extra_file", record_id=record_id, filename=filename),
-        }
-    return jsonify({"ok": True, "record_id": record_id, "files": files})
+        files[f"adjunto_pdf_{index}"] = filename
+    record_timings(timings.stages)
+    finish_generation_job(job_id, files, timings.stages)
+
+set_job_handler(_run_generation_job)
+
+def _generated_files_payload(record_id: int, files: dict) -> dict:
+    result = {}
+    for key, filename in files.items():
+        if key in TEMPLATE_FILES:
+            url = url_for("download_file", record_id=record_id, doc_key=key)
+        else:
+            url = url_for("download_extra_file", record_id=record_id, filename=filename)
+        result[key] = {"name": filename, "url": url}
+    return result
+
+@app.route("/generate/jobs/<int:job_id>")
+@login_required
+def generation_job_status(job_id: int):
+    job = get_generation_job(job_id)
+    if not job:
+        return jsonify({"ok": False, "error": "not_found"}), 404
+    user = _current_user()
+    if _is_contractor_user(user):
+        metadata = get_submission_metadata(job["submission_id"]) or {}
+        if not _is_owner_match(metadata.get("owner_id", ""), metadata.get("owner_username", ""), user):
+            return jsonify({"ok": False, "error": "not_found"}), 404
+    record_id = job["submission_id"]
+    return _timed_json(
+        {
+            "ok": True,
+            "job_id": job["id"],
+            "record_id": record_id,
+            "status": job["status"],
+            "documents": job["progress"],
+            "cache_hits": [key for key, state in job["progress"].items() if state == "cached"],
+            "files": _generated_files_payload(record_id, job["files"]) if job["status"] == "done" else {},
+            "error": job["error"],
+        },
+        job["timings"],
+    )
 
 @app.route("/contractor/history/export")
 @login_required
@@ -943,7 +1154,7 @@ def contractor_export_history():
         "items": [
             {
                 "created_at": item.get("created_at"),
-                "data": item.get("data") or {},
+                "data": resolve_blob_refs(item.get("data") or {}),
             }
             for item in records
         ],
@@ -1043,15 +1254,43 @@ def contractor_import_history():
         }
     )
 
+def _ensure_output_file(record_id: int, doc_key: str) -> str | None:
+    output_path = os.path.join(OUTPUT_DIR, f"{record_id:05d}_{TEMPLATE_FILES[doc_key]}")
+    if os.path.isfile(output_path):
+        return output_path
+    # Never rendered (lazy mode) or removed since, e.g. after a database
+    # import or an output cleanup: build it now from the stored payload.
+    # Concurrent first downloads may both render; the writes are atomic.
+    item = get_submission(record_id)
+    if not item:
+        return None
+    render_keys: dict = {}
+    outputs = generate_documents(
+        item.get("data") or {}, record_id, keys=[doc_key], render_keys=render_keys
+    )
+    save_render_keys(record_id, render_keys)
+    return outputs[doc_key]
+
+def _can_download_record(record_id: int, user: dict | None) -> bool:
+    # Same rule as history_item: contractors only reach their own reports.
+    if not _is_contractor_user(user):
+        return True
+    item = get_submission_metadata(record_id)
+    return bool(item and _is_owner_match(item["owner_id"], item["owner_username"], user))
+
 @app.route("/download/<int:record_id>/<doc_key>")
 @login_required
 def download_file(record_id: int, doc_key: str):
     filename = TEMPLATE_FILES.get(doc_key)
     if not filename:
         return jsonify({"ok": False, "error": "not_found"}), 404
+    # Checked before _ensure_output_file, which renders missing documents: a
+    # contractor must not be able to have another user's report built.
+    if not _can_download_record(record_id, _current_user()):
+        return jsonify({"ok": False, "error": "not_found"}), 404
     output_name = f"{record_id:05d}_{filename}"
-    output_path = os.path.join(OUTPUT_DIR, output_name)
-    if not os.path.isfile(output_path):
+    output_path = _ensure_output_file(record_id, doc_key)
+    if not output_path:
         return jsonify({"ok": False, "error": "not_found"}), 404
     return send_file(
         output_path,
@@ -1068,6 +1307,8 @@ def download_extra_file(record_id: int, filename: str):
     expected_prefix = f"{record_id:05d}_"
     if not safe_name.startswith(expected_prefix):
         return jsonify({"ok": False, "error": "not_found"}), 404
+    if not _can_download_record(record_id, _current_user()):
+        return jsonify({"ok": False, "error": "not_found"}), 404
     output_path = os.path.join(OUTPUT_DIR, safe_name)
     if not os.path.isfile(output_path):
         return jsonify({"ok": False, "error": "not_found"}), 404
@@ -1077,10 +1318,158 @@ def download_extra_file(record_id: int, filename: str):
         download_name=safe_name,
     )
 
+@app.route("/blobs/<digest>")
+@login_required
+def blob_file(digest: str):
+    blob = get_blob(digest) if re.fullmatch(r"[0-9a-f]{64}", digest) else None
+    if not blob:
+        return jsonify({"ok": False, "error": "not_found"}), 404
+    user = _current_user()
+    if user.get("role") not in {ROLE_SUPERVISOR, ROLE_SUPER_ADMIN} and not blob_referenced_by_owner(
+        digest, user.get("id"), user.get("username")
+    ):
+        # Same answer as a missing blob, like history_item for foreign reports.
+        return jsonify({"ok": False, "error": "not_found"}), 404
+    response = send_file(
+        io.BytesIO(blob["data"]),
+        mimetype=blob["mime_type"],
+        max_age=31536000,
+    )
+    # Content-addressed, so it never changes, but only this user may see it.
+    response.cache_control.public = False
+    response.cache_control.private = True
+    return response
+
 @app.route("/api/supervisor/reports")
 @supervisor_required
 def supervisor_reports():
-    return jsonify({"ok": True, "reports": _build_supervisor_reports()})
+    filters = _listing_filters(_current_user())
+    limit, after_id = _listing_page_args(200)
+    reports = _build_supervisor_reports(filters, limit=limit, after_id=after_id)
+    # Stat cards: the other filters applied, split by review status.
+    status_filters = {key: value for key, value in filters.items() if key != "review_status"}
+    return jsonify(
+        {
+            "ok": True,
+            "reports": reports,
+            "next_after_id": _next_cursor(reports, limit),
+            "total": count_submissions(**filters),
+            "status_totals": {
+                status: count_submissions(**status_filters, review_status=status)
+                for status in sorted(ALLOWED_REVIEW_STATUS)
+            },
+        }
+    )
+
+def _export_records(filters: dict) -> list[dict]:
+    record_id = _parse_positive_int(request.args.get("record_id"))
+    if record_id:
+        metadata = get_submission_metadata(record_id)
+        if not metadata:
+            return []
+        return [{"id": record_id, "contractor": metadata.get("contractor") or ""}]
+    records = []
+    after_id = None
+    while True:
+        page = list_submission_summaries(
+            ["contratista"], limit=MAX_LIST_LIMIT, after_id=after_id, **filters
+        )
+        records.extend(
+            {"id": item["id"], "contractor": item["data"]["contratista"]} for item in page
+        )
+        if len(page) < MAX_LIST_LIMIT:
+            return records
+        after_id = page[-1]["id"]
+
+def _export_entries(records: list[dict]):
+    # Runs while the response streams: documents are rendered on demand, and
+    # the attached PDFs are whatever the record has in the output folder.
+    extras: dict[str, list[str]] = {}
+    with os.scandir(OUTPUT_DIR) as files:
+        for entry in files:
+            if entry.name.lower().endswith(".pdf") and entry.is_file():
+                extras.setdefault(entry.name.split("_", 1)[0], []).append(entry.name)
+    for record in records:
+        prefix = f"{record['id']:05d}_"
+        folder = f"{record['id']:05d}_{_safe_file_part(record['contractor'], 'informe')}"
+        for doc_key, filename in TEMPLATE_FILES.items():
+            output_path = _ensure_output_file(record["id"], doc_key)
+            if output_path:
+                yield f"{folder}/{filename}", output_path
+        for filename in sorted(extras.get(prefix[:-1], [])):
+            yield f"{folder}/{filename[len(prefix):]}", os.path.join(OUTPUT_DIR, filename)
+
+@app.route("/api/supervisor/reports/export")
+@supervisor_required
+def supervisor_export_reports():
+    records = _export_records(_listing_filters(_current_user()))
+    if not records:
+        return jsonify({"ok": False, "error": "not_found"}), 404
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    return Response(
+        stream_zip(_export_entries(records)),
+        mimetype="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="informes_{stamp}.zip"'},
+    )
+
+@app.route("/api/supervisor/reports/period-document")
+@supervisor_required
+def supervisor_period_document():
+    filters = _listing_filters(_current_user())
+    period_key = filters.pop("period_key") or ""
+    if not re.fullmatch(r"\d{4}-\d{2}", period_key):
+        return jsonify({"ok": False, "error": "invalid_period"}), 400
+    timings = Timings()
+    with timings.span("query"):
+        reports = list_period_reviews(period_key, **filters)
+    if not reports:
+        return jsonify({"ok": False, "error": "not_found"}), 404
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    # Built in a temporary file and sent from memory: each request may use
+    # different filters, so there is no single file to keep in output/.
+    fd, temp_path = tempfile.mkstemp(prefix="consolidado_", suffix=".docx", dir=OUTPUT_DIR)
+    os.close(fd)
+    try:
+        with timings.span("build"):
+            build_period_document(period_key, reports, temp_path)
+        with open(temp_path, "rb") as handle:
+            content = handle.read()
+    finally:
+        os.remove(temp_path)
+    response = send_file(
+        io.BytesIO(content),
+        mimetype="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+        as_attachment=True,
+        download_name=f"CONSOLIDADO_SUPERVISION_{period_key}.docx",
+    )
+    response.headers["Server-Timing"] = server_timing_header(timings.stages)
+    return response
+
+@app.route("/api/search")
+@supervisor_required
+def search_reports():
+    query = request.args.get("q", "").strip()
+    limit = min(_parse_positive_int(request.args.get("limit"), 20), MAX_LIST_LIMIT)
+    found = search_submissions(query, limit=limit)
+    if found is None:
+        return jsonify({"ok": False, "error": "search_unavailable"}), 503
+    matches, truncated = found
+    results = [
+        {
+            "id": item["id"],
+            "created_at": item["created_at"],
+            "contractor": item["contractor"],
+            "contract_no": item["contract_no"],
+            "period": item["period_key"],
+            "status": item["review_status"],
+            "score": item["score"],
+            "snippet": item["snippet"],
+            "docUrl": url_for("download_file", record_id=item["id"], doc_key="inf_supervision"),
+        }
+        for item in matches
+    ]
+    return jsonify({"ok": True, "query": query, "results": results, "truncated": truncated})
 
 @app.route("/api/supervisor/report/<int:record_id>")
 @supervisor_required
@@ -1091,14 +1480,9 @@ def supervisor_report_detail(record_id: int):
 @app.route("/api/supervisor/report/<int:record_id>/review", methods=["POST"])
 @supervisor_required
 def supervisor_report_review(record_id: int):
-    item = get_submission(record_id)
-    if not item:
+    if not get_submission_metadata(record_id):
         return jsonify({"ok": False, "error": "not_found"}), 404
 
-    current_data = item.get("data") or {}
-    current_review = current_data.get("supervisor_review") if isinstance(current_data.get("supervisor_review"), dict) else {}
-    current_history = current_review.get("history") if isinstance(current_review.get("history"), list) else []
-
     payload = request.get_json(force=True) or {}
     status = str(payload.get("status", "pendiente")).strip().lower()
     if status not in ALLOWED_REVIEW_STATUS:
@@ -1129,8 +1513,10 @@ def supervisor_report_review(record_id: int):
         if normalized_activities:
             activities_to_validate = normalized_activities
         else:
-            default_activities = _build_default_review_activities(current_data)
-            saved_activities = current_review.get("actividades") if isinstance(current_review.get("actividades"), list) else []
+            item = get_submission(record_id) or {}
+            current_review = get_review(record_id) or {}
+            default_activities = _build_default_review_activities(item.get("data") or {})
+            saved_activities = current_review.get("actividades") or []
             activities_to_validate = _merge_review_activities(default_activities, saved_activities)
 
         if any(
@@ -1147,20 +1533,32 @@ def supervisor_report_review(record_id: int):
         "status": status,
         "by": user.get("username", "supervisor"),
     }
-    current_history.append(history_entry)
-
-    current_data["supervisor_review"] = {
-        "status": status,
-        "observacion_global": str(payload.get("observacion_global", "")).strip(),
-        "actividades": normalized_activities,
-        "history": current_history,
-    }
-
-    if not update_submission_data(record_id, current_data):
+    observacion_global = str(payload.get("observacion_global", "")).strip()
+    if not save_review(record_id, status, observacion_global, normalized_activities, history_entry):
         return jsonify({"ok": False, "error": "not_found"}), 404
 
     return jsonify({"ok": True})
 
+@app.route("/api/supervisor/report/<int:record_id>/review/activity/<activity_id>", methods=["POST"])
+@supervisor_required
+def supervisor_report_review_activity(record_id: int, activity_id: str):
+    payload = request.get_json(force=True) or {}
+    act_status = str(payload.get("status", "pendiente")).strip().lower()
+    if act_status not in ALLOWED_ACTIVITY_STATUS:
+        act_status = "pendiente"
+    user = _current_user() or {}
+    review_status = update_review_activity(
+        record_id,
+        activity_id,
+        act_status,
+        str(payload.get("obs", "")).strip(),
+        desc=str(payload.get("desc", "")).strip(),
+        updated_by=user.get("username", "supervisor"),
+    )
+    if review_status is None:
+        return jsonify({"ok": False, "error": "not_found"}), 404
+    return jsonify({"ok": True, "status": review_status})
+
 def _render_admin(message: str | None = None, error: str | None = None):
     return render_template(
         "admin.html",
@@ -1172,6 +1570,10 @@ def _render_admin(message: str | None = None, error: str | None = None):
         user=_current_user(),
         db_path=get_database_path(),
         backups_dir=get_backups_dir(),
+        rerender_run=get_rerender_run(),
+        timing_stats=timing_histogram(),
+        timing_buckets=HISTOGRAM_BUCKETS_MS,
+        timing_window=TIMING_WINDOW,
     )
 
 @app.route("/admin")
@@ -1179,12 +1581,18 @@ def _render_admin(message: str | None = None, error: str | None = None):
 def admin_panel():
     return _render_admin()
 
+@app.route("/admin/template-cache")
+@admin_required
+def admin_template_cache():
+    return jsonify({"ok": True, "cache": template_cache_stats(), "manifest": manifest_summary()})
+
 @app.route("/admin/database/export")
 @admin_required
 def admin_export_database():
     db_path = get_database_path()
     if not os.path.isfile(db_path):
         init_db()
+    checkpoint_database()
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     return send_file(
         db_path,
@@ -1216,6 +1624,10 @@ def admin_import_database():
             temp_path = temp_file.name
         upload.save(temp_path)
 
+        # Running jobs finish on the old file and their worker threads exit,
+        # so no idle thread keeps it open (Windows cannot replace open files).
+        # The next /generate starts a new executor.
+        shutdown_generation_workers(wait=True)
         ok, backup_path, error = import_database_file(temp_path)
         if not ok:
             return _render_admin(error=error or "No se pudo importar la base de datos.")
@@ -1237,6 +1649,33 @@ def admin_import_database():
             except OSError:
                 pass
 
+@app.route("/admin/timings")
+@admin_required
+def admin_timings():
+    return jsonify(
+        {
+            "ok": True,
+            "window": TIMING_WINDOW,
+            "buckets_ms": list(HISTOGRAM_BUCKETS_MS),
+            "stages": timing_histogram(),
+        }
+    )
+
+@app.route("/admin/rerender", methods=["GET"])
+@admin_required
+def admin_rerender_status():
+    return jsonify({"ok": True, "run": get_rerender_run()})
+
+@app.route("/admin/rerender", methods=["POST"])
+@admin_required
+def admin_start_rerender():
+    run_id = start_rerender(session.get("username") or "")
+    if run_id is None:
+        return _render_admin(error="Ya hay una regeneración de documentos en curso.")
+    return _render_admin(
+        message=f"Regeneración #{run_id} iniciada en segundo plano. Recarga esta página para ver el avance."
+    )
+
 @app.route("/admin/roles", methods=["POST"])
 @admin_required
 def admin_create_role():
@@ -1373,8 +1812,17 @@ def admin_delete_user(user_id: int):
     return _render_admin(message="Usuario eliminado correctamente.")
 
 if __name__ == "__main__":
+    # Needed by the document process pool in the packaged .exe.
+    multiprocessing.freeze_support()
+    try:
+        load_template_manifest()
+    except TemplateManifestError as exc:
+        print(f"Plantilla DOCX invalida: {exc}", file=sys.stderr)
+        sys.exit(1)
     init_db()
     _ensure_default_roles_and_admin()
+    resume_generation_jobs()
+    resume_rerender()
     host = "127.0.0.1"
     port = 5050
     url = f"http://{host}:{port}"
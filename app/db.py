@@ -1,9 +1,17 @@
+import base64
+import binascii
+import hashlib
 import json
 import os
+import re
 import shutil
 import sqlite3
 import sys
 import tempfile
+import threading
+import time
+import zlib
+from contextlib import closing
 from datetime import datetime
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -19,8 +27,131 @@ def _resolve_data_root() -> str:
 DATA_ROOT = _resolve_data_root()
 DB_PATH = os.path.join(DATA_ROOT, "data", "app.db")
 BACKUPS_DIR = os.path.join(DATA_ROOT, "backups")
-DB_SCHEMA_VERSION = 1
+DB_SCHEMA_VERSION = 8
 REQUIRED_TABLES = {"submissions", "roles", "users"}
+ALLOWED_REVIEW_STATUS = {"pendiente", "aprobado", "rechazado"}
+# Supervisor verdicts on each activity of a review.
+ACTIVITY_STATUSES = ("cumplida", "no cumplida", "pendiente")
+SUBMISSION_META_COLUMNS = (
+    "owner_id",
+    "owner_username",
+    "contractor",
+    "contract_no",
+    "period_key",
+    "review_status",
+    "payload_size",
+)
+MIGRATION_BATCH_SIZE = 500
+# Jobs interrupted this many times (e.g. the process died mid-render) are
+# marked failed instead of being resumed again.
+GENERATION_JOB_MAX_ATTEMPTS = 3
+# Columns whose per-value row counts are kept in submission_counts.
+COUNTED_SUBMISSION_COLUMNS = ("review_status", "period_key", "contractor")
+# Summary paths answered from indexed columns instead of json_extract.
+SUMMARY_COLUMN_FIELDS = {
+    "contratista": "contractor",
+    "contrato_no": "contract_no",
+    "period_key": "period_key",
+    "supervisor_review.status": "review_status",
+    "_app_meta.created_by_id": "owner_id",
+    "_app_meta.created_by_username": "owner_username",
+    "payload_size": "payload_size",
+}
+_SUMMARY_SEGMENT_RE = re.compile(r"\w+")
+SEARCH_COLUMNS = ("contratista", "contrato_no", "objeto_contractual", "actividades", "observaciones")
+# bm25 weights, same order as SEARCH_COLUMNS.
+SEARCH_COLUMN_WEIGHTS = (5.0, 5.0, 2.0, 1.0, 1.0)
+_SEARCH_TOKEN_RE = re.compile(r"\w+")
+# Matches ranked per query, newest first (see search_submissions).
+SEARCH_RANK_WINDOW = 1000
+BLOB_REF_PREFIX = "blob:sha256:"
+BLOB_URL_KEYS = {"dataUrl", "data_url"}
+_BLOB_REF_RE = re.compile(r"blob:sha256:([0-9a-f]{64})")
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.environ.get(name, default))
+    except (TypeError, ValueError):
+        return default
+
+DB_BUSY_TIMEOUT_MS = _env_int("APP_DB_BUSY_TIMEOUT_MS", 5000)
+DB_MMAP_SIZE = _env_int("APP_DB_MMAP_SIZE", 64 * 1024 * 1024)
+# Negative values are KiB (SQLite convention), positive values are pages.
+DB_CACHE_SIZE = _env_int("APP_DB_CACHE_SIZE", -16000)
+# Storage codec for submissions.data_json: "zlib" writes a BLOB made of a
+# header byte plus zlib-compressed UTF-8 JSON, "json" writes plain TEXT.
+# Both forms are always readable; reencode_submissions() converts old rows.
+PAYLOAD_CODEC = os.environ.get("APP_DB_PAYLOAD_CODEC", "zlib").strip().lower()
+PAYLOAD_ZLIB_LEVEL = _env_int("APP_DB_PAYLOAD_ZLIB_LEVEL", 6)
+PAYLOAD_CODEC_HEADERS = {"zlib": 0x01}
+
+# One reusable connection per thread. close_connections() bumps the
+# generation so every thread reopens (e.g. after the database file is
+# replaced on import); the registry lets idle handles be closed.
+_pool_lock = threading.Lock()
+_pool_connections: dict[int, sqlite3.Connection] = {}
+_pool_generation = 0
+_pool_local = threading.local()
+
+def _open_connection(db_path: str) -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    conn = sqlite3.connect(
+        db_path,
+        timeout=max(DB_BUSY_TIMEOUT_MS, 0) / 1000,
+        check_same_thread=False,
+    )
+    conn.row_factory = sqlite3.Row
+    conn.execute(f"PRAGMA busy_timeout = {int(DB_BUSY_TIMEOUT_MS)}")
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute(f"PRAGMA mmap_size = {int(DB_MMAP_SIZE)}")
+    conn.execute(f"PRAGMA cache_size = {int(DB_CACHE_SIZE)}")
+    # Lets SQL such as json_extract() read compressed payloads.
+    conn.create_function("payload_text", 1, _decode_payload_text, deterministic=True)
+    return conn
+
+def _close_quietly(conn: sqlite3.Connection) -> None:
+    try:
+        conn.close()
+    except sqlite3.Error:
+        pass
+
+def get_connection() -> sqlite3.Connection:
+    cached = getattr(_pool_local, "entry", None)
+    if cached and cached[0] == _pool_generation and cached[1] == DB_PATH:
+        return cached[2]
+
+    conn = _open_connection(DB_PATH)
+    thread_id = threading.get_ident()
+    with _pool_lock:
+        alive = {thread.ident for thread in threading.enumerate()}
+        for ident in [ident for ident in _pool_connections if ident not in alive]:
+            _close_quietly(_pool_connections.pop(ident))
+        previous = _pool_connections.get(thread_id)
+        if previous is not None and previous is not conn:
+            _close_quietly(previous)
+        _pool_connections[thread_id] = conn
+        _pool_local.entry = (_pool_generation, DB_PATH, conn)
+    return conn
+
+def close_connections() -> None:
+    # Retires every pooled handle. The caller's, and those of threads that
+    # have exited, are closed now; a live thread closes its own the next time
+    # it calls get_connection(), so a job in the middle of a query is never
+    # cut off by another thread.
+    global _pool_generation
+    thread_id = threading.get_ident()
+    with _pool_lock:
+        _pool_generation += 1
+        alive = {thread.ident for thread in threading.enumerate()}
+        for ident in [ident for ident in _pool_connections if ident == thread_id or ident not in alive]:
+            _close_quietly(_pool_connections.pop(ident))
+    _pool_local.entry = None
+
+def checkpoint_database() -> None:
+    if not os.path.isfile(DB_PATH):
+        return
+    get_connection().execute("PRAGMA wal_checkpoint(TRUNCATE)")
 
 def _seed_db_candidates() -> list[str]:
     if not getattr(sys, "frozen", False):
@@ -62,13 +193,13 @@ def _merge_seed_data(seed_db_path: str) -> None:
         shutil.copy2(seed_db_path, DB_PATH)
         return
 
-    with sqlite3.connect(DB_PATH) as target_conn, sqlite3.connect(seed_db_path) as seed_conn:
+    with get_connection() as target_conn, sqlite3.connect(seed_db_path) as seed_conn:
         target_conn.execute("PRAGMA foreign_keys = ON")
         target_conn.executescript(SCHEMA_SQL)
         _ensure_user_columns(target_conn)
+        _migrate_schema(target_conn)
 
         seed_conn.row_factory = sqlite3.Row
-        target_conn.row_factory = sqlite3.Row
 
         # Do not merge seeded submissions into an existing DB.
         # If we reinsert when submissions is empty, deleted history entries
@@ -153,7 +284,110 @@ SCHEMA_SQL = """
 CREATE TABLE IF NOT EXISTS submissions (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     created_at TEXT NOT NULL,
-    data_json TEXT NOT NULL
+    data_json TEXT NOT NULL,
+    owner_id TEXT NOT NULL DEFAULT '',
+    owner_username TEXT NOT NULL DEFAULT '',
+    contractor TEXT NOT NULL DEFAULT '',
+    contract_no TEXT NOT NULL DEFAULT '',
+    period_key TEXT NOT NULL DEFAULT '',
+    review_status TEXT NOT NULL DEFAULT 'pendiente',
+    payload_size INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS blobs (
+    sha256 TEXT PRIMARY KEY,
+    mime_type TEXT NOT NULL DEFAULT 'application/octet-stream',
+    size INTEGER NOT NULL DEFAULT 0,
+    ref_count INTEGER NOT NULL DEFAULT 0,
+    data BLOB NOT NULL,
+    created_at TEXT NOT NULL
+);
+
+-- Which submission holds which blob: ref_count is the number of rows here,
+-- and /blobs/<sha256> checks access through it.
+CREATE TABLE IF NOT EXISTS submission_blobs (
+    submission_id INTEGER NOT NULL,
+    sha256 TEXT NOT NULL,
+    PRIMARY KEY (submission_id, sha256)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_submission_blobs_sha256 ON submission_blobs(sha256, submission_id);
+
+CREATE TABLE IF NOT EXISTS submission_counts (
+    key TEXT PRIMARY KEY,
+    total INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS reviews (
+    submission_id INTEGER PRIMARY KEY,
+    status TEXT NOT NULL DEFAULT 'pendiente',
+    observacion_global TEXT NOT NULL DEFAULT '',
+    updated_at TEXT NOT NULL,
+    updated_by TEXT NOT NULL DEFAULT ''
+);
+
+CREATE TABLE IF NOT EXISTS review_activities (
+    submission_id INTEGER NOT NULL,
+    activity_id TEXT NOT NULL,
+    position INTEGER NOT NULL DEFAULT 0,
+    description TEXT NOT NULL DEFAULT '',
+    status TEXT NOT NULL DEFAULT 'pendiente',
+    obs TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (submission_id, activity_id)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS review_events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    submission_id INTEGER NOT NULL,
+    created_at TEXT NOT NULL,
+    action TEXT NOT NULL DEFAULT '',
+    status TEXT NOT NULL DEFAULT 'pendiente',
+    username TEXT NOT NULL DEFAULT '',
+    -- Set on single-activity updates: the activity and its new observation
+    -- (status is then the activity's status).
+    activity_id TEXT NOT NULL DEFAULT '',
+    obs TEXT NOT NULL DEFAULT ''
+);
+
+CREATE INDEX IF NOT EXISTS idx_review_events_submission ON review_events(submission_id, id);
+
+CREATE TABLE IF NOT EXISTS generation_jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    submission_id INTEGER NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued',
+    progress_json TEXT NOT NULL DEFAULT '{}',
+    files_json TEXT NOT NULL DEFAULT '{}',
+    timings_json TEXT NOT NULL DEFAULT '{}',
+    error TEXT NOT NULL DEFAULT '',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_by TEXT NOT NULL DEFAULT '',
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_generation_jobs_status ON generation_jobs(status, id);
+
+-- Render key (template + relevant payload hash) of each document last
+-- written to output/, so a bulk re-render can skip unchanged ones.
+CREATE TABLE IF NOT EXISTS rendered_documents (
+    submission_id INTEGER NOT NULL,
+    doc_key TEXT NOT NULL,
+    render_key TEXT NOT NULL,
+    rendered_at TEXT NOT NULL,
+    PRIMARY KEY (submission_id, doc_key)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS rerender_runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    status TEXT NOT NULL DEFAULT 'running',
+    last_id INTEGER NOT NULL DEFAULT 0,
+    scanned INTEGER NOT NULL DEFAULT 0,
+    rendered INTEGER NOT NULL DEFAULT 0,
+    skipped INTEGER NOT NULL DEFAULT 0,
+    failed INTEGER NOT NULL DEFAULT 0,
+    error TEXT NOT NULL DEFAULT '',
+    created_by TEXT NOT NULL DEFAULT '',
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
 );
 
 CREATE TABLE IF NOT EXISTS roles (
@@ -176,16 +410,95 @@ CREATE TABLE IF NOT EXISTS users (
 );
 """
 
+# Created after _ensure_submission_columns so legacy tables already have the columns.
+SUBMISSION_INDEXES_SQL = """
+CREATE INDEX IF NOT EXISTS idx_submissions_owner_id ON submissions(owner_id, id);
+CREATE INDEX IF NOT EXISTS idx_submissions_owner_username ON submissions(owner_username, id);
+CREATE INDEX IF NOT EXISTS idx_submissions_contractor ON submissions(contractor, id);
+CREATE INDEX IF NOT EXISTS idx_submissions_contract_no ON submissions(contract_no, id);
+CREATE INDEX IF NOT EXISTS idx_submissions_period_key ON submissions(period_key, id);
+CREATE INDEX IF NOT EXISTS idx_submissions_review_status ON submissions(review_status, id);
+-- Covering index for summary listings: rows keep data_json before these
+-- columns, so reading them from the table would walk its overflow pages.
+CREATE INDEX IF NOT EXISTS idx_submissions_summary ON submissions(
+    id, created_at, owner_id, owner_username, contractor, contract_no,
+    period_key, review_status, payload_size
+);
+-- Covering index for the consolidated period document: one period's rows in
+-- contractor order without touching data_json.
+CREATE INDEX IF NOT EXISTS idx_submissions_period_summary ON submissions(
+    period_key, contractor, id, contract_no, review_status, created_at,
+    owner_id, owner_username
+);
+"""
+
+# Keeps submission_counts in sync: 'all' plus one key per counted column value
+# (e.g. 'review_status:aprobado'), so totals never need COUNT(*).
+SUBMISSION_TRIGGERS_SQL = """
+CREATE TRIGGER IF NOT EXISTS trg_submissions_count_insert
+AFTER INSERT ON submissions
+BEGIN
+    INSERT INTO submission_counts (key, total) VALUES
+        ('all', 1),
+        ('review_status:' || NEW.review_status, 1),
+        ('period_key:' || NEW.period_key, 1),
+        ('contractor:' || NEW.contractor, 1)
+    ON CONFLICT(key) DO UPDATE SET total = total + excluded.total;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_submissions_count_delete
+AFTER DELETE ON submissions
+BEGIN
+    UPDATE submission_counts SET total = total - 1
+    WHERE key IN (
+        'all',
+        'review_status:' || OLD.review_status,
+        'period_key:' || OLD.period_key,
+        'contractor:' || OLD.contractor
+    );
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_submissions_count_update
+AFTER UPDATE OF review_status, period_key, contractor ON submissions
+BEGIN
+    UPDATE submission_counts SET total = total - 1
+    WHERE key IN (
+        'review_status:' || OLD.review_status,
+        'period_key:' || OLD.period_key,
+        'contractor:' || OLD.contractor
+    );
+    INSERT INTO submission_counts (key, total) VALUES
+        ('review_status:' || NEW.review_status, 1),
+        ('period_key:' || NEW.period_key, 1),
+        ('contractor:' || NEW.contractor, 1)
+    ON CONFLICT(key) DO UPDATE SET total = total + excluded.total;
+END;
+"""
+
+# Created separately: SQLite builds without FTS5 keep working, just without search.
+SEARCH_SQL = """
+CREATE VIRTUAL TABLE IF NOT EXISTS submission_search USING fts5(
+    contratista,
+    contrato_no,
+    objeto_contractual,
+    actividades,
+    observaciones,
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '2 3'
+);
+"""
+
 def init_db() -> None:
     seed_db_path = _first_existing_seed_db()
     if seed_db_path:
         _merge_seed_data(seed_db_path)
 
     os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
-    with sqlite3.connect(DB_PATH) as conn:
+    with get_connection() as conn:
         conn.execute("PRAGMA foreign_keys = ON")
         conn.executescript(SCHEMA_SQL)
         _ensure_user_columns(conn)
+        _migrate_schema(conn)
         _set_schema_version(conn)
         conn.commit()
 
@@ -205,6 +518,7 @@ def create_database_backup(prefix: str = "backup") -> str:
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     backup_name = f"{prefix}_{timestamp}.db"
     backup_path = os.path.join(BACKUPS_DIR, backup_name)
+    checkpoint_database()
     shutil.copy2(DB_PATH, backup_path)
     return backup_path
 
@@ -213,7 +527,7 @@ def _validate_database_file(db_file_path: str) -> tuple[bool, str | None]:
         return False, "El archivo de base de datos no existe."
 
     try:
-        with sqlite3.connect(db_file_path) as conn:
+        with closing(sqlite3.connect(db_file_path)) as conn:
             conn.row_factory = sqlite3.Row
             row = conn.execute("PRAGMA integrity_check").fetchone()
             if not row or str(row[0]).lower() != "ok":
@@ -253,16 +567,27 @@ def import_database_file(db_file_path: str) -> tuple[bool, str | None, str | Non
 
         shutil.copy2(db_file_path, tmp_path)
 
-        with sqlite3.connect(tmp_path) as conn:
+        with closing(sqlite3.connect(tmp_path)) as conn:
             conn.execute("PRAGMA foreign_keys = ON")
             conn.executescript(SCHEMA_SQL)
             _ensure_user_columns(conn)
+            _migrate_schema(conn)
             _set_schema_version(conn)
+            # Render keys describe another install's output/ folder.
+            conn.execute("DELETE FROM rendered_documents")
             conn.commit()
+            # Fold any WAL content into the file itself before it is moved.
+            conn.execute("PRAGMA journal_mode = DELETE")
 
         if os.path.isfile(DB_PATH):
             backup_path = create_database_backup(prefix="preimport")
 
+        # WAL/SHM files belong to the old database; a stale WAL must never be
+        # replayed on top of the imported file.
+        close_connections()
+        for suffix in ("-wal", "-shm"):
+            if os.path.exists(DB_PATH + suffix):
+                os.remove(DB_PATH + suffix)
         os.replace(tmp_path, DB_PATH)
         return True, backup_path, None
     except (sqlite3.Error, OSError) as exc:
@@ -287,46 +612,750 @@ def _ensure_user_columns(conn: sqlite3.Connection) -> None:
         if name not in columns:
             conn.execute(f"ALTER TABLE users ADD COLUMN {name} {definition}")
 
+def _ensure_submission_columns(conn: sqlite3.Connection) -> None:
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(submissions)")}
+    required = {
+        "owner_id": "TEXT NOT NULL DEFAULT ''",
+        "owner_username": "TEXT NOT NULL DEFAULT ''",
+        "contractor": "TEXT NOT NULL DEFAULT ''",
+        "contract_no": "TEXT NOT NULL DEFAULT ''",
+        "period_key": "TEXT NOT NULL DEFAULT ''",
+        "review_status": "TEXT NOT NULL DEFAULT 'pendiente'",
+        "payload_size": "INTEGER NOT NULL DEFAULT 0",
+    }
+    for name, definition in required.items():
+        if name not in columns:
+            conn.execute(f"ALTER TABLE submissions ADD COLUMN {name} {definition}")
+
+def _ensure_generation_job_columns(conn: sqlite3.Connection) -> None:
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(generation_jobs)")}
+    if "timings_json" not in columns:
+        conn.execute("ALTER TABLE generation_jobs ADD COLUMN timings_json TEXT NOT NULL DEFAULT '{}'")
+
+def _ensure_review_event_columns(conn: sqlite3.Connection) -> None:
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(review_events)")}
+    for name in ("activity_id", "obs"):
+        if name not in columns:
+            conn.execute(f"ALTER TABLE review_events ADD COLUMN {name} TEXT NOT NULL DEFAULT ''")
+
+def _get_schema_version(conn: sqlite3.Connection) -> int:
+    row = conn.execute("PRAGMA user_version").fetchone()
+    return int(row[0]) if row else 0
+
+def _migrate_schema(conn: sqlite3.Connection) -> None:
+    current_version = _get_schema_version(conn)
+    _ensure_submission_columns(conn)
+    _ensure_generation_job_columns(conn)
+    _ensure_review_event_columns(conn)
+    conn.executescript(SUBMISSION_INDEXES_SQL)
+    conn.executescript(SUBMISSION_TRIGGERS_SQL)
+    if current_version < 2:
+        _backfill_submission_metadata(conn)
+    if current_version < 3:
+        _migrate_inline_blobs(conn)
+    if current_version < 4:
+        _rebuild_submission_counts(conn)
+    if current_version < 6:
+        _compact_third_person_items(conn)
+    if current_version < 7:
+        _migrate_reviews(conn)
+    if current_version < 8:
+        _migrate_submission_blobs(conn)
+    if _ensure_search_table(conn) and current_version < 5:
+        _rebuild_search_index(conn)
+
+def _ensure_search_table(conn: sqlite3.Connection) -> bool:
+    try:
+        conn.executescript(SEARCH_SQL)
+        weights = ", ".join(str(weight) for weight in SEARCH_COLUMN_WEIGHTS)
+        conn.execute(
+            "INSERT INTO submission_search (submission_search, rank) VALUES ('rank', ?)",
+            (f"bm25({weights})",),
+        )
+    except sqlite3.OperationalError:
+        return False
+    return True
+
+def _rebuild_search_index(conn: sqlite3.Connection) -> None:
+    # Recreated instead of emptied: DELETE FROM leaves a tombstone per row
+    # in the index for every later query to skip.
+    conn.execute("DROP TABLE IF EXISTS submission_search")
+    if not _ensure_search_table(conn):
+        return
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            "SELECT id, data_json FROM submissions WHERE id > ? ORDER BY id ASC LIMIT ?",
+            (last_id, MIGRATION_BATCH_SIZE),
+        ).fetchall()
+        if not rows:
+            break
+        reviews = _load_reviews(conn, [row[0] for row in rows])
+        for row in rows:
+            try:
+                payload = _load_payload(row[1])
+            except (TypeError, ValueError, zlib.error):
+                payload = {}
+            _index_submission_search(conn, row[0], payload, reviews.get(row[0]), replace=False)
+        last_id = rows[-1][0]
+    # One b-tree instead of a segment per batch: fewer doclists per query.
+    conn.execute("INSERT INTO submission_search (submission_search) VALUES ('optimize')")
+    conn.commit()
+
+def _rebuild_submission_counts(conn: sqlite3.Connection) -> None:
+    conn.execute("DELETE FROM submission_counts")
+    conn.execute(
+        "INSERT INTO submission_counts (key, total) SELECT 'all', COUNT(1) FROM submissions"
+    )
+    for column in COUNTED_SUBMISSION_COLUMNS:
+        conn.execute(
+            f"""
+            INSERT INTO submission_counts (key, total)
+            SELECT '{column}:' || {column}, COUNT(1) FROM submissions GROUP BY {column}
+            """
+        )
+    conn.commit()
+
+def _backfill_submission_metadata(conn: sqlite3.Connection) -> None:
+    assignments = ", ".join(f"{name} = ?" for name in SUBMISSION_META_COLUMNS)
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            "SELECT id, data_json FROM submissions WHERE id > ? ORDER BY id ASC LIMIT ?",
+            (last_id, MIGRATION_BATCH_SIZE),
+        ).fetchall()
+        if not rows:
+            break
+        updates = []
+        for row in rows:
+            try:
+                payload = _load_payload(row[1])
+            except (TypeError, ValueError, zlib.error):
+                payload = {}
+            metadata = _submission_metadata(payload, row[1] or "")
+            updates.append(
+                tuple(metadata[name] for name in SUBMISSION_META_COLUMNS) + (row[0],)
+            )
+        conn.executemany(f"UPDATE submissions SET {assignments} WHERE id = ?", updates)
+        last_id = rows[-1][0]
+    conn.commit()
+
+def _migrate_inline_blobs(conn: sqlite3.Connection) -> None:
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            "SELECT id, data_json FROM submissions WHERE id > ? ORDER BY id ASC LIMIT ?",
+            (last_id, MIGRATION_BATCH_SIZE),
+        ).fetchall()
+        if not rows:
+            break
+        for row in rows:
+            try:
+                data_json = _decode_payload_text(row[1])
+            except (ValueError, zlib.error):
+                continue
+            if '"data:' not in data_json:
+                continue
+            try:
+                payload = json.loads(data_json)
+            except ValueError:
+                continue
+            stored_payload, blobs, refs = _externalize_blobs(payload)
+            stored_value = _encode_payload(_dump_payload(stored_payload))
+            _store_blobs(conn, blobs)
+            _set_submission_blobs(conn, row[0], refs)
+            conn.execute(
+                "UPDATE submissions SET data_json = ?, payload_size = ? WHERE id = ?",
+                (stored_value, len(stored_value), row[0]),
+            )
+        last_id = rows[-1][0]
+        conn.commit()
+
+def _compact_third_person_items(conn: sqlite3.Connection) -> None:
+    # Older records kept a full copy of every activity (evidence included)
+    # under obligaciones_directas_items_tercera; only the converted text is needed.
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            "SELECT id, data_json FROM submissions WHERE id > ? ORDER BY id ASC LIMIT ?",
+            (last_id, MIGRATION_BATCH_SIZE),
+        ).fetchall()
+        if not rows:
+            break
+        for row in rows:
+            try:
+                data_json = _decode_payload_text(row[1])
+            except (ValueError, zlib.error):
+                continue
+            if '"obligaciones_directas_items_tercera"' not in data_json:
+                continue
+            try:
+                payload = json.loads(data_json)
+            except ValueError:
+                continue
+            legacy_items = payload.pop("obligaciones_directas_items_tercera", None)
+            if isinstance(legacy_items, list):
+                payload["obligaciones_directas_ejecutadas_tercera_items"] = [
+                    str(item.get("actividad_ejecutada_tercera", ""))
+                    if isinstance(item, dict)
+                    else ""
+                    for item in legacy_items
+                ]
+            stored_value = _encode_payload(_dump_payload(payload))
+            conn.execute(
+                "UPDATE submissions SET data_json = ?, payload_size = ? WHERE id = ?",
+                (stored_value, len(stored_value), row[0]),
+            )
+        last_id = rows[-1][0]
+        conn.commit()
+
+def _migrate_submission_blobs(conn: sqlite3.Connection) -> None:
+    # Blob references used to be counted from the text of data_json; record
+    # them per submission and recount every blob from those rows.
+    conn.execute("DELETE FROM submission_blobs")
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            "SELECT id, data_json FROM submissions WHERE id > ? ORDER BY id ASC LIMIT ?",
+            (last_id, MIGRATION_BATCH_SIZE),
+        ).fetchall()
+        if not rows:
+            break
+        for row in rows:
+            try:
+                payload = _load_payload(row[1])
+            except (TypeError, ValueError, zlib.error):
+                continue
+            conn.executemany(
+                """
+                INSERT OR IGNORE INTO submission_blobs (submission_id, sha256)
+                SELECT ?, sha256 FROM blobs WHERE sha256 = ?
+                """,
+                [(row[0], digest) for digest in _externalize_blobs(payload)[2]],
+            )
+        last_id = rows[-1][0]
+    conn.execute(
+        """
+        UPDATE blobs SET ref_count = (
+            SELECT COUNT(1) FROM submission_blobs WHERE submission_blobs.sha256 = blobs.sha256
+        )
+        """
+    )
+    conn.commit()
+
+def _migrate_reviews(conn: sqlite3.Connection) -> None:
+    # supervisor_review used to live inside data_json; each partial save
+    # rewrote the whole payload. Move it to the review tables.
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            "SELECT id, data_json FROM submissions WHERE id > ? ORDER BY id ASC LIMIT ?",
+            (last_id, MIGRATION_BATCH_SIZE),
+        ).fetchall()
+        if not rows:
+            break
+        for row in rows:
+            try:
+                data_json = _decode_payload_text(row[1])
+            except (ValueError, zlib.error):
+                continue
+            if '"supervisor_review"' not in data_json:
+                continue
+            try:
+                payload = json.loads(data_json)
+            except ValueError:
+                continue
+            review = _normalize_review(payload.pop("supervisor_review", None))
+            if review:
+                _write_review(conn, row[0], review)
+            stored_value = _encode_payload(_dump_payload(payload))
+            conn.execute(
+                "UPDATE submissions SET data_json = ?, payload_size = ? WHERE id = ?",
+                (stored_value, len(stored_value), row[0]),
+            )
+        last_id = rows[-1][0]
+        conn.commit()
+
+def extract_period_key(data: dict) -> str:
+    raw_value = (
+        data.get("periodo_i_a")
+        or data.get("periodo_i_de")
+        or data.get("fecha_presentacion_informe")
+        or ""
+    )
+    raw_value = str(raw_value).strip()
+    if not raw_value:
+        return ""
+    if re.match(r"^\d{4}-\d{2}-\d{2}$", raw_value):
+        return raw_value[:7]
+    match = re.match(r"^\d{1,2}/(\d{1,2})/(\d{2}|\d{4})$", raw_value)
+    if not match:
+        return ""
+    month = int(match.group(1))
+    year = match.group(2)
+    year = f"20{year}" if len(year) == 2 else year
+    return f"{year}-{month:02d}"
+
+def _submission_metadata(payload: dict, stored_value: str | bytes) -> dict:
+    if not isinstance(payload, dict):
+        payload = {}
+    meta = payload.get("_app_meta") if isinstance(payload.get("_app_meta"), dict) else {}
+    review = payload.get("supervisor_review") if isinstance(payload.get("supervisor_review"), dict) else {}
+    review_status = str(review.get("status", "pendiente")).strip().lower()
+    if review_status not in ALLOWED_REVIEW_STATUS:
+        review_status = "pendiente"
+    return {
+        "owner_id": str(meta.get("created_by_id") or "").strip(),
+        "owner_username": str(meta.get("created_by_username") or "").strip().lower(),
+        "contractor": str(payload.get("contratista") or "").strip(),
+        "contract_no": str(payload.get("contrato_no") or "").strip(),
+        "period_key": extract_period_key(payload),
+        "review_status": review_status,
+        "payload_size": len(stored_value),
+    }
+
+def _submission_filters(
+    owner_id: str | None = None,
+    owner_username: str | None = None,
+    review_status: str | None = None,
+    period_key: str | None = None,
+    contractor: str | None = None,
+    after_id: int | None = None,
+    contractor_contains: str | None = None,
+) -> tuple[str, list]:
+    clauses = []
+    params: list = []
+    if owner_id is not None or owner_username is not None:
+        owner_clause, owner_params = _owner_filter(owner_id, owner_username)
+        clauses.append(owner_clause)
+        params.extend(owner_params)
+    for column, value in (
+        ("review_status", review_status),
+        ("period_key", period_key),
+        ("contractor", contractor),
+    ):
+        if value:
+            clauses.append(f"{column} = ?")
+            params.append(value)
+    if contractor_contains:
+        # Partial, case-insensitive (ASCII) match typed in the supervisor
+        # filter; scans the indexed column, not data_json.
+        escaped = re.sub(r"([\\%_])", r"\\\1", contractor_contains)
+        clauses.append("contractor LIKE ? ESCAPE '\\'")
+        params.append(f"%{escaped}%")
+    if after_id:
+        clauses.append("id < ?")
+        params.append(after_id)
+    if not clauses:
+        return "", []
+    return " WHERE " + " AND ".join(clauses), params
+
+def _owner_filter(owner_id: str | None, owner_username: str | None) -> tuple[str, list]:
+    clauses = []
+    params: list = []
+    owner_id = str(owner_id or "").strip()
+    owner_username = str(owner_username or "").strip().lower()
+    if owner_id:
+        clauses.append("owner_id = ?")
+        params.append(owner_id)
+    if owner_username:
+        clauses.append("owner_username = ?")
+        params.append(owner_username)
+    if not clauses:
+        # An owner filter without identity must not match unowned rows.
+        return "0", []
+    return "(" + " OR ".join(clauses) + ")", params
+
+def _dump_payload(payload: dict) -> str:
+    return json.dumps(
+        payload,
+        ensure_ascii=False,
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+
+def _encode_payload(data_json: str, codec: str | None = None) -> str | bytes:
+    header = PAYLOAD_CODEC_HEADERS.get(codec or PAYLOAD_CODEC)
+    if header is None:
+        return data_json
+    compressed = zlib.compress(data_json.encode("utf-8"), PAYLOAD_ZLIB_LEVEL)
+    return bytes((header,)) + compressed
+
+def _decode_payload_text(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, str):
+        return value
+    value = bytes(value)
+    if not value:
+        return ""
+    if value[0] == PAYLOAD_CODEC_HEADERS["zlib"]:
+        return zlib.decompress(value[1:]).decode("utf-8")
+    raise ValueError(f"unknown_payload_codec: {value[0]}")
+
+def _load_payload(value) -> dict:
+    return json.loads(_decode_payload_text(value))
+
+def _split_data_url(value: str) -> tuple[str, bytes] | None:
+    if not value.startswith("data:"):
+        return None
+    header, separator, encoded = value.partition(",")
+    if not separator or ";base64" not in header:
+        return None
+    mime_type = header[5:].split(";", 1)[0].strip() or "application/octet-stream"
+    try:
+        content = base64.b64decode(encoded)
+    except (ValueError, binascii.Error):
+        return None
+    if not content:
+        return None
+    return mime_type, content
+
+def _externalize_blobs(payload, held_refs: set[str] | None = None):
+    # Returns a copy of payload with every inline data URL replaced by a
+    # content-addressed reference, the blobs found ({sha256: (mime, bytes)})
+    # and every digest the copy references. Blob references sent by the client
+    # are kept only if the submission already held them (held_refs); anything
+    # else would let a payload claim evidence it never uploaded. None keeps
+    # all references (stored payloads being re-read).
+    found: dict[str, tuple[str, bytes]] = {}
+    refs: set[str] = set()
+
+    def walk(value):
+        if isinstance(value, dict):
+            result = {}
+            for key, item in value.items():
+                if key in BLOB_URL_KEYS and isinstance(item, str):
+                    parsed = _split_data_url(item)
+                    if parsed:
+                        digest = hashlib.sha256(parsed[1]).hexdigest()
+                        found.setdefault(digest, parsed)
+                        refs.add(digest)
+                        result[key] = BLOB_REF_PREFIX + digest
+                        continue
+                    digest = parse_blob_ref(item)
+                    if digest:
+                        if held_refs is None or digest in held_refs:
+                            refs.add(digest)
+                            result[key] = item
+                        else:
+                            result[key] = ""
+                        continue
+                result[key] = walk(item)
+            return result
+        if isinstance(value, list):
+            return [walk(item) for item in value]
+        return value
+
+    return walk(payload), found, refs
+
+def _store_blobs(conn: sqlite3.Connection, blobs: dict[str, tuple[str, bytes]]) -> None:
+    if not blobs:
+        return
+    created_at = datetime.utcnow().isoformat()
+    conn.executemany(
+        """
+        INSERT OR IGNORE INTO blobs (sha256, mime_type, size, ref_count, data, created_at)
+        VALUES (?, ?, ?, 0, ?, ?)
+        """,
+        [
+            (digest, mime_type, len(content), sqlite3.Binary(content), created_at)
+            for digest, (mime_type, content) in blobs.items()
+        ],
+    )
+
+def _adjust_blob_refs(conn: sqlite3.Connection, digests: set[str], delta: int) -> None:
+    if not digests:
+        return
+    conn.executemany(
+        "UPDATE blobs SET ref_count = ref_count + ? WHERE sha256 = ?",
+        [(delta, digest) for digest in digests],
+    )
+    if delta < 0:
+        conn.execute("DELETE FROM blobs WHERE ref_count <= 0")
+
+def _submission_blob_refs(conn: sqlite3.Connection, record_id: int) -> set[str]:
+    rows = conn.execute(
+        "SELECT sha256 FROM submission_blobs WHERE submission_id = ?", (record_id,)
+    ).fetchall()
+    return {row[0] for row in rows}
+
+def _set_submission_blobs(
+    conn: sqlite3.Connection, record_id: int, refs: set[str], old_refs: set[str] = frozenset()
+) -> None:
+    # Links and ref_count change together, inside the caller's transaction.
+    added = refs - old_refs
+    removed = old_refs - refs
+    conn.executemany(
+        "INSERT OR IGNORE INTO submission_blobs (submission_id, sha256) VALUES (?, ?)",
+        [(record_id, digest) for digest in added],
+    )
+    conn.executemany(
+        "DELETE FROM submission_blobs WHERE submission_id = ? AND sha256 = ?",
+        [(record_id, digest) for digest in removed],
+    )
+    _adjust_blob_refs(conn, added, 1)
+    _adjust_blob_refs(conn, removed, -1)
+
+def parse_blob_ref(value) -> str | None:
+    if not isinstance(value, str) or not value.startswith(BLOB_REF_PREFIX):
+        return None
+    match = _BLOB_REF_RE.fullmatch(value)
+    return match.group(1) if match else None
+
+def dehydrate_payload(payload: dict) -> dict:
+    return _externalize_blobs(payload)[0]
+
+def drop_blob_refs(payload):
+    # Clears client-sent blob references from a new payload before anything
+    # reads it: a new submission holds no blobs yet, so it may only bring
+    # data URLs (see _externalize_blobs).
+    if isinstance(payload, dict):
+        return {
+            key: "" if key in BLOB_URL_KEYS and parse_blob_ref(item) else drop_blob_refs(item)
+            for key, item in payload.items()
+        }
+    if isinstance(payload, list):
+        return [drop_blob_refs(item) for item in payload]
+    return payload
+
+def get_blob(digest: str) -> dict | None:
+    with get_connection() as conn:
+        row = conn.execute(
+            "SELECT sha256, mime_type, size, data FROM blobs WHERE sha256 = ?",
+            (digest,),
+        ).fetchone()
+    if not row:
+        return None
+    return {
+        "sha256": row["sha256"],
+        "mime_type": row["mime_type"],
+        "size": row["size"],
+        "data": bytes(row["data"]),
+    }
+
+def blob_referenced_by_owner(digest: str, owner_id: str | None, owner_username: str | None) -> bool:
+    # Blobs carry no owner of their own: a user may read one only through a
+    # submission of theirs that holds it.
+    owner_sql, params = _owner_filter(owner_id, owner_username)
+    with get_connection() as conn:
+        row = conn.execute(
+            f"""
+            SELECT 1 FROM submission_blobs
+            JOIN submissions ON submissions.id = submission_blobs.submission_id
+            WHERE submission_blobs.sha256 = ? AND {owner_sql}
+            LIMIT 1
+            """,
+            [digest] + params,
+        ).fetchone()
+    return row is not None
+
+def load_blob_bytes(value: str) -> bytes | None:
+    digest = parse_blob_ref(value)
+    if not digest:
+        return None
+    blob = get_blob(digest)
+    return blob["data"] if blob else None
+
+def resolve_blob_refs(payload):
+    # Inverse of _externalize_blobs: rebuild inline data URLs for clients that
+    # need a self-contained payload (form reload, contractor export).
+    cache: dict[str, str | None] = {}
+
+    def data_url_for(digest: str) -> str | None:
+        if digest not in cache:
+            blob = get_blob(digest)
+            cache[digest] = (
+                f"data:{blob['mime_type']};base64,"
+                + base64.b64encode(blob["data"]).decode("ascii")
+                if blob
+                else None
+            )
+        return cache[digest]
+
+    def walk(value):
+        if isinstance(value, dict):
+            result = {}
+            for key, item in value.items():
+                digest = parse_blob_ref(item) if key in BLOB_URL_KEYS else None
+                if digest:
+                    result[key] = data_url_for(digest) or ""
+                else:
+                    result[key] = walk(item)
+            return result
+        if isinstance(value, list):
+            return [walk(item) for item in value]
+        return value
+
+    return walk(payload)
+
+def _review_search_text(review: dict | None) -> str:
+    review = review if isinstance(review, dict) else {}
+    observations = [str(review.get("observacion_global") or "").strip()]
+    reviewed = review.get("actividades")
+    for activity in reviewed if isinstance(reviewed, list) else []:
+        if isinstance(activity, dict):
+            observations.append(str(activity.get("obs") or "").strip())
+    return "\n".join(text for text in observations if text)
+
+def _search_document(payload: dict, review: dict | None = None) -> tuple[str, ...]:
+    if not isinstance(payload, dict):
+        payload = {}
+    activities = []
+    items = payload.get("obligaciones_directas_items")
+    for item in items if isinstance(items, list) else []:
+        if isinstance(item, dict):
+            activities.append(str(item.get("actividad_contrato") or "").strip())
+            activities.append(str(item.get("actividad_ejecutada") or "").strip())
+    if review is None:
+        review = payload.get("supervisor_review")
+    return (
+        str(payload.get("contratista") or "").strip(),
+        str(payload.get("contrato_no") or "").strip(),
+        str(payload.get("objeto_contractual") or "").strip(),
+        "\n".join(text for text in activities if text),
+        _review_search_text(review),
+    )
+
+def _index_submission_search(
+    conn: sqlite3.Connection,
+    record_id: int,
+    payload: dict,
+    review: dict | None = None,
+    replace: bool = True,
+) -> None:
+    try:
+        if replace:
+            conn.execute("DELETE FROM submission_search WHERE rowid = ?", (record_id,))
+        conn.execute(
+            f"INSERT INTO submission_search (rowid, {', '.join(SEARCH_COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?)",
+            (record_id, *_search_document(payload, review)),
+        )
+    except sqlite3.OperationalError:
+        # No FTS5 in this SQLite build (or no search table yet): search is optional.
+        pass
+
+def _update_search_observations(conn: sqlite3.Connection, record_id: int) -> None:
+    review = _load_reviews(conn, [record_id]).get(record_id)
+    try:
+        conn.execute(
+            "UPDATE submission_search SET observaciones = ? WHERE rowid = ?",
+            (_review_search_text(review), record_id),
+        )
+    except sqlite3.OperationalError:
+        pass
+
+def _unindex_submission_search(conn: sqlite3.Connection, record_id: int) -> None:
+    try:
+        conn.execute("DELETE FROM submission_search WHERE rowid = ?", (record_id,))
+    except sqlite3.OperationalError:
+        pass
+
+def _search_match_expression(query: str) -> str:
+    # User text is reduced to quoted terms so FTS5 syntax characters can never
+    # produce a query error; only the last term is a prefix (search-as-you-type).
+    tokens = _SEARCH_TOKEN_RE.findall(query or "")
+    if not tokens:
+        return ""
+    terms = [f'"{token}"' for token in tokens]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+def rebuild_search_index() -> bool:
+    with get_connection() as conn:
+        if not _ensure_search_table(conn):
+            return False
+        _rebuild_search_index(conn)
+    return True
+
+def search_submissions(query: str, limit: int = 20) -> tuple[list[dict], bool] | None:
+    # Returns (results, truncated). bm25 costs a few microseconds per match,
+    # so a term found in most reports would rank the whole table; only the
+    # newest SEARCH_RANK_WINDOW matches are ranked and truncated says so.
+    match = _search_match_expression(query)
+    if not match:
+        return [], False
+    try:
+        with get_connection() as conn:
+            boundary = conn.execute(
+                """
+                SELECT rowid FROM submission_search
+                WHERE submission_search MATCH ?
+                ORDER BY rowid DESC
+                LIMIT 1 OFFSET ?
+                """,
+                (match, SEARCH_RANK_WINDOW),
+            ).fetchone()
+            # Ranking and snippet() share one full-text cursor; the snippet is
+            # only built for the rows the LIMIT keeps.
+            rows = conn.execute(
+                """
+                WITH ranked AS (
+                    SELECT
+                        rowid,
+                        rank,
+                        snippet(submission_search, -1, '«', '»', '…', 12) AS snippet
+                    FROM submission_search
+                    WHERE submission_search MATCH ? AND rowid > ?
+                    ORDER BY rank
+                    LIMIT ?
+                )
+                SELECT
+                    submissions.id,
+                    submissions.created_at,
+                    submissions.contractor,
+                    submissions.contract_no,
+                    submissions.period_key,
+                    submissions.review_status,
+                    ranked.rank AS score,
+                    ranked.snippet
+                FROM ranked
+                JOIN submissions ON submissions.id = ranked.rowid
+                ORDER BY ranked.rank, submissions.id DESC
+                """,
+                (match, boundary[0] if boundary else 0, limit),
+            ).fetchall()
+    except sqlite3.OperationalError:
+        return None
+    return [_row_to_dict(row) for row in rows], boundary is not None
+
 def _row_to_dict(row: sqlite3.Row) -> dict:
     return {key: row[key] for key in row.keys()}
 
 def list_roles() -> list[dict]:
-    with sqlite3.connect(DB_PATH) as conn:
-        conn.row_factory = sqlite3.Row
+    with get_connection() as conn:
         rows = conn.execute("SELECT id, name FROM roles ORDER BY name ASC").fetchall()
     return [_row_to_dict(row) for row in rows]
 
 def get_role_by_name(name: str) -> dict | None:
-    with sqlite3.connect(DB_PATH) as conn:
-        conn.row_factory = sqlite3.Row
+    with get_connection() as conn:
         row = conn.execute("SELECT id, name FROM roles WHERE name = ?", (name,)).fetchone()
     return _row_to_dict(row) if row else None
 
 def get_role_by_id(role_id: int) -> dict | None:
-    with sqlite3.connect(DB_PATH) as conn:
-        conn.row_factory = sqlite3.Row
+    with get_connection() as conn:
         row = conn.execute("SELECT id, name FROM roles WHERE id = ?", (role_id,)).fetchone()
     return _row_to_dict(row) if row else None
 
 def create_role(name: str) -> int:
-    with sqlite3.connect(DB_PATH) as conn:
+    with get_connection() as conn:
         cur = conn.cursor()
         cur.execute("INSERT INTO roles (name) VALUES (?)", (name,))
         conn.commit()
         return cur.lastrowid
 
 def update_role(role_id: int, name: str) -> None:
-    with sqlite3.connect(DB_PATH) as conn:
+    with get_connection() as conn:
         conn.execute("UPDATE roles SET name = ? WHERE id = ?", (name, role_id))
         conn.commit()
 
 def delete_role(role_id: int) -> None:
-    with sqlite3.connect(DB_PATH) as conn:
+    with get_connection() as conn:
         conn.execute("DELETE FROM roles WHERE id = ?", (role_id,))
         conn.commit()
 
 def reassign_users_role(old_role_id: int, new_role_id: int) -> None:
-    with sqlite3.connect(DB_PATH) as conn:
+    with get_connection() as conn:
         conn.execute(
             "UPDATE users SET role_id = ? WHERE role_id = ?",
             (new_role_id, old_role_id),
@@ -334,8 +1363,7 @@ def reassign_users_role(old_role_id: int, new_role_id: int) -> None:
         conn.commit()
 
 def list_users() -> list[dict]:
-    with sqlite3.connect(DB_PATH) as conn:
-        conn.row_factory = sqlite3.Row
+    with get_connection() as conn:
         rows = conn.execute(
             """
             SELECT
@@ -357,8 +1385,7 @@ def list_users() -> list[dict]:
     return [_row_to_dict(row) for row in rows]
 
 def list_users_by_role(role_name: str) -> list[dict]:
-    with sqlite3.connect(DB_PATH) as conn:
-        conn.row_factory = sqlite3.Row
+    with get_connection() as conn:
         rows = conn.execute(
             """
             SELECT
@@ -378,8 +1405,7 @@ def list_users_by_role(role_name: str) -> list[dict]:
     return [_row_to_dict(row) for row in rows]
 
 def get_user_by_username(username: str) -> dict | None:
-    with sqlite3.connect(DB_PATH) as conn:
-        conn.row_factory = sqlite3.Row
+    with get_connection() as conn:
         row = conn.execute(
             """
             SELECT
@@ -401,8 +1427,7 @@ def get_user_by_username(username: str) -> dict | None:
     return _row_to_dict(row) if row else None
 
 def get_user_by_id(user_id: int) -> dict | None:
-    with sqlite3.connect(DB_PATH) as conn:
-        conn.row_factory = sqlite3.Row
+    with get_connection() as conn:
         row = conn.execute(
             """
             SELECT
@@ -435,7 +1460,7 @@ def create_user(
     doc_number: str,
 ) -> int:
     created_at = datetime.utcnow().isoformat()
-    with sqlite3.connect(DB_PATH) as conn:
+    with get_connection() as conn:
         cur = conn.cursor()
         cur.execute(
             """
@@ -457,7 +1482,7 @@ def create_user(
         return cur.lastrowid
 
 def update_user_role(user_id: int, role_id: int) -> None:
-    with sqlite3.connect(DB_PATH) as conn:
+    with get_connection() as conn:
         conn.execute(
             "UPDATE users SET role_id = ? WHERE id = ?",
             (role_id, user_id),
@@ -475,7 +1500,7 @@ def update_user(
     doc_number: str,
     password_hash: str | None,
 ) -> None:
-    with sqlite3.connect(DB_PATH) as conn:
+    with get_connection() as conn:
         if password_hash:
             conn.execute(
                 """
@@ -497,12 +1522,12 @@ def update_user(
         conn.commit()
 
 def delete_user(user_id: int) -> None:
-    with sqlite3.connect(DB_PATH) as conn:
+    with get_connection() as conn:
         conn.execute("DELETE FROM users WHERE id = ?", (user_id,))
         conn.commit()
 
 def has_any_users() -> bool:
-    with sqlite3.connect(DB_PATH) as conn:
+    with get_connection() as conn:
         row = conn.execute("SELECT COUNT(1) AS total FROM users").fetchone()
     return bool(row[0]) if row else False
 
@@ -511,38 +1536,61 @@ def save_submission(payload: dict) -> int:
     return save_submission_with_created_at(payload, created_at)
 
 def save_submission_with_created_at(payload: dict, created_at: str | None = None) -> int:
-    created_at_value = created_at or datetime.utcnow().isoformat()
-    data_json = json.dumps(
-        payload,
-        ensure_ascii=True,
-        sort_keys=True,
-        separators=(",", ":"),
-    )
-    with sqlite3.connect(DB_PATH) as conn:
-        cur = conn.cursor()
-        cur.execute(
-            "INSERT INTO submissions (created_at, data_json) VALUES (?, ?)",
-            (created_at_value, data_json),
-        )
+    with get_connection() as conn:
+        record_id = _insert_submission(conn, payload, created_at)
         conn.commit()
-        return cur.lastrowid
+        return record_id
 
-def list_submissions(limit: int | None = 20) -> list[dict]:
-    with sqlite3.connect(DB_PATH) as conn:
-        conn.row_factory = sqlite3.Row
-        if limit is None or limit <= 0:
-            rows = conn.execute(
-                "SELECT id, created_at, data_json FROM submissions ORDER BY id DESC"
-            ).fetchall()
-        else:
-            rows = conn.execute(
-                "SELECT id, created_at, data_json FROM submissions ORDER BY id DESC LIMIT ?",
-                (limit,),
-            ).fetchall()
+def save_submissions(payloads: list[dict]) -> list[int]:
+    # Bulk variant of save_submission(): one transaction for the whole list.
+    created_at = datetime.utcnow().isoformat()
+    with get_connection() as conn:
+        record_ids = [_insert_submission(conn, payload, created_at) for payload in payloads]
+        conn.commit()
+        return record_ids
+
+def _insert_submission(conn: sqlite3.Connection, payload: dict, created_at: str | None) -> int:
+    created_at_value = created_at or datetime.utcnow().isoformat()
+    stored_payload, blobs, refs = _externalize_blobs(payload, held_refs=set())
+    review = _normalize_review(stored_payload.pop("supervisor_review", None))
+    data_json = _dump_payload(stored_payload)
+    stored_value = _encode_payload(data_json)
+    metadata = _submission_metadata(stored_payload, stored_value)
+    if review:
+        metadata["review_status"] = review["status"]
+    columns = ", ".join(SUBMISSION_META_COLUMNS)
+    placeholders = ", ".join("?" for _ in SUBMISSION_META_COLUMNS)
+    _store_blobs(conn, blobs)
+    cur = conn.cursor()
+    cur.execute(
+        f"INSERT INTO submissions (created_at, data_json, {columns}) VALUES (?, ?, {placeholders})",
+        (created_at_value, stored_value, *(metadata[name] for name in SUBMISSION_META_COLUMNS)),
+    )
+    _set_submission_blobs(conn, cur.lastrowid, refs)
+    if review:
+        _write_review(conn, cur.lastrowid, review)
+    _index_submission_search(conn, cur.lastrowid, stored_payload, review, replace=False)
+    return cur.lastrowid
+
+def list_submissions(
+    limit: int | None = 20,
+    owner_id: str | None = None,
+    owner_username: str | None = None,
+) -> list[dict]:
+    where, params = _submission_filters(owner_id, owner_username)
+    sql = f"SELECT id, created_at, data_json FROM submissions{where} ORDER BY id DESC"
+    if limit is not None and limit > 0:
+        sql += " LIMIT ?"
+        params.append(limit)
+    with get_connection() as conn:
+        rows = conn.execute(sql, params).fetchall()
+        reviews = _load_reviews(conn, [row["id"] for row in rows])
 
     results = []
     for row in rows:
-        data = json.loads(row["data_json"])
+        data = _load_payload(row["data_json"])
+        if row["id"] in reviews:
+            data["supervisor_review"] = reviews[row["id"]]
         results.append({
             "id": row["id"],
             "created_at": row["created_at"],
@@ -550,18 +1598,137 @@ def list_submissions(limit: int | None = 20) -> list[dict]:
         })
     return results
 
+def _summary_field_sql(field: str) -> tuple[str, list]:
+    # "payload" is the decoded data_json (see list_submission_summaries).
+    column = SUMMARY_COLUMN_FIELDS.get(field)
+    if column:
+        return column, []
+    segments = field.split(".")
+    if not all(_SUMMARY_SEGMENT_RE.fullmatch(segment) for segment in segments):
+        raise ValueError(f"invalid_summary_field: {field}")
+    return "json_extract(payload, ?)", ["$." + ".".join(f'"{segment}"' for segment in segments)]
+
+def list_submission_summaries(
+    fields: list[str],
+    limit: int | None = 20,
+    owner_id: str | None = None,
+    owner_username: str | None = None,
+    review_status: str | None = None,
+    period_key: str | None = None,
+    contractor: str | None = None,
+    after_id: int | None = None,
+    contractor_contains: str | None = None,
+) -> list[dict]:
+    # Projection of data_json: each dotted path is served from its indexed
+    # column when one exists, otherwise through json_extract, so the full
+    # payload is never loaded into Python.
+    select_parts = ["id", "created_at"]
+    params: list = []
+    for field in fields:
+        expression, expression_params = _summary_field_sql(field)
+        select_parts.append(expression)
+        params.extend(expression_params)
+    where, where_params = _submission_filters(
+        owner_id, owner_username, review_status, period_key, contractor, after_id, contractor_contains
+    )
+    source = "submissions"
+    if params:
+        # Paths without a column need the payload: decode it once per row in a
+        # subquery (its LIMIT keeps SQLite from inlining it) instead of once
+        # per json_extract.
+        columns = ", ".join(["id", "created_at", *SUMMARY_COLUMN_FIELDS.values()])
+        source = f"(SELECT {columns}, payload_text(data_json) AS payload FROM submissions{where} ORDER BY id DESC LIMIT ?)"
+        params.extend(where_params)
+        params.append(limit if limit is not None and limit > 0 else -1)
+        where, where_params = "", []
+    sql = f"SELECT {', '.join(select_parts)} FROM {source}{where} ORDER BY id DESC"
+    params.extend(where_params)
+    if limit is not None and limit > 0:
+        sql += " LIMIT ?"
+        params.append(limit)
+    with get_connection() as conn:
+        cur = conn.cursor()
+        cur.row_factory = None
+        rows = cur.execute(sql, params).fetchall()
+
+    flat_fields = [field for field in fields if "." not in field]
+    if len(flat_fields) == len(fields):
+        return [
+            {"id": row[0], "created_at": row[1], "data": dict(zip(fields, row[2:]))}
+            for row in rows
+        ]
+
+    paths = [field.split(".") for field in fields]
+    results = []
+    for row in rows:
+        data: dict = {}
+        for path, value in zip(paths, row[2:]):
+            target = data
+            for segment in path[:-1]:
+                target = target.setdefault(segment, {})
+            target[path[-1]] = value
+        results.append({
+            "id": row[0],
+            "created_at": row[1],
+            "data": data,
+        })
+    return results
+
+def count_submissions(
+    owner_id: str | None = None,
+    owner_username: str | None = None,
+    review_status: str | None = None,
+    period_key: str | None = None,
+    contractor: str | None = None,
+    contractor_contains: str | None = None,
+) -> int:
+    counted = [
+        (column, value)
+        for column, value in (
+            ("review_status", review_status),
+            ("period_key", period_key),
+            ("contractor", contractor),
+        )
+        if value
+    ]
+    with get_connection() as conn:
+        if owner_id is None and owner_username is None and not contractor_contains and len(counted) <= 1:
+            key = f"{counted[0][0]}:{counted[0][1]}" if counted else "all"
+            row = conn.execute(
+                "SELECT total FROM submission_counts WHERE key = ?", (key,)
+            ).fetchone()
+            return max(int(row[0]), 0) if row else 0
+        # Combined filters: COUNT over indexed columns, never over data_json.
+        where, params = _submission_filters(
+            owner_id, owner_username, review_status, period_key, contractor,
+            contractor_contains=contractor_contains,
+        )
+        row = conn.execute(f"SELECT COUNT(1) FROM submissions{where}", params).fetchone()
+    return int(row[0]) if row else 0
+
+def get_submission_metadata(record_id: int) -> dict | None:
+    columns = ", ".join(SUBMISSION_META_COLUMNS)
+    with get_connection() as conn:
+        row = conn.execute(
+            f"SELECT id, created_at, {columns} FROM submissions WHERE id = ?",
+            (record_id,),
+        ).fetchone()
+    return _row_to_dict(row) if row else None
+
 def get_submission(record_id: int) -> dict | None:
-    with sqlite3.connect(DB_PATH) as conn:
-        conn.row_factory = sqlite3.Row
+    with get_connection() as conn:
         row = conn.execute(
             "SELECT id, created_at, data_json FROM submissions WHERE id = ?",
             (record_id,),
         ).fetchone()
+        review = _load_reviews(conn, [record_id]).get(record_id) if row else None
 
     if not row:
         return None
 
-    data = json.loads(row["data_json"])
+    data = _load_payload(row["data_json"])
+    if review:
+        data["supervisor_review"] = review
     return {
         "id": row["id"],
         "created_at": row["created_at"],
@@ -569,24 +1736,639 @@ def get_submission(record_id: int) -> dict | None:
     }
 
 def update_submission_data(record_id: int, payload: dict) -> bool:
-    data_json = json.dumps(
-        payload,
-        ensure_ascii=True,
-        sort_keys=True,
-        separators=(",", ":"),
-    )
-    with sqlite3.connect(DB_PATH) as conn:
+    with get_connection() as conn:
+        # The blob links read below are diffed and written back: hold the
+        # write lock from the first read so no other thread changes them.
+        conn.execute("BEGIN IMMEDIATE")
+        row = conn.execute(
+            "SELECT id FROM submissions WHERE id = ?", (record_id,)
+        ).fetchone()
+        if not row:
+            return False
+        old_refs = _submission_blob_refs(conn, record_id)
+        stored_payload, blobs, refs = _externalize_blobs(payload, held_refs=old_refs)
+        # The review is only replaced when the payload carries one; otherwise the
+        # stored review (and review_status) are left untouched.
+        has_review = "supervisor_review" in stored_payload
+        review = _normalize_review(stored_payload.pop("supervisor_review", None))
+        stored_value = _encode_payload(_dump_payload(stored_payload))
+        metadata = _submission_metadata(stored_payload, stored_value)
+        if review:
+            metadata["review_status"] = review["status"]
+        columns = [name for name in SUBMISSION_META_COLUMNS if has_review or name != "review_status"]
+        assignments = ", ".join(f"{name} = ?" for name in columns)
+        _store_blobs(conn, blobs)
+        _set_submission_blobs(conn, record_id, refs, old_refs)
         cur = conn.cursor()
         cur.execute(
-            "UPDATE submissions SET data_json = ? WHERE id = ?",
-            (data_json, record_id),
+            f"UPDATE submissions SET data_json = ?, {assignments} WHERE id = ?",
+            (stored_value, *(metadata[name] for name in columns), record_id),
         )
+        if has_review:
+            _delete_review(conn, record_id)
+            if review:
+                _write_review(conn, record_id, review)
+        else:
+            review = _load_reviews(conn, [record_id]).get(record_id)
+        _index_submission_search(conn, record_id, stored_payload, review)
         conn.commit()
         return cur.rowcount > 0
 
 def delete_submission(record_id: int) -> bool:
-    with sqlite3.connect(DB_PATH) as conn:
+    with get_connection() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        _set_submission_blobs(conn, record_id, set(), _submission_blob_refs(conn, record_id))
         cur = conn.cursor()
         cur.execute("DELETE FROM submissions WHERE id = ?", (record_id,))
+        _delete_review(conn, record_id)
+        _unindex_submission_search(conn, record_id)
+        conn.execute("DELETE FROM rendered_documents WHERE submission_id = ?", (record_id,))
         conn.commit()
         return cur.rowcount > 0
+
+def _normalize_review(value) -> dict | None:
+    if not isinstance(value, dict):
+        return None
+    status = str(value.get("status", "pendiente")).strip().lower()
+    if status not in ALLOWED_REVIEW_STATUS:
+        status = "pendiente"
+    activities = []
+    raw_activities = value.get("actividades")
+    for activity in raw_activities if isinstance(raw_activities, list) else []:
+        if not isinstance(activity, dict):
+            continue
+        act_id = str(activity.get("id", "")).strip()
+        if not act_id:
+            continue
+        activities.append(
+            {
+                "id": act_id,
+                "desc": str(activity.get("desc", "")).strip(),
+                "status": str(activity.get("status", "pendiente")).strip().lower() or "pendiente",
+                "obs": str(activity.get("obs", "")).strip(),
+            }
+        )
+    history = []
+    raw_history = value.get("history")
+    for entry in raw_history if isinstance(raw_history, list) else []:
+        if not isinstance(entry, dict):
+            continue
+        event = {
+            "date": str(entry.get("date", "")).strip(),
+            "action": str(entry.get("action", "")).strip(),
+            "status": str(entry.get("status", "pendiente")).strip().lower() or "pendiente",
+            "by": str(entry.get("by", "")).strip(),
+        }
+        if entry.get("activity_id"):
+            event["activity_id"] = str(entry["activity_id"]).strip()
+            event["obs"] = str(entry.get("obs", "")).strip()
+        history.append(event)
+    return {
+        "status": status,
+        "observacion_global": str(value.get("observacion_global", "")).strip(),
+        "actividades": activities,
+        "history": history,
+    }
+
+def _upsert_review(
+    conn: sqlite3.Connection,
+    record_id: int,
+    status: str,
+    observacion_global: str,
+    updated_at: str,
+    updated_by: str = "",
+) -> None:
+    conn.execute(
+        """
+        INSERT INTO reviews (submission_id, status, observacion_global, updated_at, updated_by)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(submission_id) DO UPDATE SET
+            status = excluded.status,
+            observacion_global = excluded.observacion_global,
+            updated_at = excluded.updated_at,
+            updated_by = excluded.updated_by
+        """,
+        (record_id, status, observacion_global, updated_at, updated_by),
+    )
+
+def _sync_review_activities(conn: sqlite3.Connection, record_id: int, activities: list[dict]) -> None:
+    # Unchanged rows are skipped by the upsert's WHERE, so a save that only
+    # touches one activity writes one row.
+    ids = [activity["id"] for activity in activities]
+    placeholders = ", ".join("?" for _ in ids)
+    if ids:
+        conn.execute(
+            f"DELETE FROM review_activities WHERE submission_id = ? AND activity_id NOT IN ({placeholders})",
+            (record_id, *ids),
+        )
+    else:
+        conn.execute("DELETE FROM review_activities WHERE submission_id = ?", (record_id,))
+    conn.executemany(
+        """
+        INSERT INTO review_activities (submission_id, activity_id, position, description, status, obs)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT(submission_id, activity_id) DO UPDATE SET
+            position = excluded.position,
+            description = excluded.description,
+            status = excluded.status,
+            obs = excluded.obs
+        WHERE position != excluded.position
+            OR description != excluded.description
+            OR status != excluded.status
+            OR obs != excluded.obs
+        """,
+        [
+            (record_id, activity["id"], position, activity["desc"], activity["status"], activity["obs"])
+            for position, activity in enumerate(activities)
+        ],
+    )
+
+def _append_review_events(conn: sqlite3.Connection, record_id: int, events: list[dict]) -> None:
+    conn.executemany(
+        "INSERT INTO review_events (submission_id, created_at, action, status, username, activity_id, obs) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [
+            (
+                record_id,
+                event.get("date", ""),
+                event.get("action", ""),
+                event.get("status", "pendiente"),
+                event.get("by", ""),
+                event.get("activity_id", ""),
+                event.get("obs", ""),
+            )
+            for event in events
+        ],
+    )
+
+def _write_review(conn: sqlite3.Connection, record_id: int, review: dict) -> None:
+    history = review["history"]
+    updated_at = history[-1]["date"] if history else datetime.utcnow().replace(microsecond=0).isoformat()
+    updated_by = history[-1]["by"] if history else ""
+    _upsert_review(conn, record_id, review["status"], review["observacion_global"], updated_at, updated_by)
+    _sync_review_activities(conn, record_id, review["actividades"])
+    conn.execute("DELETE FROM review_events WHERE submission_id = ?", (record_id,))
+    _append_review_events(conn, record_id, history)
+
+def _delete_review(conn: sqlite3.Connection, record_id: int) -> None:
+    conn.execute("DELETE FROM reviews WHERE submission_id = ?", (record_id,))
+    conn.execute("DELETE FROM review_activities WHERE submission_id = ?", (record_id,))
+    conn.execute("DELETE FROM review_events WHERE submission_id = ?", (record_id,))
+
+def _load_reviews(conn: sqlite3.Connection, record_ids: list[int]) -> dict[int, dict]:
+    # Rebuilds the legacy supervisor_review shape for a batch of submissions.
+    reviews: dict[int, dict] = {}
+    for start in range(0, len(record_ids), MIGRATION_BATCH_SIZE):
+        chunk = record_ids[start:start + MIGRATION_BATCH_SIZE]
+        placeholders = ", ".join("?" for _ in chunk)
+        for row in conn.execute(
+            f"SELECT submission_id, status, observacion_global FROM reviews WHERE submission_id IN ({placeholders})",
+            chunk,
+        ):
+            reviews[row[0]] = {
+                "status": row[1],
+                "observacion_global": row[2],
+                "actividades": [],
+                "history": [],
+            }
+        if not reviews:
+            continue
+        for row in conn.execute(
+            f"""
+            SELECT submission_id, activity_id, description, status, obs FROM review_activities
+            WHERE submission_id IN ({placeholders}) ORDER BY submission_id, position
+            """,
+            chunk,
+        ):
+            if row[0] in reviews:
+                reviews[row[0]]["actividades"].append(
+                    {"id": row[1], "desc": row[2], "status": row[3], "obs": row[4]}
+                )
+        for row in conn.execute(
+            f"""
+            SELECT submission_id, created_at, action, status, username, activity_id, obs FROM review_events
+            WHERE submission_id IN ({placeholders}) ORDER BY submission_id, id
+            """,
+            chunk,
+        ):
+            if row[0] in reviews:
+                event = {"date": row[1], "action": row[2], "status": row[3], "by": row[4]}
+                if row[5]:
+                    event["activity_id"] = row[5]
+                    event["obs"] = row[6]
+                reviews[row[0]]["history"].append(event)
+    return reviews
+
+def get_review(record_id: int) -> dict | None:
+    with get_connection() as conn:
+        return _load_reviews(conn, [record_id]).get(record_id)
+
+def save_review(
+    record_id: int,
+    status: str,
+    observacion_global: str,
+    activities: list[dict],
+    event: dict | None = None,
+) -> bool:
+    review = _normalize_review(
+        {"status": status, "observacion_global": observacion_global, "actividades": activities}
+    )
+    event = _normalize_review({"history": [event]})["history"] if event else []
+    updated_at = event[0]["date"] if event else datetime.utcnow().replace(microsecond=0).isoformat()
+    updated_by = event[0]["by"] if event else ""
+    with get_connection() as conn:
+        if not conn.execute("SELECT 1 FROM submissions WHERE id = ?", (record_id,)).fetchone():
+            return False
+        _upsert_review(conn, record_id, review["status"], review["observacion_global"], updated_at, updated_by)
+        _sync_review_activities(conn, record_id, review["actividades"])
+        _append_review_events(conn, record_id, event)
+        conn.execute(
+            "UPDATE submissions SET review_status = ? WHERE id = ? AND review_status != ?",
+            (review["status"], record_id, review["status"]),
+        )
+        _update_search_observations(conn, record_id)
+        conn.commit()
+    return True
+
+def update_review_activity(
+    record_id: int,
+    activity_id: str,
+    status: str,
+    obs: str,
+    desc: str = "",
+    updated_by: str = "",
+) -> str | None:
+    # Writes one activity, appends it to the review history and recomputes
+    # the review status in one transaction: an approved review stops being
+    # approved once one of its activities is no longer "cumplida". Returns
+    # the resulting review status, or None if the submission does not exist.
+    activity_id = str(activity_id or "").strip()
+    if not activity_id:
+        return None
+    now = datetime.utcnow().replace(microsecond=0).isoformat()
+    with get_connection() as conn:
+        if not conn.execute("SELECT 1 FROM submissions WHERE id = ?", (record_id,)).fetchone():
+            return None
+        row = conn.execute("SELECT status FROM reviews WHERE submission_id = ?", (record_id,)).fetchone()
+        previous_status = row[0] if row else "pendiente"
+        cur = conn.execute(
+            "UPDATE review_activities SET status = ?, obs = ? WHERE submission_id = ? AND activity_id = ?",
+            (status, obs, record_id, activity_id),
+        )
+        if cur.rowcount == 0:
+            conn.execute(
+                """
+                INSERT INTO review_activities (submission_id, activity_id, position, description, status, obs)
+                SELECT ?, ?, COALESCE(MAX(position) + 1, 0), ?, ?, ? FROM review_activities WHERE submission_id = ?
+                """,
+                (record_id, activity_id, desc, status, obs, record_id),
+            )
+        review_status = previous_status
+        if review_status == "aprobado" and conn.execute(
+            "SELECT 1 FROM review_activities WHERE submission_id = ? AND status != 'cumplida' LIMIT 1",
+            (record_id,),
+        ).fetchone():
+            review_status = "pendiente"
+        conn.execute(
+            """
+            INSERT INTO reviews (submission_id, status, updated_at, updated_by) VALUES (?, ?, ?, ?)
+            ON CONFLICT(submission_id) DO UPDATE SET
+                status = excluded.status,
+                updated_at = excluded.updated_at,
+                updated_by = excluded.updated_by
+            """,
+            (record_id, review_status, now, updated_by),
+        )
+        events = [
+            {
+                "date": now,
+                "action": f"Actividad {activity_id} actualizada",
+                "status": status,
+                "by": updated_by,
+                "activity_id": activity_id,
+                "obs": obs,
+            }
+        ]
+        if review_status != previous_status:
+            events.append(
+                {
+                    "date": now,
+                    "action": "Informe vuelve a revisión: actividad no cumplida",
+                    "status": review_status,
+                    "by": updated_by,
+                }
+            )
+        _append_review_events(conn, record_id, events)
+        conn.execute(
+            "UPDATE submissions SET review_status = ? WHERE id = ? AND review_status != ?",
+            (review_status, record_id, review_status),
+        )
+        _update_search_observations(conn, record_id)
+        conn.commit()
+    return review_status
+
+def list_review_events(
+    record_id: int | None = None,
+    username: str | None = None,
+    limit: int | None = 100,
+) -> list[dict]:
+    clauses = []
+    params: list = []
+    if record_id is not None:
+        clauses.append("submission_id = ?")
+        params.append(record_id)
+    if username:
+        clauses.append("username = ?")
+        params.append(username)
+    where = " WHERE " + " AND ".join(clauses) if clauses else ""
+    sql = f"SELECT id, submission_id, created_at, action, status, username, activity_id, obs FROM review_events{where} ORDER BY id DESC"
+    if limit is not None and limit > 0:
+        sql += " LIMIT ?"
+        params.append(limit)
+    with get_connection() as conn:
+        rows = conn.execute(sql, params).fetchall()
+    return [_row_to_dict(row) for row in rows]
+
+def list_period_reviews(
+    period_key: str,
+    owner_id: str | None = None,
+    owner_username: str | None = None,
+    review_status: str | None = None,
+    contractor: str | None = None,
+    contractor_contains: str | None = None,
+) -> list[dict]:
+    # One period's submissions in contractor order with their review and the
+    # activity tally, read from the indexed columns and the review tables
+    # only (never data_json).
+    where, params = _submission_filters(
+        owner_id, owner_username, review_status, period_key, contractor,
+        contractor_contains=contractor_contains,
+    )
+    with get_connection() as conn:
+        cur = conn.cursor()
+        cur.row_factory = None
+        rows = cur.execute(
+            f"""
+            SELECT id, created_at, contractor, contract_no, review_status,
+                COALESCE(r.observacion_global, ''), COALESCE(r.updated_at, ''), COALESCE(r.updated_by, '')
+            FROM submissions LEFT JOIN reviews r ON r.submission_id = id{where}
+            ORDER BY contractor, id
+            """,
+            params,
+        ).fetchall()
+        reports = {
+            row[0]: {
+                "id": row[0],
+                "created_at": row[1],
+                "contractor": row[2],
+                "contract_no": row[3],
+                "review_status": row[4],
+                "observacion_global": row[5],
+                "reviewed_at": row[6],
+                "reviewed_by": row[7],
+                "activities": {status: 0 for status in ACTIVITY_STATUSES},
+                "activity_observations": [],
+            }
+            for row in rows
+        }
+        record_ids = list(reports)
+        for start in range(0, len(record_ids), MIGRATION_BATCH_SIZE):
+            chunk = record_ids[start:start + MIGRATION_BATCH_SIZE]
+            placeholders = ", ".join("?" for _ in chunk)
+            for record_id, description, status, obs in cur.execute(
+                f"""
+                SELECT submission_id, description, status, obs FROM review_activities
+                WHERE submission_id IN ({placeholders}) ORDER BY submission_id, position
+                """,
+                chunk,
+            ):
+                report = reports[record_id]
+                tally = report["activities"]
+                tally[status] = tally.get(status, 0) + 1
+                if obs:
+                    report["activity_observations"].append({"desc": description, "obs": obs})
+    return list(reports.values())
+
+def _generation_job_from_row(row: sqlite3.Row) -> dict:
+    job = _row_to_dict(row)
+    job["progress"] = json.loads(job.pop("progress_json") or "{}")
+    job["files"] = json.loads(job.pop("files_json") or "{}")
+    job["timings"] = json.loads(job.pop("timings_json", None) or "{}")
+    return job
+
+def create_generation_job(submission_id: int, documents: list[str], created_by: str = "") -> int:
+    now = datetime.utcnow().replace(microsecond=0).isoformat()
+    progress = {document: "pending" for document in documents}
+    with get_connection() as conn:
+        cur = conn.execute(
+            """
+            INSERT INTO generation_jobs (submission_id, progress_json, created_by, created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?)
+            """,
+            (submission_id, json.dumps(progress), created_by, now, now),
+        )
+        conn.commit()
+        return cur.lastrowid
+
+def get_generation_job(job_id: int) -> dict | None:
+    with get_connection() as conn:
+        row = conn.execute("SELECT * FROM generation_jobs WHERE id = ?", (job_id,)).fetchone()
+    return _generation_job_from_row(row) if row else None
+
+def claim_generation_job(job_id: int) -> dict | None:
+    # Only one worker can move a job from queued to running.
+    now = datetime.utcnow().replace(microsecond=0).isoformat()
+    with get_connection() as conn:
+        cur = conn.execute(
+            """
+            UPDATE generation_jobs SET status = 'running', attempts = attempts + 1, updated_at = ?
+            WHERE id = ? AND status = 'queued'
+            """,
+            (now, job_id),
+        )
+        conn.commit()
+        if cur.rowcount == 0:
+            return None
+        row = conn.execute("SELECT * FROM generation_jobs WHERE id = ?", (job_id,)).fetchone()
+    return _generation_job_from_row(row) if row else None
+
+def update_generation_job_progress(job_id: int, document: str, state: str) -> None:
+    now = datetime.utcnow().replace(microsecond=0).isoformat()
+    with get_connection() as conn:
+        conn.execute(
+            """
+            UPDATE generation_jobs SET progress_json = json_set(progress_json, ?, ?), updated_at = ?
+            WHERE id = ?
+            """,
+            (f'$."{document}"', state, now, job_id),
+        )
+        conn.commit()
+
+def finish_generation_job(job_id: int, files: dict, timings: dict | None = None) -> None:
+    now = datetime.utcnow().replace(microsecond=0).isoformat()
+    with get_connection() as conn:
+        conn.execute(
+            """
+            UPDATE generation_jobs SET status = 'done', files_json = ?, timings_json = ?, error = '', updated_at = ?
+            WHERE id = ?
+            """,
+            (json.dumps(files), json.dumps(timings or {}), now, job_id),
+        )
+        conn.commit()
+
+def fail_generation_job(job_id: int, error: str) -> None:
+    now = datetime.utcnow().replace(microsecond=0).isoformat()
+    with get_connection() as conn:
+        conn.execute(
+            "UPDATE generation_jobs SET status = 'failed', error = ?, updated_at = ? WHERE id = ?",
+            (error[:500], now, job_id),
+        )
+        conn.commit()
+
+def requeue_unfinished_generation_jobs() -> list[int]:
+    # Called at startup: jobs left running by a previous process go back to
+    # the queue unless they already used up their attempts.
+    now = datetime.utcnow().replace(microsecond=0).isoformat()
+    with get_connection() as conn:
+        conn.execute(
+            """
+            UPDATE generation_jobs SET status = 'failed', error = 'max_attempts', updated_at = ?
+            WHERE status = 'running' AND attempts >= ?
+            """,
+            (now, GENERATION_JOB_MAX_ATTEMPTS),
+        )
+        conn.execute(
+            "UPDATE generation_jobs SET status = 'queued', updated_at = ? WHERE status = 'running'",
+            (now,),
+        )
+        conn.commit()
+        rows = conn.execute(
+            "SELECT id FROM generation_jobs WHERE status = 'queued' ORDER BY id ASC"
+        ).fetchall()
+    return [row[0] for row in rows]
+
+def list_submission_ids(after_id: int = 0, limit: int = MIGRATION_BATCH_SIZE) -> list[int]:
+    with get_connection() as conn:
+        rows = conn.execute(
+            "SELECT id FROM submissions WHERE id > ? ORDER BY id ASC LIMIT ?",
+            (after_id, max(int(limit), 1)),
+        ).fetchall()
+    return [row[0] for row in rows]
+
+def get_render_keys(record_ids: list[int]) -> dict[int, dict]:
+    if not record_ids:
+        return {}
+    placeholders = ", ".join("?" for _ in record_ids)
+    with get_connection() as conn:
+        rows = conn.execute(
+            f"SELECT submission_id, doc_key, render_key FROM rendered_documents WHERE submission_id IN ({placeholders})",
+            list(record_ids),
+        ).fetchall()
+    result: dict[int, dict] = {}
+    for row in rows:
+        result.setdefault(row[0], {})[row[1]] = row[2]
+    return result
+
+def save_render_keys(record_id: int, render_keys: dict) -> None:
+    if not render_keys:
+        return
+    now = datetime.utcnow().replace(microsecond=0).isoformat()
+    with get_connection() as conn:
+        conn.executemany(
+            """
+            INSERT INTO rendered_documents (submission_id, doc_key, render_key, rendered_at)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(submission_id, doc_key) DO UPDATE SET
+                render_key = excluded.render_key, rendered_at = excluded.rendered_at
+            """,
+            [(record_id, doc_key, render_key, now) for doc_key, render_key in render_keys.items()],
+        )
+        conn.commit()
+
+def create_rerender_run(created_by: str = "") -> int:
+    now = datetime.utcnow().replace(microsecond=0).isoformat()
+    with get_connection() as conn:
+        cur = conn.execute(
+            "INSERT INTO rerender_runs (created_by, created_at, updated_at) VALUES (?, ?, ?)",
+            (created_by, now, now),
+        )
+        conn.commit()
+        return cur.lastrowid
+
+def get_rerender_run(run_id: int | None = None) -> dict | None:
+    # The given run, or the most recent one.
+    with get_connection() as conn:
+        if run_id is None:
+            row = conn.execute("SELECT * FROM rerender_runs ORDER BY id DESC LIMIT 1").fetchone()
+        else:
+            row = conn.execute("SELECT * FROM rerender_runs WHERE id = ?", (run_id,)).fetchone()
+    return _row_to_dict(row) if row else None
+
+def get_unfinished_rerender_run() -> dict | None:
+    with get_connection() as conn:
+        row = conn.execute(
+            "SELECT * FROM rerender_runs WHERE status = 'running' ORDER BY id DESC LIMIT 1"
+        ).fetchone()
+    return _row_to_dict(row) if row else None
+
+def update_rerender_run(run_id: int, **fields) -> None:
+    allowed = {"status", "last_id", "scanned", "rendered", "skipped", "failed", "error"}
+    updates = {name: value for name, value in fields.items() if name in allowed}
+    updates["updated_at"] = datetime.utcnow().replace(microsecond=0).isoformat()
+    assignments = ", ".join(f"{name} = ?" for name in updates)
+    with get_connection() as conn:
+        conn.execute(
+            f"UPDATE rerender_runs SET {assignments} WHERE id = ?",
+            (*updates.values(), run_id),
+        )
+        conn.commit()
+
+def reencode_submissions(
+    codec: str | None = None,
+    batch_size: int = MIGRATION_BATCH_SIZE,
+    pause_seconds: float = 0.0,
+    progress=None,
+) -> dict:
+    # Rewrites stored payloads with the given codec in short transactions, so
+    # it can run while the app keeps serving requests.
+    codec = (codec or PAYLOAD_CODEC).strip().lower()
+    header = PAYLOAD_CODEC_HEADERS.get(codec)
+    stats = {"scanned": 0, "reencoded": 0, "bytes_before": 0, "bytes_after": 0}
+    last_id = 0
+    while True:
+        with get_connection() as conn:
+            rows = conn.execute(
+                "SELECT id, data_json FROM submissions WHERE id > ? ORDER BY id ASC LIMIT ?",
+                (last_id, max(int(batch_size), 1)),
+            ).fetchall()
+            if not rows:
+                break
+            updates = []
+            for row in rows:
+                value = row[1]
+                stats["scanned"] += 1
+                if header is None:
+                    current = isinstance(value, str) and "\\u" not in value
+                else:
+                    current = isinstance(value, bytes) and value[:1] == bytes((header,))
+                if current:
+                    continue
+                try:
+                    payload = _load_payload(value)
+                except (ValueError, zlib.error):
+                    continue
+                stored_value = _encode_payload(_dump_payload(payload), codec)
+                stats["bytes_before"] += len(value)
+                stats["bytes_after"] += len(stored_value)
+                updates.append((stored_value, len(stored_value), row[0]))
+            conn.executemany(
+                "UPDATE submissions SET data_json = ?, payload_size = ? WHERE id = ?",
+                updates,
+            )
+            conn.commit()
+        stats["reencoded"] += len(updates)
+        last_id = rows[-1][0]
+        if progress:
+            progress(stats)
+        if pause_seconds > 0:
+            time.sleep(pause_seconds)
+    return stats
@@ -1,13 +1,37 @@
+import atexit
 import base64
-import io
+import hashlib
+import json
 import math
+import multiprocessing
 import os
-from urllib.parse import quote
-from urllib.request import urlopen
-from docxtpl import DocxTemplate
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import closing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
 from docx import Document
+from docx.enum.section import WD_ORIENT
 from docx.enum.text import WD_ALIGN_PARAGRAPH
-from docx.shared import Cm
+from docx.oxml import OxmlElement
+from docx.shared import Cm, Pt
+
+import db
+from db import load_blob_bytes, parse_blob_ref
+from services import evidence_images, qr_code
+from services.docx_stream import StreamingDocxWriter
+from services.file_mode import set_default_mode
+from services.table_fill import fill_table
+from services.template_cache import get_template, template_fingerprint
+from services.template_manifest import (
+    ACTIVITY_TABLE_HEADERS,
+    build_manifest,
+    find_header_row,
+    get_manifest_entry,
+    TemplateManifestError,
+)
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 ROOT_DIR = os.path.dirname(BASE_DIR)
@@ -21,77 +45,131 @@ TEMPLATE_FILES = {
     "anexo": "ANEXO.docx",
 }
 
-def _normalize(text: str) -> str:
-    return " ".join(text.upper().split())
+def _env_workers() -> int:
+    try:
+        return max(int(os.environ.get("APP_DOCX_WORKERS", "0")), 0)
+    except ValueError:
+        return 0
 
-def _cell_has_keywords(text: str, keywords: list[str]) -> bool:
-    normalized = _normalize(text)
-    return all(keyword in normalized for keyword in keywords)
+# 0 or 1 renders the documents one after another in the calling thread;
+# N > 1 renders them concurrently on a pool of N worker processes.
+DOCX_WORKERS = _env_workers()
 
-def _find_gestion_table(doc: Document):
-    for table in doc.tables:
-        for row_index, row in enumerate(table.rows):
-            if len(row.cells) < 2:
-                continue
-            if _cell_has_keywords(row.cells[0].text, ["ACTIVIDADES", "CONTRATO"]) and _cell_has_keywords(
-                row.cells[1].text, ["EJECUT"]
-            ):
-                return table, row_index
-    return None, None
-
-def _find_supervision_table(doc: Document):
-    for table in doc.tables:
-        for row_index, row in enumerate(table.rows):
-            if len(row.cells) < 3:
-                continue
-            matches_contrato = _cell_has_keywords(
-                row.cells[0].text, ["ACTIVIDADES", "CONTRATO"]
-            ) and _cell_has_keywords(row.cells[1].text, ["EJECUT"])
-            matches_reportadas = _cell_has_keywords(
-                row.cells[0].text, ["ACTIVIDADES", "REPORT"]
-            ) and _cell_has_keywords(row.cells[1].text, ["OBSERV"])
-            if (matches_contrato or matches_reportadas) and _cell_has_keywords(
-                row.cells[2].text, ["EVIDEN"]
-            ):
-                return table, row_index
-    return None, None
-
-def _clear_rows_after(table, keep_rows: int) -> None:
-    # Remove all rows after keep_rows (0-based count)
-    while len(table.rows) > keep_rows:
-        table._tbl.remove(table.rows[-1]._tr)
+RENDER_CACHE_ENABLED = os.environ.get("APP_RENDER_CACHE", "1").strip() != "0"
+# Empty keeps the cache in OUTPUT_DIR/.render_cache, on the same filesystem as
+# the outputs so hits are hardlinks.
+RENDER_CACHE_DIR = os.environ.get("APP_RENDER_CACHE_DIR", "").strip()
+
+def _env_cache_max_files() -> int:
+    try:
+        return max(int(os.environ.get("APP_RENDER_CACHE_MAX_FILES", "2000")), 1)
+    except ValueError:
+        return 2000
+
+RENDER_CACHE_MAX_FILES = _env_cache_max_files()
+# Bump when the builder code changes what it writes for the same inputs.
+RENDER_CACHE_VERSION = 6
+
+# Printed size of each evidence photo in the ANEXO grid.
+EVIDENCE_IMAGE_CM = 4
+
+TABLE_CONTEXT_KEYS = (
+    "obligaciones_directas_items",
+    "obligaciones_directas_ejecutadas_tercera_items",
+    "obligaciones_directas_items_tercera",
+)
+# Context names that carry evidence (photos, PDFs). _without_evidence()
+# strips them for documents whose template does not reference them.
+EVIDENCE_CONTEXT_KEYS = frozenset({"obligaciones_directas_items", "aportes_planilla_pdf"})
+
+_pool: ProcessPoolExecutor | None = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+def load_template_manifest() -> dict:
+    # Validates every .docx template (parses, has its activity table and its
+    # required placeholders) and records its anchors; called at startup so a
+    # broken template fails there and not mid-request.
+    manifest = build_manifest(
+        {
+            key: os.path.join(TEMPLATES_DIR, filename)
+            for key, filename in TEMPLATE_FILES.items()
+            if key != "anexo"
+        }
+    )
+    errors = [
+        f"{entry.filename}: faltan los campos {', '.join(sorted(entry.missing_placeholders))}"
+        for entry in manifest.values()
+        if entry.missing_placeholders
+    ]
+    if errors:
+        raise TemplateManifestError("; ".join(errors))
+    return manifest
+
+def _find_activity_table(doc: Document, key: str):
+    is_header = ACTIVITY_TABLE_HEADERS[key]
+    anchor = get_manifest_entry(key, os.path.join(TEMPLATES_DIR, TEMPLATE_FILES[key])).activity_table
+    tables = doc.tables
+    if anchor and anchor[0] < len(tables):
+        table = tables[anchor[0]]
+        rows = table.rows
+        if anchor[1] < len(rows) and is_header(rows[anchor[1]]):
+            return table, anchor[1]
+    # Rendering moved the table (e.g. a loop added rows or tables before it).
+    found = find_header_row(doc, is_header)
+    if found is None:
+        return None, None
+    return tables[found[0]], found[1]
+
+def _gestion_rows(items: list[dict]) -> list[list[str]]:
+    return [
+        [
+            f"{idx}. {item.get('actividad_contrato', '').strip()}".strip(),
+            item.get("actividad_ejecutada", "").strip(),
+        ]
+        for idx, item in enumerate(items, start=1)
+    ]
 
 def _fill_gestion_table(doc: Document, items: list[dict]) -> None:
-    table, header_row_index = _find_gestion_table(doc)
+    table, header_row_index = _find_activity_table(doc, "inf_gestion")
     if table is None:
         return
-    _clear_rows_after(table, header_row_index + 1)
-    for idx, item in enumerate(items, start=1):
-        row = table.add_row()
-        left = f"{idx}. {item.get('actividad_contrato', '').strip()}".strip()
-        right = item.get("actividad_ejecutada", "").strip()
-        row.cells[0].text = left
-        row.cells[1].text = right
+    fill_table(table._tbl, header_row_index, _gestion_rows(items))
 
-def _fill_supervision_table(doc: Document, items: list[dict]) -> None:
-    table, header_row_index = _find_supervision_table(doc)
-    if table is None:
-        return
-    _clear_rows_after(table, header_row_index + 1)
+def _third_person_texts(context: dict) -> list[str]:
+    texts = context.get("obligaciones_directas_ejecutadas_tercera_items")
+    if isinstance(texts, list):
+        return [str(text or "") for text in texts]
+    # Records saved before the sidecar list kept full item copies.
+    legacy_items = context.get("obligaciones_directas_items_tercera")
+    if isinstance(legacy_items, list):
+        return [
+            str(item.get("actividad_ejecutada_tercera", "")) if isinstance(item, dict) else ""
+            for item in legacy_items
+        ]
+    return []
+
+def _supervision_rows(items: list[dict], third_person: list[str]) -> list[list[str]]:
+    rows = []
     for idx, item in enumerate(items, start=1):
-        row = table.add_row()
         left = f"{idx}. {item.get('actividad_contrato', '').strip()}".strip()
-        right = item.get("actividad_ejecutada_tercera", "").strip()
+        right = third_person[idx - 1].strip() if idx <= len(third_person) else ""
         if not right:
             right = item.get("actividad_ejecutada", "").strip()
-        evidencias = item.get("aporta_evidencias", "").strip()
-        row.cells[0].text = left
-        row.cells[1].text = right
-        row.cells[2].text = evidencias
+        rows.append([left, right, item.get("aporta_evidencias", "").strip()])
+    return rows
+
+def _fill_supervision_table(doc: Document, items: list[dict], third_person: list[str]) -> None:
+    table, header_row_index = _find_activity_table(doc, "inf_supervision")
+    if table is None:
+        return
+    fill_table(table._tbl, header_row_index, _supervision_rows(items, third_person))
 
 def _decode_data_url(value: str) -> bytes | None:
     if not value:
         return None
+    if parse_blob_ref(value):
+        return load_blob_bytes(value)
     if value.startswith("data:"):
         try:
             _, encoded = value.split(",", 1)
@@ -104,22 +182,15 @@ def _decode_data_url(value: str) -> bytes | None:
     except (ValueError, base64.binascii.Error):
         return None
 
-def _fetch_qr_image_bytes(link: str) -> bytes | None:
+def _qr_image_bytes(link: str) -> bytes | None:
     value = str(link or "").strip()
     if not value:
         return None
-    qr_url = (
-        "https://api.qrserver.com/v1/create-qr-code/?size=220x220&data="
-        + quote(value, safe="")
-    )
-    try:
-        with urlopen(qr_url, timeout=8) as response:
-            content = response.read()
-            return content if content else None
-    except Exception:
-        return None
+    return qr_code.qr_png(value)
 
-def _build_anexo_document(context: dict, out_path: str) -> None:
+def _build_anexo_document(context: dict, out_path: str, stages: dict | None = None) -> None:
+    # stages, when given, receives the milliseconds spent on evidence photos
+    # ("images") and QR codes ("qr").
     doc = Document()
     doc.add_heading("ANEXO", level=1)
     doc.paragraphs[-1].alignment = WD_ALIGN_PARAGRAPH.CENTER
@@ -128,152 +199,565 @@ def _build_anexo_document(context: dict, out_path: str) -> None:
         items = []
     if not items:
         doc.add_paragraph("No se registraron actividades con evidencias.")
-        doc.save(out_path)
+        _save_atomic(doc, out_path)
         return
 
-    for idx, item in enumerate(items, start=1):
-        actividad = item.get("actividad_contrato", "").strip()
-        ejecutada = item.get("actividad_ejecutada", "").strip()
-        paragraph = doc.add_paragraph(
-            f"{idx}. Actividad del contrato: {actividad}"
-        )
-        paragraph.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-        paragraph = doc.add_paragraph(f"Actividad ejecutada: {ejecutada}")
-        paragraph.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-
-        evidencias = item.get("evidencias") or {}
-        images = evidencias.get("images") or []
-        groups = evidencias.get("groups") or []
-        pdfs = evidencias.get("pdfs") or []
-        links = []
-        raw_links = evidencias.get("links")
-        if isinstance(raw_links, list):
-            for value in raw_links:
-                normalized = str(value or "").strip()
-                if normalized and normalized not in links:
-                    links.append(normalized)
-        legacy_link = str(evidencias.get("link") or "").strip()
-        if legacy_link and legacy_link not in links:
-            links.append(legacy_link)
-        total_groups = max(len(groups), math.ceil(len(images) / 3))
-
-        if not images and not pdfs and not links:
-            doc.add_paragraph("Evidencias: Sin evidencia.")
-            doc.add_paragraph("")
-            continue
+    with StreamingDocxWriter(doc, out_path) as writer:
+        _write_anexo_items(doc, writer, items, {} if stages is None else stages)
 
-        if images:
-            for group_index in range(total_groups):
-                start = group_index * 3
-                chunk = images[start : start + 3]
-                if not chunk:
-                    continue
-                table = doc.add_table(rows=1, cols=3)
-                for cell_index, image in enumerate(chunk):
-                    data_url = image.get("dataUrl") or image.get("data_url")
-                    image_bytes = _decode_data_url(data_url)
-                    if not image_bytes:
-                        continue
-                    run = table.rows[0].cells[cell_index].paragraphs[0].add_run()
-                    run.add_picture(
-                        io.BytesIO(image_bytes), width=Cm(4), height=Cm(4)
-                    )
+def _add_elapsed(stages: dict, name: str, started: float) -> None:
+    stages[name] = round(stages.get(name, 0.0) + (time.perf_counter() - started) * 1000, 2)
 
-                group = groups[group_index] if group_index < len(groups) else {}
-                description = (group.get("description") or "").strip()
-                date = (group.get("date") or "").strip()
-                paragraph = doc.add_paragraph(
-                    f"Descripcion: {description}" if description else "Descripcion:"
-                )
-                paragraph.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-                paragraph = doc.add_paragraph(
-                    f"Fecha: {date}" if date else "Fecha:"
-                )
-                paragraph.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-                doc.add_paragraph("")
-        else:
-            doc.add_paragraph("Evidencia fotografica: Sin evidencia.")
+def _write_anexo_items(doc: Document, writer: StreamingDocxWriter, items: list, stages: dict) -> None:
+    # Photos are decoded and prepared a few at a time, in the order they
+    # appear, and written to the package as soon as they are placed; the body
+    # is flushed after each activity.
+    prepared = evidence_images.iter_prepared_images(
+        [
+            image.get("dataUrl") or image.get("data_url")
+            for item in items
+            for image in ((item.get("evidencias") or {}).get("images") or [])
+        ],
+        _decode_data_url,
+        EVIDENCE_IMAGE_CM,
+        EVIDENCE_IMAGE_CM,
+    )
+    # source -> relationship id of its picture (None if it could not be loaded).
+    placed: dict = {}
 
-        if pdfs:
-            paragraph = doc.add_paragraph("Evidencia PDF:")
+    def picture_for(source) -> str | None:
+        started = time.perf_counter()
+        while source not in placed:
+            next_source, image_bytes = next(prepared)
+            placed[next_source] = writer.add_image(image_bytes) if image_bytes else None
+        _add_elapsed(stages, "images", started)
+        return placed[source]
+
+    # Closing the generator shuts down its image workers even when an
+    # activity fails halfway through.
+    with closing(prepared):
+        for idx, item in enumerate(items, start=1):
+            actividad = item.get("actividad_contrato", "").strip()
+            ejecutada = item.get("actividad_ejecutada", "").strip()
+            paragraph = doc.add_paragraph(
+                f"{idx}. Actividad del contrato: {actividad}"
+            )
             paragraph.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-            for pdf_index, pdf in enumerate(pdfs, start=1):
-                pdf_name = ""
-                if isinstance(pdf, dict):
-                    pdf_name = str(pdf.get("name", "")).strip()
-                if not pdf_name:
-                    pdf_name = f"Documento {pdf_index}.pdf"
-                paragraph = doc.add_paragraph(f"- {pdf_name}")
-                paragraph.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-        else:
-            paragraph = doc.add_paragraph("Evidencia PDF: Sin evidencia.")
+            paragraph = doc.add_paragraph(f"Actividad ejecutada: {ejecutada}")
             paragraph.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
 
-        if links:
-            paragraph = doc.add_paragraph("Enlaces de evidencia:")
-            paragraph.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-            for link_index, link in enumerate(links, start=1):
-                paragraph = doc.add_paragraph(f"{link_index}. {link}")
-                paragraph.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-                qr_bytes = _fetch_qr_image_bytes(link)
-                if qr_bytes:
-                    qr_paragraph = doc.add_paragraph()
-                    qr_paragraph.alignment = WD_ALIGN_PARAGRAPH.LEFT
-                    qr_paragraph.add_run().add_picture(
-                        io.BytesIO(qr_bytes), width=Cm(4), height=Cm(4)
+            evidencias = item.get("evidencias") or {}
+            images = evidencias.get("images") or []
+            groups = evidencias.get("groups") or []
+            pdfs = evidencias.get("pdfs") or []
+            links = []
+            raw_links = evidencias.get("links")
+            if isinstance(raw_links, list):
+                for value in raw_links:
+                    normalized = str(value or "").strip()
+                    if normalized and normalized not in links:
+                        links.append(normalized)
+            legacy_link = str(evidencias.get("link") or "").strip()
+            if legacy_link and legacy_link not in links:
+                links.append(legacy_link)
+            total_groups = max(len(groups), math.ceil(len(images) / 3))
+
+            if not images and not pdfs and not links:
+                doc.add_paragraph("Evidencias: Sin evidencia.")
+                doc.add_paragraph("")
+                writer.flush()
+                continue
+
+            if images:
+                for group_index in range(total_groups):
+                    start = group_index * 3
+                    chunk = images[start : start + 3]
+                    if not chunk:
+                        continue
+                    table = doc.add_table(rows=1, cols=3)
+                    for cell_index, image in enumerate(chunk):
+                        data_url = image.get("dataUrl") or image.get("data_url")
+                        rel_id = picture_for(data_url) if data_url else None
+                        if not rel_id:
+                            continue
+                        run = table.rows[0].cells[cell_index].paragraphs[0].add_run()
+                        writer.add_picture(
+                            run, rel_id, Cm(EVIDENCE_IMAGE_CM), Cm(EVIDENCE_IMAGE_CM)
+                        )
+
+                    group = groups[group_index] if group_index < len(groups) else {}
+                    description = (group.get("description") or "").strip()
+                    date = (group.get("date") or "").strip()
+                    paragraph = doc.add_paragraph(
+                        f"Descripcion: {description}" if description else "Descripcion:"
                     )
-                else:
+                    paragraph.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
                     paragraph = doc.add_paragraph(
-                        "Codigo QR no disponible (sin conexion en el momento de generar)."
+                        f"Fecha: {date}" if date else "Fecha:"
                     )
                     paragraph.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
+                    doc.add_paragraph("")
+            else:
+                doc.add_paragraph("Evidencia fotografica: Sin evidencia.")
+
+            if pdfs:
+                paragraph = doc.add_paragraph("Evidencia PDF:")
+                paragraph.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
+                for pdf_index, pdf in enumerate(pdfs, start=1):
+                    pdf_name = ""
+                    if isinstance(pdf, dict):
+                        pdf_name = str(pdf.get("name", "")).strip()
+                    if not pdf_name:
+                        pdf_name = f"Documento {pdf_index}.pdf"
+                    paragraph = doc.add_paragraph(f"- {pdf_name}")
+                    paragraph.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
+            else:
+                paragraph = doc.add_paragraph("Evidencia PDF: Sin evidencia.")
+                paragraph.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
+
+            if links:
+                paragraph = doc.add_paragraph("Enlaces de evidencia:")
+                paragraph.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
+                for link_index, link in enumerate(links, start=1):
+                    paragraph = doc.add_paragraph(f"{link_index}. {link}")
+                    paragraph.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
+                    started = time.perf_counter()
+                    qr_bytes = _qr_image_bytes(link)
+                    if qr_bytes:
+                        qr_paragraph = doc.add_paragraph()
+                        qr_paragraph.alignment = WD_ALIGN_PARAGRAPH.LEFT
+                        writer.add_picture(
+                            qr_paragraph.add_run(), writer.add_image(qr_bytes), Cm(4), Cm(4)
+                        )
+                    else:
+                        paragraph = doc.add_paragraph(
+                            "Codigo QR no disponible (enlace demasiado largo)."
+                        )
+                        paragraph.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
+                    _add_elapsed(stages, "qr", started)
+            else:
+                paragraph = doc.add_paragraph("Enlace de evidencia: Sin evidencia.")
+                paragraph.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
+
+            doc.add_paragraph("")
+            writer.flush()
+
+PERIOD_TABLE_HEADERS = (
+    "No.",
+    "Contratista",
+    "Contrato",
+    "Estado",
+    "Actividades",
+    "Cumplimiento",
+    "Observaciones",
+)
+PERIOD_STATUS_LABELS = {"aprobado": "Aprobado", "rechazado": "Rechazado", "pendiente": "Pendiente"}
+MONTH_NAMES = (
+    "enero", "febrero", "marzo", "abril", "mayo", "junio",
+    "julio", "agosto", "septiembre", "octubre", "noviembre", "diciembre",
+)
+# Activity descriptions are cut to this length in the observations column.
+PERIOD_ACTIVITY_DESC_CHARS = 80
+
+def _period_label(period_key: str) -> str:
+    year, _, month = period_key.partition("-")
+    if month.isdigit() and 1 <= int(month) <= 12:
+        return f"{MONTH_NAMES[int(month) - 1]} de {year}"
+    return period_key or "sin periodo"
+
+def _compliance_text(tally: dict) -> str:
+    reviewed = sum(tally.values())
+    if not reviewed:
+        return "Sin revision"
+    done = tally.get("cumplida", 0)
+    return f"{done}/{reviewed} ({done * 100 / reviewed:.0f}%)"
+
+def _period_rows(reports: list[dict]) -> list[list[str]]:
+    rows = []
+    for idx, report in enumerate(reports, start=1):
+        tally = report["activities"]
+        observations = []
+        if report["observacion_global"]:
+            observations.append(report["observacion_global"])
+        for activity in report["activity_observations"]:
+            desc = activity["desc"]
+            if len(desc) > PERIOD_ACTIVITY_DESC_CHARS:
+                desc = desc[: PERIOD_ACTIVITY_DESC_CHARS - 3].rstrip() + "..."
+            observations.append(f"- {desc}: {activity['obs']}" if desc else f"- {activity['obs']}")
+        rows.append(
+            [
+                str(idx),
+                report["contractor"],
+                report["contract_no"],
+                PERIOD_STATUS_LABELS.get(report["review_status"], report["review_status"]),
+                "\n".join(
+                    [
+                        f"Cumplidas: {tally.get('cumplida', 0)}",
+                        f"No cumplidas: {tally.get('no cumplida', 0)}",
+                        f"Pendientes: {tally.get('pendiente', 0)}",
+                    ]
+                ),
+                _compliance_text(tally),
+                "\n".join(observations),
+            ]
+        )
+    return rows
+
+def build_period_document(period_key: str, reports: list[dict], out_path: str) -> None:
+    # Consolidated supervision report for one period: totals plus one table
+    # row per submission (reports as returned by db.list_period_reviews).
+    doc = Document()
+    section = doc.sections[0]
+    section.orientation = WD_ORIENT.LANDSCAPE
+    section.page_width, section.page_height = section.page_height, section.page_width
+    for margin in ("left_margin", "right_margin", "top_margin", "bottom_margin"):
+        setattr(section, margin, Cm(1.5))
+
+    doc.add_heading("CONSOLIDADO DE SUPERVISION", level=1)
+    doc.paragraphs[-1].alignment = WD_ALIGN_PARAGRAPH.CENTER
+    paragraph = doc.add_paragraph(f"Periodo: {_period_label(period_key)}")
+    paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
+
+    statuses = {status: 0 for status in PERIOD_STATUS_LABELS}
+    activities: dict[str, int] = {}
+    for report in reports:
+        statuses[report["review_status"]] = statuses.get(report["review_status"], 0) + 1
+        for status, count in report["activities"].items():
+            activities[status] = activities.get(status, 0) + count
+    doc.add_paragraph(
+        f"Informes: {len(reports)} (aprobados: {statuses['aprobado']}, "
+        f"rechazados: {statuses['rechazado']}, pendientes: {statuses['pendiente']})."
+    )
+    doc.add_paragraph(
+        f"Actividades revisadas: {sum(activities.values())}; cumplimiento: {_compliance_text(activities)}; "
+        f"no cumplidas: {activities.get('no cumplida', 0)}; pendientes: {activities.get('pendiente', 0)}."
+    )
+
+    if not reports:
+        doc.add_paragraph("No hay informes registrados para este periodo.")
+        _save_atomic(doc, out_path)
+        return
+
+    table = doc.add_table(rows=1, cols=len(PERIOD_TABLE_HEADERS))
+    table.style = "Table Grid"
+    for cell, title in zip(table.rows[0].cells, PERIOD_TABLE_HEADERS):
+        run = cell.paragraphs[0].add_run(title)
+        run.bold = True
+        run.font.size = Pt(9)
+    # Repeats the header on every page.
+    table.rows[0]._tr.get_or_add_trPr().append(OxmlElement("w:tblHeader"))
+    # Rows are cloned from the header without its bold; one XML pass keeps
+    # 500+ rows fast where python-docx add_row() would not.
+    fill_table(table._tbl, 0, _period_rows(reports))
+    _save_atomic(doc, out_path)
+
+def _save_atomic(document, out_path: str) -> None:
+    # Written next to the target and moved into place, so a download never
+    # sees a half-written file.
+    fd, temp_path = tempfile.mkstemp(
+        prefix=os.path.basename(out_path) + ".",
+        suffix=".tmp",
+        dir=os.path.dirname(out_path) or ".",
+    )
+    os.close(fd)
+    try:
+        document.save(temp_path)
+        set_default_mode(temp_path)
+        os.replace(temp_path, out_path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+def _lap(stages: dict, name: str, started: float) -> float:
+    now = time.perf_counter()
+    stages[name] = round((now - started) * 1000, 2)
+    return now
+
+def _build_document(key: str, filename: str, context: dict, out_path: str) -> dict:
+    stages: dict = {}
+    started = time.perf_counter()
+    if key == "anexo":
+        _build_anexo_document(context, out_path, stages)
+        _lap(stages, "build", started)
+        return stages
+    doc = get_template(os.path.join(TEMPLATES_DIR, filename))
+    doc.render(context)
+    started = _lap(stages, "render", started)
+    items = context.get("obligaciones_directas_items")
+    if key in {"inf_gestion", "inf_supervision"} and isinstance(items, list):
+        # Activity tables are filled on the rendered document itself.
+        if key == "inf_gestion":
+            _fill_gestion_table(doc.docx, items)
         else:
-            paragraph = doc.add_paragraph("Enlace de evidencia: Sin evidencia.")
-            paragraph.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
+            _fill_supervision_table(doc.docx, items, _third_person_texts(context))
+        started = _lap(stages, "fill_tables", started)
+    _save_atomic(doc, out_path)
+    _lap(stages, "save", started)
+    return stages
 
-        doc.add_paragraph("")
+def _build_document_task(key: str, filename: str, context: dict, out_path: str, db_path: str) -> dict:
+    # Pool entry point: workers are spawned, so the parent's DB path is passed
+    # explicitly for evidence stored in the blobs table.
+    db.DB_PATH = db_path
+    return _build_document(key, filename, context, out_path)
 
-    doc.save(out_path)
+def _without_evidence(context: dict) -> dict:
+    items = context.get("obligaciones_directas_items")
+    if not isinstance(items, list) and "aportes_planilla_pdf" not in context:
+        return context
+    trimmed = dict(context)
+    if isinstance(items, list):
+        trimmed["obligaciones_directas_items"] = [
+            {name: value for name, value in item.items() if name != "evidencias"}
+            if isinstance(item, dict)
+            else item
+            for item in items
+        ]
+    trimmed.pop("aportes_planilla_pdf", None)
+    return trimmed
 
-def generate_documents(context: dict, record_id: int) -> dict:
-    os.makedirs(OUTPUT_DIR, exist_ok=True)
-    outputs = {}
-    for key, filename in TEMPLATE_FILES.items():
-        if key == "anexo":
-            out_name = f"{record_id:05d}_{filename}"
-            out_path = os.path.join(OUTPUT_DIR, out_name)
-            _build_anexo_document(context, out_path)
-            outputs[key] = out_path
+def _document_contexts(context: dict, keys: list) -> dict:
+    # The context each document renders from, the same in the sequential and
+    # the pool path. Only the ANEXO reads evidence, so the other documents
+    # get a copy without it (large data URLs are not pickled to every
+    # worker), unless their template references a context name that carries
+    # evidence.
+    trimmed = _without_evidence(context)
+    contexts = {}
+    for key in keys:
+        if key == "anexo" or trimmed is context:
+            contexts[key] = context
             continue
-        template_path = os.path.join(TEMPLATES_DIR, filename)
-        doc = DocxTemplate(template_path)
-        doc.render(context)
-        out_name = f"{record_id:05d}_{filename}"
-        out_path = os.path.join(OUTPUT_DIR, out_name)
-        temp_path = out_path + ".tmp"
-        doc.save(temp_path)
+        _, variables = template_fingerprint(os.path.join(TEMPLATES_DIR, TEMPLATE_FILES[key]))
+        contexts[key] = context if EVIDENCE_CONTEXT_KEYS & set(variables) else trimmed
+    return contexts
+
+def _render_cache_dir() -> str:
+    return RENDER_CACHE_DIR or os.path.join(OUTPUT_DIR, ".render_cache")
 
+def _render_cache_key(key: str, filename: str, context: dict, render_context: dict) -> str:
+    digest = hashlib.sha256(f"{RENDER_CACHE_VERSION}:{key}:".encode("utf-8"))
+    if key == "anexo":
+        items = context.get("obligaciones_directas_items")
+        if not isinstance(items, list):
+            items = []
+        digest.update(
+            f"{evidence_images.settings_key()}:{qr_code.QR_RENDER_VERSION}".encode("ascii")
+        )
+        relevant = {"obligaciones_directas_items": items}
+    else:
+        template_digest, variables = template_fingerprint(os.path.join(TEMPLATES_DIR, filename))
+        digest.update(template_digest.encode("ascii"))
+        names = set(variables)
         if key in {"inf_gestion", "inf_supervision"}:
-            items = context.get("obligaciones_directas_items")
-            if isinstance(items, list):
-                word_doc = Document(temp_path)
-                if key == "inf_gestion":
-                    _fill_gestion_table(word_doc, items)
-                else:
-                    items_supervision = context.get(
-                        "obligaciones_directas_items_tercera", items
-                    )
-                    if not isinstance(items_supervision, list):
-                        items_supervision = items
-                    _fill_supervision_table(word_doc, items_supervision)
-                word_doc.save(out_path)
+            names.update(TABLE_CONTEXT_KEYS)
+        relevant = {name: render_context.get(name) for name in names}
+        # Keeps renders from a trimmed and a full context apart.
+        digest.update(b"full:" if render_context is context else b"trimmed:")
+    digest.update(
+        json.dumps(relevant, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")
+    )
+    return digest.hexdigest()
+
+def _link_or_copy(source: str, target: str) -> None:
+    # Linked under a temporary name and renamed, so the target is replaced
+    # atomically like _save_atomic() does.
+    source_stat = os.stat(source)
+    try:
+        if os.path.samestat(source_stat, os.stat(target)):
+            # rename() between two links of one file is a no-op.
+            return
+    except FileNotFoundError:
+        pass
+    temp_path = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        try:
+            os.link(source, temp_path)
+        except OSError:
+            shutil.copyfile(source, temp_path)
+        os.replace(temp_path, target)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+def _restore_cached(cache_key: str, out_path: str) -> bool:
+    cached_path = os.path.join(_render_cache_dir(), f"{cache_key}.docx")
+    try:
+        _link_or_copy(cached_path, out_path)
+    except FileNotFoundError:
+        return False
+    return True
+
+def _store_cached(cache_key: str, out_path: str) -> None:
+    cache_dir = _render_cache_dir()
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        _link_or_copy(out_path, os.path.join(cache_dir, f"{cache_key}.docx"))
+        _prune_render_cache(cache_dir)
+    except OSError:
+        pass
+
+def _prune_render_cache(cache_dir: str) -> None:
+    with os.scandir(cache_dir) as entries:
+        files = [entry for entry in entries if entry.name.endswith(".docx")]
+    if len(files) <= RENDER_CACHE_MAX_FILES:
+        return
+    # Oldest tenth goes, so pruning does not run on every store.
+    files.sort(key=lambda entry: entry.stat().st_mtime_ns)
+    excess = len(files) - RENDER_CACHE_MAX_FILES + RENDER_CACHE_MAX_FILES // 10
+    for entry in files[:excess]:
+        try:
+            os.remove(entry.path)
+        except OSError:
+            pass
+
+def clear_render_cache() -> int:
+    cache_dir = _render_cache_dir()
+    removed = 0
+    if not os.path.isdir(cache_dir):
+        return 0
+    with os.scandir(cache_dir) as entries:
+        for entry in entries:
+            if entry.name.endswith(".docx"):
                 try:
-                    os.remove(temp_path)
+                    os.remove(entry.path)
+                    removed += 1
                 except OSError:
                     pass
-            else:
-                os.replace(temp_path, out_path)
-        else:
-            os.replace(temp_path, out_path)
+    return removed
+
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False, cancel_futures=True)
+            # spawn everywhere: forked children would inherit the parent's
+            # SQLite connections and Flask threads.
+            _pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+            _pool_workers = workers
+        return _pool
+
+def shutdown_document_pool() -> None:
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+        _pool_workers = 0
+
+atexit.register(shutdown_document_pool)
+
+def _build_documents_parallel(
+    contexts: dict,
+    jobs: list[tuple],
+    workers: int,
+    progress=None,
+) -> dict | None:
+    try:
+        pool = _get_pool(workers)
+        # The ANEXO is usually the slowest document, so it is queued first.
+        futures = {
+            pool.submit(
+                _build_document_task,
+                key,
+                filename,
+                contexts[key],
+                out_path,
+                db.DB_PATH,
+            ): key
+            for key, filename, out_path in sorted(jobs, key=lambda job: job[0] != "anexo")
+        }
+        if progress:
+            for key in futures.values():
+                progress(key, "running")
+        results = {}
+        for future in as_completed(futures):
+            key = futures[future]
+            results[key] = future.result()
+            if progress:
+                progress(key, "done")
+        return results
+    except BrokenProcessPool:
+        shutdown_document_pool()
+        return None
+
+def document_render_keys(context: dict, keys: list | None = None) -> dict:
+    # Render key per document: equal keys mean byte-identical output.
+    keys = [key for key in TEMPLATE_FILES if keys is None or key in keys]
+    contexts = _document_contexts(context, keys)
+    return {
+        key: _render_cache_key(key, TEMPLATE_FILES[key], context, contexts[key])
+        for key in keys
+    }
+
+def generate_documents(
+    context: dict,
+    record_id: int,
+    timings: dict | None = None,
+    workers: int | None = None,
+    progress=None,
+    cache_hits: list | None = None,
+    keys: list | None = None,
+    render_keys: dict | None = None,
+) -> dict:
+    # progress(key, state) is called with "running"/"done" for each document,
+    # or "cached" when an identical earlier render was reused. keys limits the
+    # run to some documents (all of them by default); render_keys receives
+    # each written document's render key.
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    jobs = [
+        (key, filename, os.path.join(OUTPUT_DIR, f"{record_id:05d}_{filename}"))
+        for key, filename in TEMPLATE_FILES.items()
+        if keys is None or key in keys
+    ]
+    results = {}
+    cache_keys = {}
+    if RENDER_CACHE_ENABLED or render_keys is not None:
+        cache_keys = document_render_keys(context, [key for key, _, _ in jobs])
+        if render_keys is not None:
+            render_keys.update(cache_keys)
+    pending = []
+    for key, filename, out_path in jobs:
+        started = time.perf_counter()
+        if RENDER_CACHE_ENABLED and _restore_cached(cache_keys[key], out_path):
+            results[key] = {}
+            _lap(results[key], "cache", started)
+            if cache_hits is not None:
+                cache_hits.append(key)
+            if progress:
+                progress(key, "cached")
+            continue
+        pending.append((key, filename, out_path))
+    workers = DOCX_WORKERS if workers is None else workers
+    contexts = _document_contexts(context, [key for key, _, _ in pending])
+    built = None
+    if workers > 1 and len(pending) > 1:
+        # Falls back to the sequential path if the pool died (e.g. a worker was killed).
+        built = _build_documents_parallel(contexts, pending, workers, progress)
+    if built is None:
+        built = {}
+        for key, filename, out_path in pending:
+            if progress:
+                progress(key, "running")
+            built[key] = _build_document(key, filename, contexts[key], out_path)
+            if progress:
+                progress(key, "done")
+    results.update(built)
+    outputs = {}
+    for key, _, out_path in jobs:
         outputs[key] = out_path
+        if RENDER_CACHE_ENABLED and key in built:
+            _store_cached(cache_keys[key], out_path)
+        if timings is not None:
+            timings[key] = results[key]
     return outputs
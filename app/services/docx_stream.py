@@ -0,0 +1,151 @@
+import hashlib
+import io
+import os
+import re
+import shutil
+import tempfile
+import zipfile
+from xml.sax.saxutils import quoteattr
+
+from docx.image.image import Image as DocxImage
+from docx.opc.constants import RELATIONSHIP_TYPE as RT
+from docx.oxml.ns import qn
+from docx.oxml.shape import CT_Inline
+from lxml import etree
+
+from services.file_mode import set_default_mode
+
+_BODY_OPEN_RE = re.compile(rb"<w:body\b[^>]*?(/?)>")
+
+
+class StreamingDocxWriter:
+    # Writes a python-docx Document to out_path without keeping its pictures
+    # or its body in memory: add_image() stores each picture in the output
+    # zip right away, and flush() moves the body built so far to a temporary
+    # file. The output appears at out_path only when the block ends without
+    # an error.
+
+    def __init__(self, document, out_path: str) -> None:
+        self.document = document
+        self.out_path = out_path
+        directory = os.path.dirname(out_path) or "."
+        fd, self._temp_path = tempfile.mkstemp(
+            prefix=os.path.basename(out_path) + ".", suffix=".tmp", dir=directory
+        )
+        os.close(fd)
+        self._zip = zipfile.ZipFile(self._temp_path, "w", zipfile.ZIP_DEFLATED)
+        self._body_spill = tempfile.TemporaryFile(dir=directory)
+        # sha1 of the image bytes -> relationship id, so repeated pictures
+        # are stored once.
+        self._images: dict[str, str] = {}
+        self._relationships: list[tuple[str, str]] = []
+        self._content_types: dict[str, str] = {}
+        self._shape_id = 0
+
+    def __enter__(self) -> "StreamingDocxWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        try:
+            if exc_type is None:
+                self._finish()
+        finally:
+            self._body_spill.close()
+            self._zip.close()
+            if os.path.exists(self._temp_path):
+                try:
+                    os.remove(self._temp_path)
+                except OSError:
+                    pass
+
+    def add_image(self, blob: bytes) -> str:
+        digest = hashlib.sha1(blob).hexdigest()
+        rel_id = self._images.get(digest)
+        if rel_id is None:
+            image = DocxImage.from_blob(blob)
+            rel_id = f"rIdImg{len(self._images) + 1}"
+            target = f"media/image{len(self._images) + 1}.{image.ext}"
+            # Image formats are already compressed.
+            self._zip.writestr(f"word/{target}", blob, compress_type=zipfile.ZIP_STORED)
+            self._images[digest] = rel_id
+            self._relationships.append((rel_id, target))
+            self._content_types.setdefault(image.ext, image.content_type)
+        return rel_id
+
+    def add_picture(self, run, rel_id: str, width, height) -> None:
+        self._shape_id += 1
+        inline = CT_Inline.new_pic_inline(
+            self._shape_id, rel_id, f"image{self._shape_id}", width, height
+        )
+        run._r.add_drawing(inline)
+
+    def flush(self) -> None:
+        # Serializes every body element except the section properties and
+        # drops it from the tree. The body is written as a whole so namespace
+        # declarations stay on the root, not on each element.
+        body = self.document.element.body
+        sect_pr = body.find(qn("w:sectPr"))
+        if sect_pr is not None:
+            body.remove(sect_pr)
+        if len(body):
+            xml = etree.tostring(body, encoding="utf-8", with_tail=False)
+            opening = _BODY_OPEN_RE.match(xml)
+            if opening and not opening.group(1):
+                self._body_spill.write(xml[opening.end() : -len(b"</w:body>")])
+            for child in list(body):
+                body.remove(child)
+        if sect_pr is not None:
+            body.append(sect_pr)
+
+    def _finish(self) -> None:
+        self.flush()
+        # The rest of the package (styles, settings, the document with an
+        # empty body...) comes from a regular save of what is left.
+        skeleton = io.BytesIO()
+        self.document.save(skeleton)
+        with zipfile.ZipFile(skeleton) as source:
+            for info in source.infolist():
+                data = source.read(info.filename)
+                if info.filename == "word/document.xml":
+                    self._write_document_xml(data)
+                    continue
+                if info.filename == "word/_rels/document.xml.rels":
+                    data = self._with_relationships(data)
+                elif info.filename == "[Content_Types].xml":
+                    data = self._with_content_types(data)
+                self._zip.writestr(info.filename, data, compress_type=zipfile.ZIP_DEFLATED)
+        self._zip.close()
+        set_default_mode(self._temp_path)
+        os.replace(self._temp_path, self.out_path)
+
+    def _write_document_xml(self, skeleton_xml: bytes) -> None:
+        opening = _BODY_OPEN_RE.search(skeleton_xml)
+        if opening is None:
+            raise ValueError("word/document.xml sin w:body")
+        if opening.group(1):
+            head = skeleton_xml[: opening.start()] + b"<w:body>"
+            tail = b"</w:body>" + skeleton_xml[opening.end() :]
+        else:
+            head = skeleton_xml[: opening.end()]
+            tail = skeleton_xml[opening.end() :]
+        self._body_spill.seek(0)
+        with self._zip.open("word/document.xml", "w") as target:
+            target.write(head)
+            shutil.copyfileobj(self._body_spill, target, 64 * 1024)
+            target.write(tail)
+
+    def _with_relationships(self, data: bytes) -> bytes:
+        entries = "".join(
+            f'<Relationship Id="{rel_id}" Type="{RT.IMAGE}" Target="{target}"/>'
+            for rel_id, target in self._relationships
+        )
+        return data.replace(b"</Relationships>", entries.encode("utf-8") + b"</Relationships>")
+
+    def _with_content_types(self, data: bytes) -> bytes:
+        text = data.decode("utf-8")
+        entries = "".join(
+            f"<Default Extension={quoteattr(ext)} ContentType={quoteattr(content_type)}/>"
+            for ext, content_type in self._content_types.items()
+            if f'Extension="{ext}"'.lower() not in text.lower()
+        )
+        return text.replace("</Types>", entries + "</Types>").encode("utf-8")
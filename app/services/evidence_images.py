@@ -0,0 +1,117 @@
+import io
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow is optional: evidence is then embedded as uploaded.
+    Image = None
+    ImageOps = None
+
+
+def _env_int(name: str, default: int, minimum: int) -> int:
+    try:
+        return max(int(os.environ.get(name, str(default))), minimum)
+    except ValueError:
+        return default
+
+# Resolution of the printed picture; 0 embeds the uploaded bytes unchanged.
+IMAGE_DPI = _env_int("APP_ANEXO_IMAGE_DPI", 200, 0)
+JPEG_QUALITY = min(_env_int("APP_ANEXO_JPEG_QUALITY", 82, 1), 95)
+IMAGE_WORKERS = _env_int("APP_ANEXO_IMAGE_WORKERS", 4, 1)
+
+_EXIF_ORIENTATION = 0x0112
+
+
+def pipeline_enabled() -> bool:
+    return Image is not None and IMAGE_DPI > 0
+
+
+def settings_key() -> str:
+    # Part of the ANEXO render cache key: other settings give other bytes.
+    if not pipeline_enabled():
+        return "original"
+    return f"{IMAGE_DPI}:{JPEG_QUALITY}"
+
+
+def target_pixels(width_cm: float, height_cm: float) -> tuple[int, int]:
+    return (
+        max(round(width_cm / 2.54 * IMAGE_DPI), 1),
+        max(round(height_cm / 2.54 * IMAGE_DPI), 1),
+    )
+
+
+def prepare_image(data: bytes, width_cm: float, height_cm: float) -> bytes:
+    if not data or not pipeline_enabled():
+        return data
+    target = target_pixels(width_cm, height_cm)
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            rotated = image.getexif().get(_EXIF_ORIENTATION, 1) not in (0, 1)
+            if image.format == "JPEG":
+                # Lets libjpeg decode at 1/2, 1/4 or 1/8 scale directly.
+                side = max(target)
+                image.draft("RGB", (side, side))
+            image = ImageOps.exif_transpose(image)
+            # The picture is stretched to the cell, so each axis is reduced on
+            # its own; images are never enlarged.
+            size = (min(image.width, target[0]), min(image.height, target[1]))
+            if not rotated and size == (image.width, image.height):
+                return data
+            if size != (image.width, image.height):
+                image = image.resize(size, Image.Resampling.LANCZOS, reducing_gap=3.0)
+            if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+                rgba = image.convert("RGBA")
+                image = Image.new("RGB", rgba.size, (255, 255, 255))
+                image.paste(rgba, mask=rgba.getchannel("A"))
+            elif image.mode != "RGB":
+                image = image.convert("RGB")
+            output = io.BytesIO()
+            image.save(output, format="JPEG", quality=JPEG_QUALITY, optimize=True)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        # Left to python-docx, which embeds whatever it can read.
+        return data
+    encoded = output.getvalue()
+    if not rotated and len(encoded) >= len(data):
+        return data
+    return encoded
+
+
+def iter_prepared_images(sources: list, load, width_cm: float, height_cm: float):
+    # Yields (source, prepared bytes or None when load() finds nothing) for
+    # each distinct source, in order. At most IMAGE_WORKERS images are loaded
+    # at a time, so memory does not grow with the number of photos.
+    unique = list(dict.fromkeys(source for source in sources if source))
+
+    def prepare(source) -> bytes | None:
+        data = load(source)
+        return prepare_image(data, width_cm, height_cm) if data else None
+
+    if IMAGE_WORKERS <= 1 or len(unique) <= 1 or not pipeline_enabled():
+        for source in unique:
+            yield source, prepare(source)
+        return
+    # Pillow releases the GIL while decoding, resizing and encoding. load()
+    # runs in the calling thread, so stored evidence is read through its
+    # database connection instead of one per worker thread.
+    with ThreadPoolExecutor(
+        max_workers=min(IMAGE_WORKERS, len(unique)),
+        thread_name_prefix="anexo-images",
+    ) as executor:
+
+        def submit(source):
+            data = load(source)
+            if not data:
+                return source, None
+            return source, executor.submit(prepare_image, data, width_cm, height_cm)
+
+        remaining = iter(unique)
+        pending = deque(submit(source) for source in islice(remaining, IMAGE_WORKERS))
+        while pending:
+            source, future = pending.popleft()
+            following = next(remaining, None)
+            if following is not None:
+                pending.append(submit(following))
+            yield source, future.result() if future else None
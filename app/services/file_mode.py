@@ -0,0 +1,18 @@
+import os
+
+
+def _read_umask() -> int:
+    # The umask can only be read by setting it; done once at import, before
+    # any worker thread creates files.
+    mask = os.umask(0)
+    os.umask(mask)
+    return mask
+
+
+FILE_MODE = 0o666 & ~_read_umask()
+
+
+def set_default_mode(path: str) -> None:
+    # mkstemp() creates files as 0600 and os.replace() keeps that mode; give
+    # files published that way the mode open() would have given them.
+    os.chmod(path, FILE_MODE)
@@ -0,0 +1,62 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from db import claim_generation_job, fail_generation_job, requeue_unfinished_generation_jobs
+
+
+def _env_workers() -> int:
+    try:
+        return max(int(os.environ.get("APP_GENERATION_WORKERS", "2")), 1)
+    except ValueError:
+        return 2
+
+GENERATION_WORKERS = _env_workers()
+
+_executor: ThreadPoolExecutor | None = None
+_executor_lock = threading.Lock()
+_job_handler = None
+
+
+def set_job_handler(handler) -> None:
+    # handler(job) does the actual work; it is registered by app.py so this
+    # module does not depend on Flask.
+    global _job_handler
+    _job_handler = handler
+
+
+def _run_job(job_id: int) -> None:
+    job = claim_generation_job(job_id)
+    if not job:
+        return
+    try:
+        _job_handler(job)
+    except Exception as exc:
+        fail_generation_job(job_id, f"{type(exc).__name__}: {exc}")
+
+
+def submit_generation_job(job_id: int) -> None:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=GENERATION_WORKERS,
+                thread_name_prefix="generation",
+            )
+        _executor.submit(_run_job, job_id)
+
+
+def resume_generation_jobs() -> int:
+    job_ids = requeue_unfinished_generation_jobs()
+    for job_id in job_ids:
+        submit_generation_job(job_id)
+    return len(job_ids)
+
+
+def shutdown_generation_workers(wait: bool = True) -> None:
+    global _executor
+    with _executor_lock:
+        executor = _executor
+        _executor = None
+    if executor is not None:
+        executor.shutdown(wait=wait)
@@ -0,0 +1,390 @@
+import hashlib
+import os
+import re
+import struct
+import tempfile
+import threading
+import zlib
+from collections import OrderedDict
+
+import db
+from services.file_mode import set_default_mode
+
+# Pure-Python QR Code encoder (ISO/IEC 18004, byte mode, error correction
+# level M) used for the evidence links of the ANEXO, so no network service
+# is needed.
+
+# Bumped when the rendered PNG changes; part of the disk cache file name.
+QR_RENDER_VERSION = 1
+QR_MODULE_PIXELS = 8
+QR_QUIET_ZONE = 4
+QR_MEMORY_CACHE_SIZE = 256
+# Empty keeps the disk cache next to the database (data/qr_cache, ignored
+# by git in development).
+QR_CACHE_DIR = os.environ.get("APP_QR_CACHE_DIR", "").strip()
+
+# Indexed by version (index 0 unused), for error correction level M.
+_ECC_CODEWORDS_PER_BLOCK = (
+    -1, 10, 16, 26, 18, 24, 16, 18, 22, 22, 26, 30, 22, 22, 24, 24, 28, 28, 26, 26, 26,
+    26, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28,
+)
+_NUM_ERROR_CORRECTION_BLOCKS = (
+    -1, 1, 1, 1, 2, 2, 4, 4, 4, 5, 5, 5, 8, 9, 9, 10, 10, 11, 13, 14, 16,
+    17, 17, 18, 20, 21, 23, 25, 26, 28, 29, 31, 33, 35, 37, 38, 40, 43, 45, 47, 49,
+)
+_FORMAT_ECL_BITS = 0  # level M
+_BYTE_MODE = 0x4
+
+_PENALTY_N1 = 3
+_PENALTY_N2 = 3
+_PENALTY_N3 = 40
+_PENALTY_N4 = 10
+_FINDER_LIKE_RE = re.compile("(?=10111010000|00001011101)")
+
+_MASKS = (
+    lambda x, y: (x + y) % 2 == 0,
+    lambda x, y: y % 2 == 0,
+    lambda x, y: x % 3 == 0,
+    lambda x, y: (x + y) % 3 == 0,
+    lambda x, y: (x // 3 + y // 2) % 2 == 0,
+    lambda x, y: x * y % 2 + x * y % 3 == 0,
+    lambda x, y: (x * y % 2 + x * y % 3) % 2 == 0,
+    lambda x, y: ((x + y) % 2 + x * y % 3) % 2 == 0,
+)
+
+_GF_EXP = [0] * 512
+_GF_LOG = [0] * 256
+_value = 1
+for _power in range(255):
+    _GF_EXP[_power] = _value
+    _GF_LOG[_value] = _power
+    _value <<= 1
+    if _value & 0x100:
+        _value ^= 0x11D
+for _power in range(255, 512):
+    _GF_EXP[_power] = _GF_EXP[_power - 255]
+
+_memory_cache: OrderedDict[str, bytes] = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _gf_multiply(x: int, y: int) -> int:
+    if x == 0 or y == 0:
+        return 0
+    return _GF_EXP[_GF_LOG[x] + _GF_LOG[y]]
+
+
+def _rs_divisor(degree: int) -> list[int]:
+    result = [0] * (degree - 1) + [1]
+    root = 1
+    for _ in range(degree):
+        for index in range(degree):
+            result[index] = _gf_multiply(result[index], root)
+            if index + 1 < degree:
+                result[index] ^= result[index + 1]
+        root = _gf_multiply(root, 0x02)
+    return result
+
+
+def _rs_remainder(data: list[int], divisor: list[int]) -> list[int]:
+    result = [0] * len(divisor)
+    for byte in data:
+        factor = byte ^ result.pop(0)
+        result.append(0)
+        for index, coefficient in enumerate(divisor):
+            result[index] ^= _gf_multiply(coefficient, factor)
+    return result
+
+
+def _num_raw_data_modules(version: int) -> int:
+    result = (16 * version + 128) * version + 64
+    if version >= 2:
+        num_align = version // 7 + 2
+        result -= (25 * num_align - 10) * num_align - 55
+        if version >= 7:
+            result -= 36
+    return result
+
+
+def _num_data_codewords(version: int) -> int:
+    return (
+        _num_raw_data_modules(version) // 8
+        - _ECC_CODEWORDS_PER_BLOCK[version] * _NUM_ERROR_CORRECTION_BLOCKS[version]
+    )
+
+
+def _alignment_positions(version: int, size: int) -> list[int]:
+    if version == 1:
+        return []
+    num_align = version // 7 + 2
+    step = (version * 8 + num_align * 3 + 5) // (num_align * 4 - 4) * 2
+    return [6] + sorted(size - 7 - index * step for index in range(num_align - 1))
+
+
+def _encode_data(payload: bytes) -> tuple[int, list[int]]:
+    for version in range(1, 41):
+        count_bits = 8 if version <= 9 else 16
+        capacity_bits = _num_data_codewords(version) * 8
+        if len(payload) < (1 << count_bits) and 4 + count_bits + len(payload) * 8 <= capacity_bits:
+            break
+    else:
+        raise ValueError("qr_data_too_long")
+    bits = f"{_BYTE_MODE:04b}{len(payload):0{count_bits}b}"
+    bits += "".join(f"{byte:08b}" for byte in payload)
+    bits += "0" * min(4, capacity_bits - len(bits))
+    bits += "0" * (-len(bits) % 8)
+    codewords = [int(bits[index : index + 8], 2) for index in range(0, len(bits), 8)]
+    pad = 0xEC
+    while len(codewords) < capacity_bits // 8:
+        codewords.append(pad)
+        pad ^= 0xEC ^ 0x11
+    return version, codewords
+
+
+def _add_ecc_and_interleave(version: int, data: list[int]) -> list[int]:
+    num_blocks = _NUM_ERROR_CORRECTION_BLOCKS[version]
+    block_ecc_len = _ECC_CODEWORDS_PER_BLOCK[version]
+    raw_codewords = _num_raw_data_modules(version) // 8
+    num_short_blocks = num_blocks - raw_codewords % num_blocks
+    short_block_len = raw_codewords // num_blocks
+    divisor = _rs_divisor(block_ecc_len)
+    blocks = []
+    offset = 0
+    for index in range(num_blocks):
+        length = short_block_len - block_ecc_len + (0 if index < num_short_blocks else 1)
+        block = data[offset : offset + length]
+        offset += length
+        ecc = _rs_remainder(block, divisor)
+        if index < num_short_blocks:
+            block.append(0)
+        blocks.append(block + ecc)
+    result = []
+    for position in range(len(blocks[0])):
+        for index, block in enumerate(blocks):
+            # Short blocks carry a placeholder at the data/ECC boundary.
+            if position != short_block_len - block_ecc_len or index >= num_short_blocks:
+                result.append(block[position])
+    return result
+
+
+class _Matrix:
+    def __init__(self, version: int) -> None:
+        self.version = version
+        self.size = version * 4 + 17
+        self.modules = [[False] * self.size for _ in range(self.size)]
+        self.function = [[False] * self.size for _ in range(self.size)]
+
+    def set_function(self, x: int, y: int, dark: bool) -> None:
+        self.modules[y][x] = dark
+        self.function[y][x] = True
+
+    def draw_function_patterns(self) -> None:
+        size = self.size
+        for index in range(size):
+            self.set_function(6, index, index % 2 == 0)
+            self.set_function(index, 6, index % 2 == 0)
+        for cx, cy in ((3, 3), (size - 4, 3), (3, size - 4)):
+            for dy in range(-4, 5):
+                for dx in range(-4, 5):
+                    x, y = cx + dx, cy + dy
+                    if 0 <= x < size and 0 <= y < size:
+                        self.set_function(x, y, max(abs(dx), abs(dy)) not in (2, 4))
+        positions = _alignment_positions(self.version, size)
+        last = len(positions) - 1
+        for i, cx in enumerate(positions):
+            for j, cy in enumerate(positions):
+                if (i, j) in ((0, 0), (0, last), (last, 0)):
+                    continue
+                for dy in range(-2, 3):
+                    for dx in range(-2, 3):
+                        self.set_function(cx + dx, cy + dy, max(abs(dx), abs(dy)) != 1)
+        self.draw_format_bits(0)
+        self.draw_version()
+
+    def draw_format_bits(self, mask: int) -> None:
+        data = _FORMAT_ECL_BITS << 3 | mask
+        remainder = data
+        for _ in range(10):
+            remainder = (remainder << 1) ^ ((remainder >> 9) * 0x537)
+        bits = (data << 10 | remainder) ^ 0x5412
+        bit = lambda index: (bits >> index) & 1 != 0
+        size = self.size
+        for index in range(6):
+            self.set_function(8, index, bit(index))
+        self.set_function(8, 7, bit(6))
+        self.set_function(8, 8, bit(7))
+        self.set_function(7, 8, bit(8))
+        for index in range(9, 15):
+            self.set_function(14 - index, 8, bit(index))
+        for index in range(8):
+            self.set_function(size - 1 - index, 8, bit(index))
+        for index in range(8, 15):
+            self.set_function(8, size - 15 + index, bit(index))
+        self.set_function(8, size - 8, True)
+
+    def draw_version(self) -> None:
+        if self.version < 7:
+            return
+        remainder = self.version
+        for _ in range(12):
+            remainder = (remainder << 1) ^ ((remainder >> 11) * 0x1F25)
+        bits = self.version << 12 | remainder
+        for index in range(18):
+            dark = (bits >> index) & 1 != 0
+            a, b = self.size - 11 + index % 3, index // 3
+            self.set_function(a, b, dark)
+            self.set_function(b, a, dark)
+
+    def draw_codewords(self, codewords: list[int]) -> None:
+        size = self.size
+        total_bits = len(codewords) * 8
+        index = 0
+        right = size - 1
+        while right >= 1:
+            if right == 6:
+                right = 5
+            upward = (right + 1) & 2 == 0
+            for vertical in range(size):
+                y = size - 1 - vertical if upward else vertical
+                for x in (right, right - 1):
+                    if not self.function[y][x] and index < total_bits:
+                        self.modules[y][x] = (codewords[index >> 3] >> (7 - (index & 7))) & 1 != 0
+                        index += 1
+            right -= 2
+
+    def apply_mask(self, mask: int) -> None:
+        condition = _MASKS[mask]
+        for y in range(self.size):
+            row = self.modules[y]
+            function = self.function[y]
+            for x in range(self.size):
+                if not function[x] and condition(x, y):
+                    row[x] = not row[x]
+
+    def penalty(self) -> int:
+        size = self.size
+        rows = ["".join("1" if dark else "0" for dark in row) for row in self.modules]
+        columns = ["".join(row[x] for row in rows) for x in range(size)]
+        result = 0
+        for line in rows + columns:
+            for run in re.finditer(r"0{5,}|1{5,}", line):
+                result += _PENALTY_N1 + len(run.group()) - 5
+            result += _PENALTY_N3 * len(_FINDER_LIKE_RE.findall(line))
+        for y in range(size - 1):
+            upper, lower = rows[y], rows[y + 1]
+            for x in range(size - 1):
+                if upper[x] == upper[x + 1] == lower[x] == lower[x + 1]:
+                    result += _PENALTY_N2
+        dark = sum(line.count("1") for line in rows)
+        total = size * size
+        # Each 5% step away from a 50% dark ratio.
+        steps = (abs(dark * 20 - total * 10) + total - 1) // total - 1
+        return result + max(steps, 0) * _PENALTY_N4
+
+
+def encode_qr(text: str, mask: int | None = None) -> list[list[bool]]:
+    # Module matrix (True = dark) for text; mask None picks the lowest penalty.
+    version, data = _encode_data(text.encode("utf-8"))
+    codewords = _add_ecc_and_interleave(version, data)
+    matrix = _Matrix(version)
+    matrix.draw_function_patterns()
+    matrix.draw_codewords(codewords)
+    if mask is None:
+        best_penalty = None
+        for candidate in range(8):
+            matrix.apply_mask(candidate)
+            matrix.draw_format_bits(candidate)
+            penalty = matrix.penalty()
+            if best_penalty is None or penalty < best_penalty:
+                mask, best_penalty = candidate, penalty
+            matrix.apply_mask(candidate)
+    matrix.apply_mask(mask)
+    matrix.draw_format_bits(mask)
+    return matrix.modules
+
+
+def render_png(modules: list[list[bool]], scale: int = QR_MODULE_PIXELS, border: int = QR_QUIET_ZONE) -> bytes:
+    # 1-bit grayscale PNG, dark modules are 0.
+    size = len(modules)
+    side = (size + border * 2) * scale
+    raw_rows = []
+    for y in range(-border, size + border):
+        row = modules[y] if 0 <= y < size else ()
+        bits = "".join(
+            ("0" if 0 <= x < size and row and row[x] else "1") * scale
+            for x in range(-border, size + border)
+        )
+        bits += "1" * (-len(bits) % 8)
+        line = b"\x00" + int(bits, 2).to_bytes(len(bits) // 8, "big")
+        raw_rows.extend([line] * scale)
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", struct.pack(">IIBBBBB", side, side, 1, 0, 0, 0, 0))
+        + chunk(b"IDAT", zlib.compress(b"".join(raw_rows), 9))
+        + chunk(b"IEND", b"")
+    )
+
+
+def _qr_cache_dir() -> str:
+    return QR_CACHE_DIR or os.path.join(os.path.dirname(db.DB_PATH), "qr_cache")
+
+
+def _remember(text: str, png: bytes) -> None:
+    with _cache_lock:
+        _memory_cache[text] = png
+        _memory_cache.move_to_end(text)
+        while len(_memory_cache) > QR_MEMORY_CACHE_SIZE:
+            _memory_cache.popitem(last=False)
+
+
+def _store_on_disk(cache_dir: str, path: str, png: bytes) -> None:
+    temp_path = ""
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(suffix=".tmp", dir=cache_dir)
+        with os.fdopen(fd, "wb") as handle:
+            handle.write(png)
+        set_default_mode(temp_path)
+        os.replace(temp_path, path)
+    except OSError:
+        # The disk cache is best effort; the PNG is still returned.
+        if temp_path:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+
+
+def qr_png(text: str) -> bytes | None:
+    # PNG for text, from the memory LRU, then the disk cache, then the encoder.
+    # None when the text does not fit in a QR code.
+    with _cache_lock:
+        png = _memory_cache.get(text)
+        if png is not None:
+            _memory_cache.move_to_end(text)
+            return png
+    digest = hashlib.sha256(f"{QR_RENDER_VERSION}:{text}".encode("utf-8")).hexdigest()
+    cache_dir = _qr_cache_dir()
+    path = os.path.join(cache_dir, f"{digest}.png")
+    try:
+        with open(path, "rb") as handle:
+            png = handle.read()
+    except OSError:
+        png = None
+    if not png:
+        try:
+            png = render_png(encode_qr(text))
+        except ValueError:
+            return None
+        _store_on_disk(cache_dir, path, png)
+    _remember(text, png)
+    return png
+
+
+def clear_qr_cache() -> None:
+    with _cache_lock:
+        _memory_cache.clear()
@@ -0,0 +1,168 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import db
+from services import docx_generator
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return max(int(os.environ.get(name, str(default))), 1)
+    except ValueError:
+        return default
+
+RERENDER_WORKERS = _env_int("APP_RERENDER_WORKERS", os.cpu_count() or 1)
+RERENDER_BATCH_SIZE = _env_int("APP_RERENDER_BATCH_SIZE", 50)
+
+_thread: threading.Thread | None = None
+_thread_lock = threading.Lock()
+
+
+def _init_worker(db_path: str, output_dir: str) -> None:
+    db.DB_PATH = db_path
+    docx_generator.OUTPUT_DIR = output_dir
+
+
+def _rerender_record(record_id: int, stored_keys: dict) -> tuple[int, dict, int]:
+    # Renders only the documents whose template or payload changed since the
+    # last render (different render key) or whose file is missing. Returns
+    # (record_id, new render keys, documents rendered).
+    item = db.get_submission(record_id)
+    if not item:
+        return record_id, {}, 0
+    context = item.get("data") or {}
+    current = docx_generator.document_render_keys(context)
+    stale = [
+        key
+        for key, render_key in current.items()
+        if stored_keys.get(key) != render_key
+        or not os.path.isfile(
+            os.path.join(
+                docx_generator.OUTPUT_DIR,
+                f"{record_id:05d}_{docx_generator.TEMPLATE_FILES[key]}",
+            )
+        )
+    ]
+    if not stale:
+        return record_id, {}, 0
+    render_keys: dict = {}
+    # One report per worker process; its documents go one after another.
+    docx_generator.generate_documents(
+        context, record_id, workers=0, keys=stale, render_keys=render_keys
+    )
+    return record_id, render_keys, len(stale)
+
+
+def run_rerender(run_id: int, workers: int | None = None, batch_size: int | None = None, progress=None) -> dict:
+    # Walks the submissions in id order, one page at a time, and checkpoints
+    # the last finished id after each page so an interrupted run resumes
+    # where it stopped. progress(run) is called after each page.
+    run = db.get_rerender_run(run_id)
+    if not run:
+        raise LookupError(f"re-render {run_id} no encontrado")
+    workers = RERENDER_WORKERS if workers is None else max(workers, 1)
+    batch_size = RERENDER_BATCH_SIZE if batch_size is None else max(batch_size, 1)
+    counts = {name: run[name] or 0 for name in ("scanned", "rendered", "skipped", "failed")}
+    last_id = run["last_id"] or 0
+    pool = None
+    if workers > 1:
+        pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(db.DB_PATH, docx_generator.OUTPUT_DIR),
+        )
+    try:
+        while True:
+            record_ids = db.list_submission_ids(after_id=last_id, limit=batch_size)
+            if not record_ids:
+                break
+            stored = db.get_render_keys(record_ids)
+            if pool is not None:
+                futures = [
+                    (record_id, pool.submit(_rerender_record, record_id, stored.get(record_id, {})))
+                    for record_id in record_ids
+                ]
+                outcomes = []
+                for record_id, future in futures:
+                    try:
+                        outcomes.append(future.result())
+                    except Exception:
+                        outcomes.append((record_id, None, 0))
+            else:
+                outcomes = []
+                for record_id in record_ids:
+                    try:
+                        outcomes.append(_rerender_record(record_id, stored.get(record_id, {})))
+                    except Exception:
+                        outcomes.append((record_id, None, 0))
+            for record_id, render_keys, rendered in outcomes:
+                counts["scanned"] += 1
+                if render_keys is None:
+                    counts["failed"] += 1
+                elif rendered:
+                    db.save_render_keys(record_id, render_keys)
+                    counts["rendered"] += 1
+                else:
+                    counts["skipped"] += 1
+            last_id = record_ids[-1]
+            db.update_rerender_run(run_id, last_id=last_id, **counts)
+            if progress:
+                progress(db.get_rerender_run(run_id))
+    except Exception as exc:
+        db.update_rerender_run(run_id, status="failed", error=f"{type(exc).__name__}: {exc}")
+        raise
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+    db.update_rerender_run(run_id, status="done")
+    return db.get_rerender_run(run_id)
+
+
+def _run_in_background(run_id: int) -> None:
+    try:
+        run_rerender(run_id)
+    except Exception:
+        # Already recorded on the run by run_rerender.
+        pass
+
+
+def _start_thread(run_id: int) -> None:
+    global _thread
+    _thread = threading.Thread(
+        target=_run_in_background, args=(run_id,), name="rerender", daemon=True
+    )
+    _thread.start()
+
+
+def rerender_running() -> bool:
+    return _thread is not None and _thread.is_alive()
+
+
+def start_rerender(created_by: str = "") -> int | None:
+    # Starts a re-render of every stored submission in the background;
+    # returns None if one is already running in this process.
+    with _thread_lock:
+        if rerender_running():
+            return None
+        unfinished = db.get_unfinished_rerender_run()
+        if unfinished:
+            # Left running by a stopped server: mark it and start over.
+            db.update_rerender_run(unfinished["id"], status="failed", error="interrumpido")
+        run_id = db.create_rerender_run(created_by)
+        _start_thread(run_id)
+        return run_id
+
+
+def resume_rerender() -> int | None:
+    # Continues a run interrupted by a restart from its last checkpoint.
+    with _thread_lock:
+        if rerender_running():
+            return None
+        unfinished = db.get_unfinished_rerender_run()
+        if not unfinished:
+            return None
+        _start_thread(unfinished["id"])
+        return unfinished["id"]
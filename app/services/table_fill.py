@@ -0,0 +1,136 @@
+import copy
+
+from docx.oxml.ns import qn
+
+# Header formatting that should not carry over to data rows derived from it.
+_HEADER_ONLY_CELL_PROPS = ("w:shd", "w:vMerge")
+_HEADER_ONLY_RUN_PROPS = ("w:b", "w:bCs", "w:i", "w:iCs", "w:caps", "w:spacing", "w:highlight", "w:shd")
+
+
+def _strip_ids(element) -> None:
+    # w14:paraId must be unique in the document; rsids are only revision noise.
+    for node in element.iter(qn("w:tr"), qn("w:p"), qn("w:r")):
+        for name in list(node.attrib):
+            if name.endswith("}paraId") or name.endswith("}textId") or "}rsid" in name:
+                del node.attrib[name]
+
+
+def _remove_children(parent, tags) -> None:
+    if parent is None:
+        return
+    for tag in tags:
+        for child in parent.findall(qn(tag)):
+            parent.remove(child)
+
+
+def _text_paragraph(tc):
+    # The paragraph that carries the cell's text formatting: the first one
+    # with a run, else the first one.
+    paragraphs = tc.findall(qn("w:p"))
+    for paragraph in paragraphs:
+        if paragraph.find(qn("w:r")) is not None:
+            return paragraph
+    return paragraphs[0] if paragraphs else None
+
+
+def _prototype_cell(tc, from_header: bool):
+    # Copy of tc with its content reduced to one paragraph holding one empty
+    # run, keeping the paragraph and run properties.
+    cell = copy.deepcopy(tc)
+    source = _text_paragraph(cell)
+    paragraph = cell.makeelement(qn("w:p"), {})
+    run = paragraph.makeelement(qn("w:r"), {})
+    if source is not None:
+        ppr = source.find(qn("w:pPr"))
+        source_run = source.find(qn("w:r"))
+        if ppr is not None:
+            if from_header:
+                # Only the paragraph style: header spacing and indents centre
+                # the titles and would misplace body text.
+                style = ppr.find(qn("w:pStyle"))
+                ppr = ppr.makeelement(qn("w:pPr"), {})
+                if style is not None:
+                    ppr.append(copy.deepcopy(style))
+            paragraph.append(copy.deepcopy(ppr))
+        if source_run is not None and source_run.find(qn("w:rPr")) is not None:
+            rpr = copy.deepcopy(source_run.find(qn("w:rPr")))
+            if from_header:
+                _remove_children(rpr, _HEADER_ONLY_RUN_PROPS)
+            if len(rpr):
+                run.append(rpr)
+    if from_header:
+        _remove_children(paragraph.find(qn("w:pPr")), ("w:rPr",))
+        _remove_children(cell.find(qn("w:tcPr")), _HEADER_ONLY_CELL_PROPS)
+    paragraph.append(run)
+    for child in list(cell):
+        if child.tag != qn("w:tcPr"):
+            cell.remove(child)
+    cell.append(paragraph)
+    return cell
+
+
+def prototype_row(tbl, header_row_index: int):
+    # Data row template for tbl: the row after the header when the template
+    # has one (a formatted sample row), else the header row without its
+    # header-only formatting (shading, bold, fixed height).
+    rows = tbl.findall(qn("w:tr"))
+    from_header = header_row_index + 1 >= len(rows)
+    source = rows[header_row_index] if from_header else rows[header_row_index + 1]
+    row = source.makeelement(qn("w:tr"), {})
+    trpr = source.find(qn("w:trPr"))
+    if trpr is not None:
+        trpr = copy.deepcopy(trpr)
+        if from_header:
+            _remove_children(trpr, ("w:trHeight", "w:tblHeader"))
+        if len(trpr):
+            row.append(trpr)
+    for tc in source.findall(qn("w:tc")):
+        row.append(_prototype_cell(tc, from_header))
+    _strip_ids(row)
+    return row
+
+
+def _set_run_text(run, text: str) -> None:
+    # One w:t per line with w:br between them, like python-docx's run.text;
+    # tabs become w:tab.
+    for child in list(run):
+        if child.tag != qn("w:rPr"):
+            run.remove(child)
+    for line_index, line in enumerate(text.split("\n")):
+        if line_index:
+            run.append(run.makeelement(qn("w:br"), {}))
+        for part_index, part in enumerate(line.split("\t")):
+            if part_index:
+                run.append(run.makeelement(qn("w:tab"), {}))
+            if part:
+                node = run.makeelement(qn("w:t"), {})
+                node.text = part
+                if part != part.strip():
+                    node.set("{http://www.w3.org/XML/1998/namespace}space", "preserve")
+                run.append(node)
+
+
+def fill_table(tbl, header_row_index: int, rows: list[list[str]]) -> None:
+    # Replaces every row after the header with one row per entry of rows
+    # (a list of cell texts), cloned from the table's prototype row, and
+    # inserts them in one pass. Texts beyond the prototype's last cell are
+    # appended to that cell as extra lines.
+    prototype = prototype_row(tbl, header_row_index)
+    existing = tbl.findall(qn("w:tr"))
+    for tr in existing[header_row_index + 1:]:
+        tbl.remove(tr)
+    if not prototype.findall(qn("w:tc")):
+        return
+    anchor = existing[header_row_index]
+    position = list(tbl).index(anchor) + 1
+    built = []
+    for values in rows:
+        row = copy.deepcopy(prototype)
+        cells = row.findall(qn("w:tc"))
+        if len(values) > len(cells):
+            values = list(values[: len(cells) - 1]) + ["\n".join(values[len(cells) - 1:])]
+        for cell, value in zip(cells, values):
+            run = cell.find(qn("w:p")).find(qn("w:r"))
+            _set_run_text(run, str(value or "").replace("\r\n", "\n").replace("\r", "\n"))
+        built.append(row)
+    tbl[position:position] = built
@@ -0,0 +1,150 @@
+import copy
+import hashlib
+import io
+import os
+import re
+import threading
+from dataclasses import dataclass
+
+from docx.document import Document as DocumentObject
+from docxtpl import DocxTemplate
+from jinja2 import Template, meta
+
+TEMPLATE_CACHE_ENABLED = os.environ.get("APP_TEMPLATE_CACHE", "1").strip() != "0"
+
+_PARAGRAPH_SPLIT_RE = re.compile(r"<w:p([ >])")
+_PARAGRAPH_JOIN_RE = re.compile(r"\n<w:p([ >])")
+
+
+@dataclass
+class _TemplateEntry:
+    mtime_ns: int
+    size: int
+    digest: str
+    # Top-level context names referenced by the body, headers and footers.
+    variables: frozenset
+    document: DocumentObject
+    body: Template
+    # rel key -> (xml encoding, compiled template) for headers and footers.
+    parts: dict
+
+
+_cache: dict[str, _TemplateEntry] = {}
+_cache_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "reloads": 0}
+
+
+class CachedDocxTemplate(DocxTemplate):
+    # Renders from a cache entry: the document is a copy of the parsed
+    # prototype and the Jinja XML is already patched and compiled, so only
+    # template.render() runs per request.
+
+    def __init__(self, template_path: str, entry: _TemplateEntry) -> None:
+        super().__init__(template_path)
+        self._entry = entry
+        self.docx = copy.deepcopy(entry.document)
+
+    def build_xml(self, context, jinja_env=None):
+        return self._render_compiled(self._entry.body, self.docx._part, context)
+
+    def build_headers_footers_xml(self, context, uri, jinja_env=None):
+        for rel_key, part in self.get_headers_footers(uri):
+            encoding, template = self._entry.parts[rel_key]
+            yield rel_key, self._render_compiled(template, part, context).encode(encoding)
+
+    def _render_compiled(self, template: Template, part, context) -> str:
+        # Same post-processing as DocxTemplate.render_xml_part().
+        self.current_rendering_part = part
+        dst_xml = template.render(context)
+        dst_xml = _PARAGRAPH_JOIN_RE.sub(r"<w:p\1", dst_xml)
+        dst_xml = (
+            dst_xml.replace("{_{", "{{")
+            .replace("}_}", "}}")
+            .replace("{_%", "{%")
+            .replace("%_}", "%}")
+        )
+        return self.resolve_listing(dst_xml)
+
+
+def _compile_xml(template: DocxTemplate, xml: str, variables: set) -> Template:
+    source = _PARAGRAPH_SPLIT_RE.sub(r"\n<w:p\1", template.patch_xml(xml))
+    compiled = Template(source)
+    variables.update(meta.find_undeclared_variables(compiled.environment.parse(source)))
+    return compiled
+
+
+def _load_entry(template_path: str, stat: os.stat_result) -> _TemplateEntry:
+    with open(template_path, "rb") as handle:
+        blob = handle.read()
+    prototype = DocxTemplate(io.BytesIO(blob))
+    prototype.init_docx()
+    variables: set = set()
+    parts = {}
+    for uri in (prototype.HEADER_URI, prototype.FOOTER_URI):
+        for rel_key, part in prototype.get_headers_footers(uri):
+            xml = prototype.get_part_xml(part)
+            encoding = prototype.get_headers_footers_encoding(xml)
+            parts[rel_key] = (encoding, _compile_xml(prototype, xml, variables))
+    body = _compile_xml(prototype, prototype.get_xml(), variables)
+    return _TemplateEntry(
+        mtime_ns=stat.st_mtime_ns,
+        size=stat.st_size,
+        digest=hashlib.sha256(blob).hexdigest(),
+        variables=frozenset(variables),
+        document=prototype.docx,
+        body=body,
+        parts=parts,
+    )
+
+
+def _get_entry(template_path: str) -> _TemplateEntry:
+    stat = os.stat(template_path)
+    with _cache_lock:
+        entry = _cache.get(template_path)
+        fresh = entry is not None and (entry.mtime_ns, entry.size) == (stat.st_mtime_ns, stat.st_size)
+        if fresh:
+            _stats["hits"] += 1
+    if not fresh:
+        # Parsed outside the lock; a concurrent miss only costs a duplicate load.
+        loaded = _load_entry(template_path, stat)
+        with _cache_lock:
+            _stats["misses"] += 1
+            if entry is not None:
+                _stats["reloads"] += 1
+            _cache[template_path] = loaded
+        entry = loaded
+    return entry
+
+
+def get_template(template_path: str) -> DocxTemplate:
+    if not TEMPLATE_CACHE_ENABLED:
+        return DocxTemplate(template_path)
+    return CachedDocxTemplate(template_path, _get_entry(template_path))
+
+
+def template_fingerprint(template_path: str) -> tuple[str, frozenset]:
+    # (sha256 of the .docx, context names it references). Goes through the
+    # cache even when rendering from it is disabled, so it stays cheap.
+    entry = _get_entry(template_path)
+    return entry.digest, entry.variables
+
+
+def template_cache_stats() -> dict:
+    with _cache_lock:
+        hits = _stats["hits"]
+        misses = _stats["misses"]
+        return {
+            "enabled": TEMPLATE_CACHE_ENABLED,
+            "templates": len(_cache),
+            "hits": hits,
+            "misses": misses,
+            "reloads": _stats["reloads"],
+            "hit_rate": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+        }
+
+
+def clear_template_cache() -> None:
+    with _cache_lock:
+        _cache.clear()
+        for key in _stats:
+            _stats[key] = 0
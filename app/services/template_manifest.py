@@ -0,0 +1,185 @@
+import os
+import threading
+from dataclasses import dataclass
+
+from docx import Document
+
+from services.template_cache import template_fingerprint
+
+
+class TemplateManifestError(RuntimeError):
+    pass
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.upper().split())
+
+def _cell_has_keywords(text: str, keywords: list[str]) -> bool:
+    normalized = _normalize(text)
+    return all(keyword in normalized for keyword in keywords)
+
+def is_gestion_header(row) -> bool:
+    cells = row.cells
+    if len(cells) < 2:
+        return False
+    return _cell_has_keywords(cells[0].text, ["ACTIVIDADES", "CONTRATO"]) and _cell_has_keywords(
+        cells[1].text, ["EJECUT"]
+    )
+
+def is_supervision_header(row) -> bool:
+    cells = row.cells
+    if len(cells) < 3:
+        return False
+    matches_contrato = _cell_has_keywords(
+        cells[0].text, ["ACTIVIDADES", "CONTRATO"]
+    ) and _cell_has_keywords(cells[1].text, ["EJECUT"])
+    matches_reportadas = _cell_has_keywords(
+        cells[0].text, ["ACTIVIDADES", "REPORT"]
+    ) and _cell_has_keywords(cells[1].text, ["OBSERV"])
+    return (matches_contrato or matches_reportadas) and _cell_has_keywords(cells[2].text, ["EVIDEN"])
+
+# Documents whose activity table is filled after rendering: doc key -> header
+# row test.
+ACTIVITY_TABLE_HEADERS = {
+    "inf_gestion": is_gestion_header,
+    "inf_supervision": is_supervision_header,
+}
+
+# Context names each template must reference; a template edited without one
+# of them would render that field blank in every report.
+_REQUIRED_COMMON = frozenset(
+    {
+        "contrato_no",
+        "fecha_contrato",
+        "objeto_contractual",
+        "entidad_contratante",
+        "nit",
+        "contratista",
+        "cc",
+        "cdp",
+        "rp",
+        "valor_inicial",
+        "valor_contrato",
+        "valor_ejecutado",
+        "saldo_pendiente",
+        "fecha_presentacion_informe",
+    }
+)
+_REQUIRED_REPORT = _REQUIRED_COMMON | {
+    "informe_no",
+    "periodo_i_de",
+    "periodo_i_a",
+    "aportes_planilla",
+    "aportes_valor_salud",
+    "aportes_valor_pension",
+    "aportes_valor_riesgos",
+    "aportes_valor_caja_compensacion_familiar",
+    "total_aportes",
+}
+REQUIRED_PLACEHOLDERS = {
+    "inf_gestion": _REQUIRED_REPORT | {"valor_a_cobrar"},
+    "inf_supervision": _REQUIRED_REPORT | {"valor_presente_informe", "actas_parciales"},
+    "acta_parcial": _REQUIRED_COMMON | {"valor_presente_informe", "actas_parciales"},
+}
+
+
+@dataclass(frozen=True)
+class TemplateManifestEntry:
+    filename: str
+    checksum: str
+    mtime_ns: int
+    size: int
+    # Top-level context names the template references.
+    placeholders: frozenset
+    # (index in doc.tables, header row index) of the activity table, or None
+    # for documents without one.
+    activity_table: tuple | None
+    # Names of REQUIRED_PLACEHOLDERS[key] the template does not reference.
+    missing_placeholders: frozenset = frozenset()
+
+
+_manifest: dict[str, TemplateManifestEntry] = {}
+_manifest_lock = threading.Lock()
+
+
+def find_header_row(doc, is_header) -> tuple[int, int] | None:
+    for table_index, table in enumerate(doc.tables):
+        for row_index, row in enumerate(table.rows):
+            if is_header(row):
+                return table_index, row_index
+    return None
+
+
+def _build_entry(key: str, template_path: str, stat: os.stat_result) -> TemplateManifestEntry:
+    filename = os.path.basename(template_path)
+    try:
+        # Parses the .docx and compiles its Jinja, which also warms the
+        # template cache for the first request.
+        checksum, placeholders = template_fingerprint(template_path)
+        activity_table = None
+        if key in ACTIVITY_TABLE_HEADERS:
+            activity_table = find_header_row(Document(template_path), ACTIVITY_TABLE_HEADERS[key])
+    except Exception as exc:
+        raise TemplateManifestError(f"{filename}: {type(exc).__name__}: {exc}") from exc
+    if key in ACTIVITY_TABLE_HEADERS and activity_table is None:
+        raise TemplateManifestError(f"{filename}: no se encontró la tabla de actividades")
+    return TemplateManifestEntry(
+        filename=filename,
+        checksum=checksum,
+        mtime_ns=stat.st_mtime_ns,
+        size=stat.st_size,
+        placeholders=placeholders,
+        activity_table=activity_table,
+        missing_placeholders=REQUIRED_PLACEHOLDERS.get(key, frozenset()) - placeholders,
+    )
+
+
+def get_manifest_entry(key: str, template_path: str) -> TemplateManifestEntry:
+    # Rebuilt when the template file changes on disk, like the template cache.
+    try:
+        stat = os.stat(template_path)
+    except OSError as exc:
+        raise TemplateManifestError(f"{os.path.basename(template_path)}: no existe") from exc
+    with _manifest_lock:
+        entry = _manifest.get(key)
+    if entry is not None and (entry.mtime_ns, entry.size) == (stat.st_mtime_ns, stat.st_size):
+        return entry
+    entry = _build_entry(key, template_path, stat)
+    with _manifest_lock:
+        _manifest[key] = entry
+    return entry
+
+
+def build_manifest(template_paths: dict) -> dict[str, TemplateManifestEntry]:
+    # template_paths maps doc key -> .docx path. Raises one error listing
+    # every broken template.
+    entries = {}
+    errors = []
+    for key, template_path in template_paths.items():
+        try:
+            entries[key] = get_manifest_entry(key, template_path)
+        except TemplateManifestError as exc:
+            errors.append(str(exc))
+    if errors:
+        raise TemplateManifestError("; ".join(errors))
+    return entries
+
+
+def manifest_summary() -> dict:
+    with _manifest_lock:
+        entries = dict(_manifest)
+    return {
+        key: {
+            "filename": entry.filename,
+            "checksum": entry.checksum,
+            "placeholders": sorted(entry.placeholders),
+            "activity_table": list(entry.activity_table) if entry.activity_table else None,
+            "missing_placeholders": sorted(entry.missing_placeholders),
+        }
+        for key, entry in sorted(entries.items())
+    }
+
+
+def clear_manifest() -> None:
+    with _manifest_lock:
+        _manifest.clear()
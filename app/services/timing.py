@@ -0,0 +1,99 @@
+import os
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+def _env_window() -> int:
+    try:
+        return max(int(os.environ.get("APP_TIMING_WINDOW", "500")), 1)
+    except ValueError:
+        return 500
+
+# Samples kept per stage for the admin histogram.
+TIMING_WINDOW = _env_window()
+# Histogram bucket upper bounds in milliseconds; the last bucket is open.
+HISTOGRAM_BUCKETS_MS = (10, 50, 100, 250, 500, 1000, 2500, 5000)
+
+_METRIC_NAME_RE = re.compile(r"[^A-Za-z0-9_.-]")
+
+_samples: dict[str, deque] = {}
+_samples_lock = threading.Lock()
+
+
+class Timings:
+    # Milliseconds per stage for one request, in the order the stages ran;
+    # spans with the same name add up.
+
+    def __init__(self) -> None:
+        self.stages: dict[str, float] = {}
+
+    @contextmanager
+    def span(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, (time.perf_counter() - started) * 1000)
+
+    def add(self, name: str, elapsed_ms: float) -> None:
+        self.stages[name] = round(self.stages.get(name, 0.0) + elapsed_ms, 2)
+
+    def update(self, stages: dict, prefix: str = "") -> None:
+        for name, elapsed_ms in stages.items():
+            self.add(f"{prefix}{name}", elapsed_ms)
+
+
+def server_timing_header(stages: dict) -> str:
+    # Server-Timing: name;dur=ms, ... (names restricted to token characters).
+    return ", ".join(
+        f"{_METRIC_NAME_RE.sub('_', name)};dur={elapsed_ms:.2f}"
+        for name, elapsed_ms in stages.items()
+    )
+
+
+def record_timings(stages: dict) -> None:
+    with _samples_lock:
+        for name, elapsed_ms in stages.items():
+            samples = _samples.get(name)
+            if samples is None:
+                samples = _samples[name] = deque(maxlen=TIMING_WINDOW)
+            samples.append(float(elapsed_ms))
+
+
+def _percentile(ordered: list[float], fraction: float) -> float:
+    index = min(int(round(fraction * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+def timing_histogram() -> dict:
+    # Per stage over the last TIMING_WINDOW samples: count, p50/p90/p99/max
+    # and how many samples fall in each bucket.
+    with _samples_lock:
+        snapshot = {name: sorted(samples) for name, samples in _samples.items()}
+    result = {}
+    for name, ordered in sorted(snapshot.items()):
+        if not ordered:
+            continue
+        buckets = [0] * (len(HISTOGRAM_BUCKETS_MS) + 1)
+        for value in ordered:
+            index = 0
+            while index < len(HISTOGRAM_BUCKETS_MS) and value > HISTOGRAM_BUCKETS_MS[index]:
+                index += 1
+            buckets[index] += 1
+        result[name] = {
+            "count": len(ordered),
+            "p50": round(_percentile(ordered, 0.5), 2),
+            "p90": round(_percentile(ordered, 0.9), 2),
+            "p99": round(_percentile(ordered, 0.99), 2),
+            "max": round(ordered[-1], 2),
+            "buckets": buckets,
+        }
+    return result
+
+
+def clear_timings() -> None:
+    with _samples_lock:
+        _samples.clear()
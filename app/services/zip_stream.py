@@ -0,0 +1,69 @@
+import os
+import time
+import zipfile
+
+CHUNK_SIZE = 64 * 1024
+# Already compressed formats; deflating them again costs CPU for ~0% gain.
+STORED_EXTENSIONS = {".docx", ".xlsx", ".pdf", ".jpg", ".jpeg", ".png", ".zip"}
+
+
+class _ChunkSink:
+    # Write-only file object for ZipFile. It is not seekable, so zipfile
+    # writes each entry's sizes and CRC in a data descriptor after the data
+    # and nothing has to be rewritten.
+
+    def __init__(self) -> None:
+        self._chunks: list[bytes] = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _zip_info(arcname: str, path: str) -> zipfile.ZipInfo:
+    stat = os.stat(path)
+    info = zipfile.ZipInfo(arcname, time.localtime(stat.st_mtime)[:6])
+    info.file_size = stat.st_size
+    info.external_attr = 0o644 << 16
+    if os.path.splitext(arcname)[1].lower() in STORED_EXTENSIONS:
+        info.compress_type = zipfile.ZIP_STORED
+    else:
+        info.compress_type = zipfile.ZIP_DEFLATED
+    return info
+
+
+def stream_zip(entries):
+    # Yields the ZIP for entries, an iterable of (arcname, path), in chunks of
+    # about CHUNK_SIZE; only one chunk of one file is held at a time. Entries
+    # whose path is missing or unreadable are skipped.
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, "w") as archive:
+        for arcname, path in entries:
+            try:
+                info = _zip_info(arcname, path)
+                source = open(path, "rb")
+            except OSError:
+                continue
+            with source, archive.open(info, "w") as target:
+                while True:
+                    block = source.read(CHUNK_SIZE)
+                    if not block:
+                        break
+                    target.write(block)
+                    data = sink.drain()
+                    if data:
+                        yield data
+            data = sink.drain()
+            if data:
+                yield data
+    data = sink.drain()
+    if data:
+        yield data
@@ -0,0 +1,92 @@
+import base64
+import io
+import os
+import sys
+import tempfile
+import tracemalloc
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db
+from services import docx_generator, evidence_images
+
+PHOTO_SIZE = (480, 360)
+PHOTOS_PER_ACTIVITY = 3
+SMALL_SET = 30
+LARGE_SET = 300
+# Peak of Python allocations while building the ANEXO. A builder that keeps
+# every photo until the end needs several times this with LARGE_SET photos.
+MAX_PEAK_MB = 6
+# Allowed growth of that peak from SMALL_SET to LARGE_SET photos.
+MAX_GROWTH_MB = 1.5
+
+
+def _photo(seed: int) -> bytes:
+    from PIL import Image
+
+    # Noise keeps every photo distinct (the writer stores repeats once) and
+    # poorly compressible, about 100 KB each.
+    image = Image.merge("RGB", [Image.effect_noise(PHOTO_SIZE, 40 + seed % 20 + band) for band in range(3)])
+    output = io.BytesIO()
+    image.save(output, format="JPEG", quality=85)
+    return output.getvalue()
+
+
+def _items(photo_count: int) -> list[dict]:
+    items = []
+    for start in range(0, photo_count, PHOTOS_PER_ACTIVITY):
+        images = [
+            {"name": f"foto_{seed}.jpg", "dataUrl": "data:image/jpeg;base64," + base64.b64encode(_photo(seed)).decode("ascii")}
+            for seed in range(start, min(start + PHOTOS_PER_ACTIVITY, photo_count))
+        ]
+        items.append(
+            {
+                "actividad_contrato": f"Actividad {len(items) + 1}",
+                "actividad_ejecutada": "Se ejecuto la actividad.",
+                "evidencias": {"images": images, "groups": [{"description": "Registro", "date": "2025-12-01"}]},
+            }
+        )
+    return items
+
+
+@unittest.skipIf(evidence_images.Image is None, "Pillow no esta instalado")
+class AnexoMemoryTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory(prefix="test_anexo_memory_")
+        self.saved = (db.DB_PATH, evidence_images.IMAGE_DPI)
+        db.close_connections()
+        db.DB_PATH = os.path.join(self.temp_dir.name, "app.db")
+        db.init_db()
+        # Original photos: the bytes embedded are the bytes stored, so a
+        # builder that buffers them shows up directly in the peak.
+        evidence_images.IMAGE_DPI = 0
+
+    def tearDown(self):
+        db.close_connections()
+        db.DB_PATH, evidence_images.IMAGE_DPI = self.saved
+        self.temp_dir.cleanup()
+
+    def _peak_mb(self, photo_count: int) -> tuple[float, int]:
+        record_id = db.save_submission({"obligaciones_directas_items": _items(photo_count)})
+        context = db.get_submission(record_id)["data"]
+        out_path = os.path.join(self.temp_dir.name, f"anexo_{photo_count}.docx")
+        tracemalloc.start()
+        try:
+            docx_generator._build_anexo_document(context, out_path)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        return peak / 2**20, os.path.getsize(out_path)
+
+    def test_peak_memory_does_not_grow_with_photos(self):
+        small_peak, _ = self._peak_mb(SMALL_SET)
+        large_peak, large_size = self._peak_mb(LARGE_SET)
+        # The photos did reach the document, and weigh far more than the bound.
+        self.assertGreater(large_size / 2**20, MAX_PEAK_MB * 3)
+        self.assertLess(large_peak, MAX_PEAK_MB)
+        self.assertLess(large_peak - small_peak, MAX_GROWTH_MB)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db
+
+REPORT_COUNT = 7
+PAGE_SIZE = 3
+
+
+def _payload(index: int, owner: str) -> dict:
+    return {
+        "contratista": f"Contratista {index}",
+        "contrato_no": f"C-{index}",
+        "dia_corte": "30",
+        "mes_corte": "noviembre",
+        "anio_corte": "2025",
+        "_app_meta": {"created_by_username": owner},
+    }
+
+
+class ListingPagingTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory(prefix="test_listing_")
+        self.saved = db.DB_PATH
+        db.close_connections()
+        db.DB_PATH = os.path.join(self.temp_dir.name, "app.db")
+        db.init_db()
+        # Every other report belongs to the contractor.
+        self.ids = db.save_submissions(
+            [_payload(index, "contratista" if index % 2 else "otro") for index in range(REPORT_COUNT)]
+        )
+
+    def tearDown(self):
+        db.close_connections()
+        db.DB_PATH = self.saved
+        self.temp_dir.cleanup()
+
+    def _pages(self, fields: list[str], **filters) -> list[list[int]]:
+        pages = []
+        after_id = None
+        while True:
+            page = db.list_submission_summaries(fields, limit=PAGE_SIZE, after_id=after_id, **filters)
+            if not page:
+                return pages
+            pages.append([item["id"] for item in page])
+            after_id = page[-1]["id"]
+
+    def test_pages_cover_every_report_once(self):
+        pages = self._pages(["contratista"])
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+        self.assertEqual(sum(pages, []), sorted(self.ids, reverse=True))
+
+    def test_pages_with_payload_fields(self):
+        # dia_corte has no column: the fallback path pages the same way.
+        pages = self._pages(["contratista", "dia_corte"])
+        self.assertEqual(sum(pages, []), sorted(self.ids, reverse=True))
+        first = db.list_submission_summaries(["contratista", "dia_corte"], limit=1)[0]
+        self.assertEqual(first["data"], {"contratista": f"Contratista {REPORT_COUNT - 1}", "dia_corte": "30"})
+
+    def test_pages_with_owner_filter(self):
+        owned = [record_id for index, record_id in enumerate(self.ids) if index % 2]
+        pages = self._pages(["contratista"], owner_username="Contratista")
+        self.assertEqual(sum(pages, []), sorted(owned, reverse=True))
+
+
+class HistoryCursorTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory(prefix="test_listing_")
+        self.saved = db.DB_PATH
+        db.close_connections()
+        db.DB_PATH = os.path.join(self.temp_dir.name, "app.db")
+        import app as app_module
+
+        db.init_db()
+        app_module._ensure_default_roles_and_admin()
+        self.ids = db.save_submissions([_payload(index, "otro") for index in range(REPORT_COUNT)])
+        self.client = app_module.app.test_client()
+        response = self.client.post("/login", data={"username": "admin", "password": "admin123"})
+        self.assertEqual(response.status_code, 302)
+
+    def tearDown(self):
+        db.close_connections()
+        db.DB_PATH = self.saved
+        self.temp_dir.cleanup()
+
+    def test_next_after_id_walks_the_history(self):
+        seen = []
+        after_id = None
+        for _ in range(REPORT_COUNT):
+            query = f"/history?limit={PAGE_SIZE}" + (f"&after_id={after_id}" if after_id else "")
+            body = self.client.get(query).get_json()
+            self.assertTrue(body["ok"])
+            self.assertEqual(body["total"], REPORT_COUNT)
+            seen.extend(item["id"] for item in body["items"])
+            after_id = body["next_after_id"]
+            if after_id is None:
+                break
+        self.assertEqual(seen, sorted(self.ids, reverse=True))
+
+    def test_short_page_has_no_cursor(self):
+        body = self.client.get(f"/history?limit={REPORT_COUNT + 1}").get_json()
+        self.assertEqual(len(body["items"]), REPORT_COUNT)
+        self.assertIsNone(body["next_after_id"])
+
+
+if __name__ == "__main__":
+    unittest.main()
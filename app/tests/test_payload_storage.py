@@ -0,0 +1,168 @@
+import base64
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db
+
+PHOTO = b"\x89PNG\r\n\x1a\nfoto de prueba"
+OTHER_PHOTO = b"\x89PNG\r\n\x1a\notra foto"
+
+
+def _data_url(content: bytes) -> str:
+    return "data:image/png;base64," + base64.b64encode(content).decode("ascii")
+
+
+def _payload(*photos: bytes) -> dict:
+    return {
+        "contratista": "Ana Pérez",
+        "contrato_no": "C-1",
+        "obligaciones_directas_items": [
+            {
+                "actividad_contrato": "Visita de campo",
+                "evidencias": {"images": [{"name": f"foto_{index}.png", "dataUrl": _data_url(photo)} for index, photo in enumerate(photos)]},
+            }
+        ],
+    }
+
+
+class PayloadStorageTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory(prefix="test_payload_storage_")
+        self.saved = (db.DB_PATH, db.PAYLOAD_CODEC)
+        db.close_connections()
+        db.DB_PATH = os.path.join(self.temp_dir.name, "app.db")
+        db.init_db()
+
+    def tearDown(self):
+        db.close_connections()
+        db.DB_PATH, db.PAYLOAD_CODEC = self.saved
+        self.temp_dir.cleanup()
+
+    def _stored_value(self, record_id: int):
+        with db.get_connection() as conn:
+            return conn.execute("SELECT data_json FROM submissions WHERE id = ?", (record_id,)).fetchone()[0]
+
+    def _ref_counts(self) -> dict[str, int]:
+        with db.get_connection() as conn:
+            return dict(conn.execute("SELECT sha256, ref_count FROM blobs").fetchall())
+
+    def _links(self, record_id: int) -> set[str]:
+        with db.get_connection() as conn:
+            return db._submission_blob_refs(conn, record_id)
+
+    def test_zlib_round_trip(self):
+        db.PAYLOAD_CODEC = "zlib"
+        payload = {"contratista": "Ana Pérez", "observaciones": "ñ" * 500}
+        record_id = db.save_submission(payload)
+
+        stored = self._stored_value(record_id)
+        self.assertIsInstance(stored, bytes)
+        self.assertEqual(stored[0], db.PAYLOAD_CODEC_HEADERS["zlib"])
+        self.assertLess(len(stored), len(json.dumps(payload, ensure_ascii=False).encode("utf-8")))
+        self.assertEqual(db.get_submission(record_id)["data"], payload)
+        self.assertEqual(db.get_submission_metadata(record_id)["payload_size"], len(stored))
+
+    def test_plain_codec_stores_text(self):
+        db.PAYLOAD_CODEC = "none"
+        record_id = db.save_submission({"contratista": "Ana Pérez"})
+        self.assertIsInstance(self._stored_value(record_id), str)
+        self.assertEqual(db.get_submission(record_id)["data"], {"contratista": "Ana Pérez"})
+
+    def test_legacy_text_rows_are_read(self):
+        # Rows written before the codec existed hold the JSON text as is.
+        payload = {"contratista": "Ana Pérez", "dia_corte": "30"}
+        with db.get_connection() as conn:
+            record_id = conn.execute(
+                "INSERT INTO submissions (created_at, data_json) VALUES (?, ?)",
+                ("2025-01-01T00:00:00", json.dumps(payload, ensure_ascii=False)),
+            ).lastrowid
+            conn.commit()
+
+        self.assertEqual(db.get_submission(record_id)["data"], payload)
+        with db.get_connection() as conn:
+            value = conn.execute(
+                "SELECT json_extract(payload_text(data_json), '$.dia_corte') FROM submissions WHERE id = ?",
+                (record_id,),
+            ).fetchone()[0]
+        self.assertEqual(value, "30")
+        summary = db.list_submission_summaries(["dia_corte"], limit=1)[0]
+        self.assertEqual(summary["data"], {"dia_corte": "30"})
+
+    def test_unknown_codec_header_is_rejected(self):
+        with self.assertRaises(ValueError):
+            db._decode_payload_text(b"\x7fdatos")
+
+    def test_photos_are_stored_once_and_counted(self):
+        first = db.save_submission(_payload(PHOTO, PHOTO))
+        second = db.save_submission(_payload(PHOTO, OTHER_PHOTO))
+        photo = hashlib.sha256(PHOTO).hexdigest()
+        other = hashlib.sha256(OTHER_PHOTO).hexdigest()
+
+        self.assertEqual(self._ref_counts(), {photo: 2, other: 1})
+        self.assertEqual(self._links(first), {photo})
+        self.assertEqual(self._links(second), {photo, other})
+        # Readers get the photo back through the stored reference.
+        image = db.get_submission(first)["data"]["obligaciones_directas_items"][0]["evidencias"]["images"][0]
+        self.assertEqual(image["dataUrl"], db.BLOB_REF_PREFIX + photo)
+        self.assertEqual(db.load_blob_bytes(image["dataUrl"]), PHOTO)
+
+    def test_ref_count_follows_updates(self):
+        record_id = db.save_submission(_payload(PHOTO))
+        photo = hashlib.sha256(PHOTO).hexdigest()
+        other = hashlib.sha256(OTHER_PHOTO).hexdigest()
+
+        # The stored reference is kept and a new photo is added.
+        data = db.get_submission(record_id)["data"]
+        data["obligaciones_directas_items"][0]["evidencias"]["images"].append(
+            {"name": "nueva.png", "dataUrl": _data_url(OTHER_PHOTO)}
+        )
+        self.assertTrue(db.update_submission_data(record_id, data))
+        self.assertEqual(self._ref_counts(), {photo: 1, other: 1})
+        self.assertEqual(self._links(record_id), {photo, other})
+
+        # Dropping the first photo releases its blob.
+        data = db.get_submission(record_id)["data"]
+        del data["obligaciones_directas_items"][0]["evidencias"]["images"][0]
+        self.assertTrue(db.update_submission_data(record_id, data))
+        self.assertEqual(self._ref_counts(), {other: 1})
+        self.assertEqual(self._links(record_id), {other})
+
+    def test_update_drops_references_the_submission_did_not_hold(self):
+        owner = db.save_submission(_payload(PHOTO))
+        other = db.save_submission(_payload(OTHER_PHOTO))
+        photo = hashlib.sha256(PHOTO).hexdigest()
+
+        data = db.get_submission(other)["data"]
+        data["obligaciones_directas_items"][0]["evidencias"]["images"].append(
+            {"name": "ajena.png", "dataUrl": db.BLOB_REF_PREFIX + photo}
+        )
+        db.update_submission_data(other, data)
+
+        images = db.get_submission(other)["data"]["obligaciones_directas_items"][0]["evidencias"]["images"]
+        self.assertEqual(images[-1]["dataUrl"], "")
+        self.assertNotIn(photo, self._links(other))
+        self.assertEqual(self._ref_counts()[photo], 1)
+        self.assertEqual(self._links(owner), {photo})
+
+    def test_delete_releases_blobs(self):
+        first = db.save_submission(_payload(PHOTO))
+        second = db.save_submission(_payload(PHOTO, OTHER_PHOTO))
+        photo = hashlib.sha256(PHOTO).hexdigest()
+
+        self.assertTrue(db.delete_submission(second))
+        self.assertEqual(self._ref_counts(), {photo: 1})
+        self.assertEqual(self._links(second), set())
+
+        self.assertTrue(db.delete_submission(first))
+        self.assertEqual(self._ref_counts(), {})
+        self.assertFalse(db.delete_submission(first))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+import copy
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db
+from _test_generate import sample
+from services import docx_generator
+
+
+class RenderCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory(prefix="test_render_cache_")
+        self.saved = (
+            db.DB_PATH,
+            docx_generator.OUTPUT_DIR,
+            docx_generator.RENDER_CACHE_DIR,
+            docx_generator.RENDER_CACHE_ENABLED,
+        )
+        db.close_connections()
+        db.DB_PATH = os.path.join(self.temp_dir.name, "app.db")
+        db.init_db()
+        docx_generator.OUTPUT_DIR = os.path.join(self.temp_dir.name, "output")
+        docx_generator.RENDER_CACHE_DIR = ""
+        docx_generator.RENDER_CACHE_ENABLED = True
+        self.record_id = db.save_submission(sample)
+
+    def tearDown(self):
+        db.close_connections()
+        (
+            db.DB_PATH,
+            docx_generator.OUTPUT_DIR,
+            docx_generator.RENDER_CACHE_DIR,
+            docx_generator.RENDER_CACHE_ENABLED,
+        ) = self.saved
+        self.temp_dir.cleanup()
+
+    def _generate(self, context: dict) -> tuple[dict, list, dict]:
+        cache_hits: list = []
+        render_keys: dict = {}
+        outputs = docx_generator.generate_documents(
+            context, self.record_id, workers=0, cache_hits=cache_hits, render_keys=render_keys
+        )
+        return outputs, cache_hits, render_keys
+
+    def _read(self, outputs: dict) -> dict:
+        contents = {}
+        for key, path in outputs.items():
+            with open(path, "rb") as handle:
+                contents[key] = handle.read()
+        return contents
+
+    def test_same_payload_is_served_from_cache(self):
+        outputs, hits, keys = self._generate(copy.deepcopy(sample))
+        self.assertEqual(hits, [])
+        self.assertEqual(set(keys), set(docx_generator.TEMPLATE_FILES))
+        first = self._read(outputs)
+        db.save_render_keys(self.record_id, keys)
+
+        outputs, hits, again = self._generate(copy.deepcopy(sample))
+        self.assertEqual(sorted(hits), sorted(docx_generator.TEMPLATE_FILES))
+        self.assertEqual(again, keys)
+        self.assertEqual(self._read(outputs), first)
+        self.assertEqual(db.get_render_keys([self.record_id]), {self.record_id: keys})
+
+    def test_changed_payload_misses(self):
+        _, _, keys = self._generate(copy.deepcopy(sample))
+
+        changed = copy.deepcopy(sample)
+        changed["contratista"] = "Otra Contratista"
+        outputs, hits, changed_keys = self._generate(changed)
+        # The ANEXO only depends on the activities, so it is still reused.
+        self.assertEqual(hits, ["anexo"])
+        self.assertEqual(changed_keys["anexo"], keys["anexo"])
+        self.assertNotEqual(changed_keys["inf_gestion"], keys["inf_gestion"])
+        self.assertTrue(all(os.path.getsize(path) > 0 for path in outputs.values()))
+
+        changed["obligaciones_directas_items"][0]["actividad_ejecutada"] = "Actividad distinta."
+        _, hits, _ = self._generate(changed)
+        self.assertNotIn("anexo", hits)
+
+    def test_cache_can_be_disabled(self):
+        docx_generator.RENDER_CACHE_ENABLED = False
+        self._generate(copy.deepcopy(sample))
+        _, hits, keys = self._generate(copy.deepcopy(sample))
+        self.assertEqual(hits, [])
+        # Render keys are still reported for the rerender bookkeeping.
+        self.assertEqual(set(keys), set(docx_generator.TEMPLATE_FILES))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db
+
+ACTIVITIES = [
+    {"id": "1", "desc": "Primera actividad", "status": "cumplida", "obs": ""},
+    {"id": "2", "desc": "Segunda actividad", "status": "cumplida", "obs": ""},
+]
+
+
+class ReviewTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory(prefix="test_reviews_")
+        self.saved = db.DB_PATH
+        db.close_connections()
+        db.DB_PATH = os.path.join(self.temp_dir.name, "app.db")
+        db.init_db()
+        self.record_id = db.save_submission({"contratista": "Ana Perez", "contrato_no": "C-1"})
+
+    def tearDown(self):
+        db.close_connections()
+        db.DB_PATH = self.saved
+        self.temp_dir.cleanup()
+
+    def _review_status_column(self) -> str:
+        return db.get_submission_metadata(self.record_id)["review_status"]
+
+    def test_save_review_records_status_and_event(self):
+        event = {"date": "2025-12-01T10:00:00", "action": "Informe aprobado", "status": "aprobado", "by": "rodrigo"}
+        self.assertTrue(db.save_review(self.record_id, "aprobado", "Todo en orden", ACTIVITIES, event))
+
+        review = db.get_review(self.record_id)
+        self.assertEqual(review["status"], "aprobado")
+        self.assertEqual(review["observacion_global"], "Todo en orden")
+        self.assertEqual([activity["id"] for activity in review["actividades"]], ["1", "2"])
+        self.assertEqual(self._review_status_column(), "aprobado")
+        events = db.list_review_events(self.record_id)
+        self.assertEqual(len(events), 1)
+        self.assertEqual((events[0]["action"], events[0]["username"]), ("Informe aprobado", "rodrigo"))
+
+    def test_save_review_unknown_submission(self):
+        self.assertFalse(db.save_review(self.record_id + 1, "aprobado", "", ACTIVITIES))
+
+    def test_activity_not_fulfilled_reopens_approved_review(self):
+        db.save_review(self.record_id, "aprobado", "", ACTIVITIES)
+
+        status = db.update_review_activity(self.record_id, "2", "no cumplida", "Falta el soporte", updated_by="rodrigo")
+
+        self.assertEqual(status, "pendiente")
+        self.assertEqual(self._review_status_column(), "pendiente")
+        activities = {activity["id"]: activity for activity in db.get_review(self.record_id)["actividades"]}
+        self.assertEqual((activities["2"]["status"], activities["2"]["obs"]), ("no cumplida", "Falta el soporte"))
+        # Newest first: the status change follows the activity event.
+        events = db.list_review_events(self.record_id)
+        self.assertEqual([event["status"] for event in events], ["pendiente", "no cumplida"])
+        self.assertEqual((events[1]["activity_id"], events[1]["obs"]), ("2", "Falta el soporte"))
+        self.assertEqual(events[0]["activity_id"], "")
+
+    def test_fulfilled_activity_keeps_approval(self):
+        db.save_review(self.record_id, "aprobado", "", ACTIVITIES)
+
+        status = db.update_review_activity(self.record_id, "1", "cumplida", "Verificada", updated_by="rodrigo")
+
+        self.assertEqual(status, "aprobado")
+        self.assertEqual(self._review_status_column(), "aprobado")
+        self.assertEqual(len(db.list_review_events(self.record_id)), 1)
+
+    def test_rejected_review_is_not_reopened(self):
+        db.save_review(self.record_id, "rechazado", "", ACTIVITIES)
+
+        status = db.update_review_activity(self.record_id, "1", "no cumplida", "")
+
+        self.assertEqual(status, "rechazado")
+        self.assertEqual(self._review_status_column(), "rechazado")
+
+    def test_new_activity_is_appended(self):
+        db.save_review(self.record_id, "pendiente", "", ACTIVITIES)
+
+        db.update_review_activity(self.record_id, "3", "pendiente", "", desc="Tercera actividad")
+
+        activities = db.get_review(self.record_id)["actividades"]
+        self.assertEqual([activity["id"] for activity in activities], ["1", "2", "3"])
+        self.assertEqual(activities[-1]["desc"], "Tercera actividad")
+
+    def test_update_activity_unknown_submission(self):
+        self.assertIsNone(db.update_review_activity(self.record_id + 1, "1", "cumplida", ""))
+        self.assertIsNone(db.update_review_activity(self.record_id, "", "cumplida", ""))
+
+
+if __name__ == "__main__":
+    unittest.main()